@@ -0,0 +1,42 @@
+import os
+
+class AudioUpload:
+    """
+    Read-only, seekable file object over in-memory audio, for multipart uploads.
+
+    Reads return memoryview slices of the session buffer, so the audio goes straight from
+    the buffer into the request body without a temporary file or an intermediate bytes copy.
+    httpx sizes the upload through `seek`/`tell`, which keeps the request Content-Length framed.
+    """
+    name = "audio.webm"
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        chunk = self._view[self._pos:end]
+        self._pos = end
+        return chunk
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        """Release the view so the underlying buffer can be resized or reused."""
+        self._view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
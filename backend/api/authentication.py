@@ -0,0 +1,137 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl, urlencode
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))  # Seconds a resolved token is trusted
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_SUBPROTOCOL = "token"  # WebSocket clients offer the subprotocols ["token", <key>]
+
+class TokenUserCache:
+    """
+    In-process LRU cache of token key -> Token (with its user), shared by the REST and WebSocket paths.
+    Misses cost the one Token+User join DRF would run on every request. Entries are dropped by the
+    signal handlers in api/signals.py when the token is deleted or its user deactivated or deleted,
+    and expire after `ttl` in case that happened in another worker.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """The cached token if still valid, else None (no database access)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, token = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def get(self, key):
+        """Token for `key` with an active user; raises Token.DoesNotExist otherwise."""
+        token = self.lookup(key)
+        if token is not None:
+            return token
+        token = Token.objects.select_related("user").get(key=key)
+        if not token.user.is_active:
+            raise Token.DoesNotExist()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return token
+
+    async def aget(self, key):
+        token = self.lookup(key)
+        if token is not None:
+            return token
+        return await sync_to_async(self.get)(key)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [key for key, (_, token) in self._entries.items() if token.user_id == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+token_users = TokenUserCache()
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """DRF TokenAuthentication ("Authorization: Token <key>") resolved through the token cache."""
+
+    def authenticate_credentials(self, key):
+        try:
+            token = token_users.get(key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed("Invalid token.")
+        return (token.user, token)
+
+class TokenAuthMiddleware:
+    """
+    ASGI middleware for WebSocket routes: sets scope["user"] from the same token the REST API uses.
+    Browsers cannot set headers on a WebSocket handshake, so the token is read from the offered
+    subprotocols ("token", <key>; the consumer accepts "token"), then an "Authorization: Token <key>"
+    header, then the `auth_token` cookie. The `token` query parameter still works but is deprecated:
+    URLs end up in access logs, so it is removed from the scope along with the subprotocol key.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        key = self.token_key(scope)
+        scope["user"] = AnonymousUser()
+        if key:
+            try:
+                scope["user"] = (await token_users.aget(key)).user
+            except Token.DoesNotExist:
+                pass
+        return await self.inner(scope, receive, send)
+
+    @staticmethod
+    def token_key(scope):
+        """The token key, removed from `scope` wherever it was sent so nothing downstream can log it."""
+        query = parse_qsl(scope.get("query_string", b"").decode(), keep_blank_values=True)
+        query_key = next((value for name, value in query if name == "token"), None)
+        if query_key is not None:
+            print("Deprecated: WebSocket token sent in the query string; offer it as a subprotocol instead.")
+            scope["query_string"] = urlencode([(name, value) for name, value in query if name != "token"]).encode()
+
+        subprotocols = list(scope.get("subprotocols") or [])
+        if len(subprotocols) >= 2 and subprotocols[0] == TOKEN_SUBPROTOCOL:
+            scope["subprotocols"] = [TOKEN_SUBPROTOCOL]
+            scope["headers"] = [
+                (name, TOKEN_SUBPROTOCOL.encode() if name == b"sec-websocket-protocol" else value)
+                for name, value in scope.get("headers", [])
+            ]
+            return subprotocols[1]
+        headers = dict(scope.get("headers", []))
+        authorization = headers.get(b"authorization", b"").decode().split()
+        if len(authorization) == 2 and authorization[0].lower() == "token":
+            return authorization[1]
+        cookie = SimpleCookie(headers.get(b"cookie", b"").decode())
+        if "auth_token" in cookie:
+            return cookie["auth_token"].value
+        return query_key or None
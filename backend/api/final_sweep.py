@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from .providers import parseFinalAttributes, parseFinalAttributesDelta
+from .workloads import final_sweep_lane, speculative_sweep_lane
+from .prompting import estimateTokens
+
+# Verify attributes in the background while recording continues, so stop_recording only has to
+# check the last stretch of transcript. The cost: about one extra final-sweep call (gpt-4o) per
+# recording session every SPECULATIVE_SWEEP_INTERVAL seconds, each sending only the new text plus
+# SWEEP_CONTEXT_CHARS of context. Set SPECULATIVE_SWEEP=false to sweep only on stop.
+SPECULATIVE_SWEEP = os.getenv("SPECULATIVE_SWEEP", "true").lower() == "true"
+SPECULATIVE_SWEEP_INTERVAL = float(os.getenv("SPECULATIVE_SWEEP_INTERVAL", "20"))  # Min seconds between sweeps
+SWEEP_CONTEXT_CHARS = int(os.getenv("SWEEP_CONTEXT_CHARS", "600"))  # Already-verified text sent as context
+
+class SpeculativeSweep:
+    """
+    Keeps a final-sweep result for the transcript so far, read from the session's TranscriptMemory.
+
+    The first sweep verifies the whole (compacted) transcript; every later one, including the one run
+    on stop, reviews only the text that arrived since the previous sweep, starting from the verified
+    values. If that text has already been folded into the summary, the compacted transcript is swept again.
+    Fields whose extracted value changed after a sweep started take the newer extraction as candidate.
+    Background sweeps run in speculative_sweep_lane and the stop-time sweep in final_sweep_lane.
+    """
+
+    def __init__(self, form_template, interval=SPECULATIVE_SWEEP_INTERVAL, enabled=SPECULATIVE_SWEEP):
+        self.form_template = form_template
+        self.interval = interval
+        self.enabled = enabled
+        self.verified = None   # Attributes verified against the first `covered` transcript chars
+        self.covered = 0
+        self.snapshot = {}     # Extracted attributes when the verified sweep started
+        self.sweeps = 0
+        self._task = None
+        self._calling = False  # The background sweep holds a lane slot and is waiting on the provider
+        self._last_started = 0.0
+
+    def candidates(self, current_attributes):
+        """Candidate list for the next sweep: verified values, overridden by newer extractions."""
+        if self.verified is None:
+            return self.form_template.candidate_attributes(current_attributes)
+        values = dict(self.verified)
+        for name, value in current_attributes.items():
+            if self.snapshot.get(name) != value or name not in values:
+                values[name] = value
+        return self.form_template.candidate_attributes(values)
+
+    def refresh(self, memory, current_attributes):
+        """Start a background sweep if none is running, new text exists and the interval has passed."""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        if memory.total <= self.covered or time.monotonic() - self._last_started < self.interval:
+            return
+        self._last_started = time.monotonic()
+        self._task = asyncio.create_task(self._background(memory, dict(current_attributes)))
+
+    async def finalise(self, memory, current_attributes):
+        """
+        Result for stop_recording: waits for an in-flight sweep, then verifies only the remaining delta.
+        Returns immediately when the latest speculative result already covers the whole transcript.
+        A background sweep still queued for a slot is cancelled rather than waited for.
+        """
+        if self._task is not None:
+            if not self._calling:
+                self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        sent = ""
+        if self.verified is None or memory.total > self.covered:
+            sent = await self._sweep(memory, dict(current_attributes))
+        print(f"Final sweep: {self.sweeps} sweeps, ~{estimateTokens(sent) if sent else 0} transcript tokens "
+              f"sent on stop; memory {memory.stats()}")
+        return self.verified
+
+    def state(self):
+        """JSON-serialisable snapshot of the last completed sweep, for the session store."""
+        return {"verified": self.verified, "covered": self.covered, "snapshot": self.snapshot, "sweeps": self.sweeps}
+
+    def restore(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _background(self, memory, current_attributes):
+        try:
+            await self._sweep(memory, current_attributes, speculative_sweep_lane)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Error in speculative final sweep:", e)
+
+    async def _sweep(self, memory, current_attributes, lane=final_sweep_lane):
+        """Runs one sweep and returns the transcript text it sent."""
+        end = memory.total
+        new_text = memory.since(self.covered) if self.verified is not None else None
+        candidates = self.candidates(current_attributes)
+        if new_text is None:
+            transcript = memory.text()
+            async with self._slot(lane):
+                result = await parseFinalAttributes(transcript, candidates)
+            sent = transcript
+        else:
+            context = memory.context_before(self.covered, SWEEP_CONTEXT_CHARS)
+            async with self._slot(lane):
+                result = await parseFinalAttributesDelta(context, new_text, candidates)
+            sent = context + new_text
+        self.verified = result
+        self.covered = end
+        self.snapshot = current_attributes
+        self.sweeps += 1
+        return sent
+
+    @asynccontextmanager
+    async def _slot(self, lane):
+        async with lane.slot():
+            self._calling = lane is speculative_sweep_lane
+            try:
+                yield
+            finally:
+                self._calling = False
@@ -0,0 +1,124 @@
+import os
+
+# "chunks" flushes after a fixed number of chunks (the original behaviour);
+# "adaptive" flushes on buffered duration, size, a wall-clock deadline or a pause in speech.
+FLUSH_POLICY = os.getenv("FLUSH_POLICY", "chunks")
+
+MIN_CHUNK_NUM = int(os.getenv("MIN_CHUNK_NUM", "8"))
+FLUSH_MIN_SPEECH = float(os.getenv("FLUSH_MIN_SPEECH", "2.0"))          # Seconds of speech before a pause may flush
+FLUSH_PAUSE = float(os.getenv("FLUSH_PAUSE", "0.8"))                     # Trailing silence that counts as a pause
+FLUSH_MAX_DURATION = float(os.getenv("FLUSH_MAX_DURATION", "8.0"))       # Buffered audio that always flushes
+FLUSH_MAX_BYTES = int(os.getenv("FLUSH_MAX_BYTES", str(512 * 1024)))
+FLUSH_DEADLINE = float(os.getenv("FLUSH_DEADLINE", "10.0"))              # Wall-clock age of the oldest chunk
+FLUSH_SILENCE_RATE = float(os.getenv("FLUSH_SILENCE_RATE", "1500"))      # Bytes/s below which a chunk is silence
+FLUSH_MAX_CHUNK_GAP = float(os.getenv("FLUSH_MAX_CHUNK_GAP", "2.0"))     # Cap on one chunk's estimated duration
+
+WAIT, FLUSH, DROP = "wait", "flush", "drop"
+
+class FlushWindow:
+    """Running statistics of the audio buffered since the last flush."""
+
+    def __init__(self):
+        self.last_chunk_at = None
+        self.reset()
+
+    def reset(self):
+        self.nchunks = 0
+        self.nbytes = 0
+        self.duration = 0.0
+        self.speech = 0.0
+        self.trailing_silence = 0.0
+        self.started_at = None
+
+    def add(self, nbytes, now, policy):
+        """
+        Record a chunk. Its duration is estimated from the gap since the previous chunk (recorders
+        emit on a fixed timeslice), and the policy classifies it as speech or silence from its bitrate.
+        """
+        interval = 0.0 if self.last_chunk_at is None else min(now - self.last_chunk_at, FLUSH_MAX_CHUNK_GAP)
+        self.last_chunk_at = now
+        if self.started_at is None:
+            self.started_at = now
+        self.nchunks += 1
+        self.nbytes += nbytes
+        self.duration += interval
+        if policy.is_silent(nbytes, interval):
+            self.trailing_silence += interval
+        else:
+            self.speech += interval
+            self.trailing_silence = 0.0
+
+class FlushPolicy:
+    """Decides, after each chunk, whether to wait, flush the window to Whisper or drop it."""
+    name = "base"
+
+    def is_silent(self, nbytes, interval):
+        return False
+
+    def decide(self, window, now):
+        raise NotImplementedError
+
+    def deadline_at(self, window):
+        """Monotonic time at which `decide` may change its answer without another chunk, or None."""
+        return None
+
+    def decide_at_stop(self, window):
+        """Whatever is buffered when recording stops is flushed, unless it is known to be only silence."""
+        if window.nchunks == 0 or (window.speech == 0 and window.trailing_silence > 0):
+            return DROP
+        return FLUSH
+
+class ChunkCountPolicy(FlushPolicy):
+    """Flush after a fixed number of chunks, however long or silent they are."""
+    name = "chunks"
+
+    def __init__(self, min_chunks=MIN_CHUNK_NUM):
+        self.min_chunks = min_chunks
+
+    def decide(self, window, now):
+        return FLUSH if window.nchunks >= self.min_chunks else WAIT
+
+class AdaptivePolicy(FlushPolicy):
+    """
+    Flush at the first pause after enough speech, or when the window reaches its duration, size or
+    wall-clock deadline. Windows that contain no speech at all are dropped instead of transcribed.
+    """
+    name = "adaptive"
+
+    def __init__(self, min_speech=FLUSH_MIN_SPEECH, pause=FLUSH_PAUSE, max_duration=FLUSH_MAX_DURATION,
+                 max_bytes=FLUSH_MAX_BYTES, deadline=FLUSH_DEADLINE, silence_rate=FLUSH_SILENCE_RATE):
+        self.min_speech = min_speech
+        self.pause = pause
+        self.max_duration = max_duration
+        self.max_bytes = max_bytes
+        self.deadline = deadline
+        self.silence_rate = silence_rate
+
+    def is_silent(self, nbytes, interval):
+        return interval > 0 and nbytes / interval < self.silence_rate
+
+    def decide(self, window, now):
+        if window.nchunks == 0:
+            return WAIT
+        if window.speech >= self.min_speech and window.trailing_silence >= self.pause:
+            return FLUSH
+        full = (
+            window.duration >= self.max_duration
+            or window.nbytes >= self.max_bytes
+            or now - window.started_at >= self.deadline
+        )
+        if full:
+            return FLUSH if window.speech > 0 else DROP
+        return WAIT
+
+    def deadline_at(self, window):
+        # A recorder that stops sending (paused, network stall) must not hold its audio back forever
+        return None if window.nchunks == 0 else window.started_at + self.deadline
+
+POLICIES = {
+    ChunkCountPolicy.name: ChunkCountPolicy,
+    AdaptivePolicy.name: AdaptivePolicy,
+}
+
+def make_flush_policy(name=FLUSH_POLICY):
+    return POLICIES[name]()
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from .models import Form
+from .serializers import FormDetailSerializer
+
+FORM_CACHE_SIZE = int(os.getenv("FORM_CACHE_SIZE", "256"))
+# Signals only reach this process, so other workers' copies are trusted for at most this long.
+FORM_TEMPLATE_CACHE_TTL = float(os.getenv("FORM_TEMPLATE_CACHE_TTL", "60"))
+FORM_DETAIL_CACHE_TTL = float(os.getenv("FORM_DETAIL_CACHE_TTL", "60"))
+
+class FormTemplate:
+    """
+    Compiled form template: the flat field list used by the transcription consumer
+    and its prompt-ready serialisation.
+    """
+    __slots__ = ("form_id", "user_id", "form_name", "fields", "prompt", "expires")
+
+    def __init__(self, form, ttl=FORM_TEMPLATE_CACHE_TTL):
+        self.form_id = form.id
+        self.user_id = form.user_id
+        self.form_name = form.form_name
+        self.fields = [
+            {
+                "block_name": block.block_name,
+                "field_name": field.field_name,
+                "field_type": field.field_type
+            }
+            for block in form.blocks.all()
+            for field in block.fields.all()
+        ]
+        self.prompt = json.dumps(self.fields)
+        self.expires = time.monotonic() + ttl
+
+    def candidate_attributes(self, current_attributes):
+        """Field list for the final sweep, annotated with each field's current value."""
+        return [
+            {**field, "current_value": current_attributes.get(field["field_name"], "N/A")}
+            for field in self.fields
+        ]
+
+class FormTemplateCache:
+    """
+    In-process LRU cache of compiled form templates keyed by form id.
+    Misses load the form, its blocks and fields with a single prefetched queryset;
+    entries are dropped by the signal handlers in api/signals.py when the form changes,
+    and expired after `ttl` in case the change happened in another worker.
+    """
+
+    def __init__(self, maxsize=FORM_CACHE_SIZE, ttl=FORM_TEMPLATE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, form_id):
+        with self._lock:
+            template = self._entries.get(form_id)
+            if template is not None and template.expires > time.monotonic():
+                self._entries.move_to_end(form_id)
+                return template
+        return None
+
+    def get(self, form_id):
+        form_id = int(form_id)
+        template = self._cached(form_id)
+        if template is not None:
+            return template
+
+        form = Form.objects.prefetch_related("blocks__fields").get(id=form_id)
+        template = FormTemplate(form, self.ttl)
+        with self._lock:
+            self._entries[form_id] = template
+            self._entries.move_to_end(form_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return template
+
+    async def aget(self, form_id):
+        """Async lookup; hot forms are served from memory without leaving the event loop."""
+        template = self._cached(int(form_id))
+        if template is not None:
+            return template
+        return await sync_to_async(self.get)(form_id)
+
+    def invalidate(self, form_id):
+        with self._lock:
+            self._entries.pop(int(form_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+form_templates = FormTemplateCache()
+
+class FormDetail:
+    """Serialised FormDetailView payload for one version of a form."""
+    __slots__ = ("form_id", "user_id", "version", "etag", "body", "expires")
+
+    def __init__(self, form, body, ttl):
+        self.form_id = form.id
+        self.user_id = form.user_id
+        self.version = form.version
+        self.etag = f'"{form.id}-{form.version}"'
+        self.body = body
+        self.expires = time.monotonic() + ttl
+
+class FormDetailCache:
+    """
+    In-process LRU cache of the JSON FormDetailView returns, keyed by form id, so repeated opens
+    skip the database and the nested serialisation. Dropped by the signal handlers in api/signals.py
+    when the form changes, and expired after `ttl` in case the change happened in another worker.
+    """
+
+    def __init__(self, maxsize=FORM_CACHE_SIZE, ttl=FORM_DETAIL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, form_id):
+        form_id = int(form_id)
+        with self._lock:
+            detail = self._entries.get(form_id)
+            if detail is not None and detail.expires > time.monotonic():
+                self._entries.move_to_end(form_id)
+                return detail
+
+        form = Form.objects.prefetch_related("blocks__fields").get(id=form_id)
+        body = json.dumps(FormDetailSerializer(form).data, separators=(",", ":"), ensure_ascii=False).encode()
+        detail = FormDetail(form, body, self.ttl)
+        with self._lock:
+            self._entries[form_id] = detail
+            self._entries.move_to_end(form_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return detail
+
+    def invalidate(self, form_id):
+        with self._lock:
+            self._entries.pop(int(form_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+form_details = FormDetailCache()
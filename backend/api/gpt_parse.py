@@ -3,12 +3,23 @@ import math
 import json
 import os
 from typing import List, Dict
-import openai
-import asyncio
+from openai import AsyncOpenAI
 from pydantic import BaseModel
+from .llm_cache import response_cache
+from .streaming import PartialAttributeParser
+from .prompting import extractionContext, reportPromptTokens
+from .http_client import OPENAI_BASE_URL, get_http_client, get_timeout
 
-# Set the OpenAI API key.
-openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Async client on the shared, pooled HTTP connection layer.
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=OPENAI_BASE_URL,
+    http_client=get_http_client(),
+    timeout=get_timeout(),
+)
+
+# "sequential" revises then extracts in two calls; "combined" does both in one structured call.
+GPT_PARSE_MODE = os.getenv("GPT_PARSE_MODE", "sequential")
 
 # --------------------
 # 1) Pydantic Models
@@ -31,10 +42,22 @@ class FinalAttributeExtractionResponse(BaseModel):
     """
     finalAttributes: Dict[str, str]
 
+class TranscriptSummaryResponse(BaseModel):
+    """Model for rolling compaction - the updated summary of the earlier transcript."""
+    summary: str
+
+class CombinedParseResponse(BaseModel):
+    """
+    Model for the combined mode - steps 2, 3 & 4 answered by a single structured call.
+    Carries the corrected transcription together with the extracted { attribute_name: value } pairs.
+    """
+    correctedText: str
+    parsedAttributes: Dict[str, str]
+
 # --------------------
 # 2) Step 2: Revise Transcribed Text
 # --------------------
-def reviseTranscription(rawText: str) -> str:
+async def reviseTranscription(rawText: str) -> str:
     """
     Takes the raw transcribed text (possibly with errors) and uses GPT to refine it.
     Returns the corrected transcription and the token usage for this request.
@@ -49,7 +72,8 @@ Do not include any markdown formatting, code fences, or extra characters; return
 """
 
     start_time = time.time()
-    completion = openai.chat.completions.create(
+    response_text, usage = await response_cache.complete(
+        client,
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": systemMessage},
@@ -58,8 +82,6 @@ Do not include any markdown formatting, code fences, or extra characters; return
         max_tokens=100,
         temperature=0.0,
     )
-
-    response_text = completion.choices[0].message.content
     
     try:
         parsed_response = TranscriptionRevisionResponse.parse_raw(response_text)
@@ -72,14 +94,9 @@ Do not include any markdown formatting, code fences, or extra characters; return
 # --------------------
 # 3) Step 3: Extract/Revise Attributes into JSON
 # --------------------
-def extractAttributesFromText(correctedText: str, currentAttributes: dict, templateAttributes: List[str]) -> Dict[str, str]:
-    """
-    Takes the refined transcription, the current recorded attributes, and a list of attribute names.
-    Uses GPT to compare the values found in the corrected transcription with the current recorded values.
-    If the transcription contains a more accurate or appropriate value for an attribute, it should replace the current value.
-    Returns a dictionary of { attribute: value } as a JSON object with the key "parsedAttributes".
-    """
-    systemMessage = f"""
+def attributeExtractionPrompt(attributesToFind, currentRecorded) -> str:
+    """System message shared by the blocking and streaming attribute extraction calls."""
+    return f"""
 You are an attribute extraction assistant specialized for an Australian environment.
 This tool is used primarily in Finance, Healthcare, Social Work, and Human Resource contexts.
 You are provided with:
@@ -92,12 +109,28 @@ For each attribute:
 - If no relevant value is found in the transcription, do not include that attribute in your result.
 Return your result as a pure JSON object with the key "parsedAttributes" mapping each attribute to its final selected value.
 Do not include any markdown formatting, code fences, or extra characters.
-Attributes to find: {templateAttributes}
-Current Recorded Attributes: {json.dumps(currentAttributes, indent=2)}
+A recorded attribute missing from the attributes to find may still be corrected; return it under the same name.
+Attributes to find: {attributesToFind}
+Current Recorded Attributes: {currentRecorded}
 """
 
+async def extractAttributesFromText(correctedText: str, currentAttributes: dict, templateAttributes: List[str]) -> Dict[str, str]:
+    """
+    Takes the refined transcription, the current recorded attributes, and a list of attribute names.
+    Uses GPT to compare the values found in the corrected transcription with the current recorded values.
+    If the transcription contains a more accurate or appropriate value for an attribute, it should replace the current value.
+    Returns a dictionary of { attribute: value } as a JSON object with the key "parsedAttributes".
+    In incremental mode only fields still empty or touched by the text are sent, compactly encoded.
+    """
+    attributesToFind, currentRecorded, fieldCount = extractionContext(correctedText, currentAttributes, templateAttributes)
+    if fieldCount == 0:
+        return {}
+
+    systemMessage = attributeExtractionPrompt(attributesToFind, currentRecorded)
+
     start_time = time.time()
-    completion = openai.chat.completions.create(
+    response_text, usage = await response_cache.complete(
+        client,
         model="gpt-4o-mini", 
         messages=[
             {"role": "system", "content": systemMessage},
@@ -107,7 +140,7 @@ Current Recorded Attributes: {json.dumps(currentAttributes, indent=2)}
         temperature=0.0,
     )
 
-    response_text = completion.choices[0].message.content
+    reportPromptTokens("extractAttributesFromText", usage, fieldCount, attributesToFind, currentRecorded, currentAttributes, templateAttributes)
     
     try:
         parsed_response = AttributeExtractionResponse.parse_raw(response_text)
@@ -117,12 +150,46 @@ Current Recorded Attributes: {json.dumps(currentAttributes, indent=2)}
     
     return parsed_response.parsedAttributes
 
+async def streamAttributesFromText(correctedText: str, currentAttributes: dict, templateAttributes: List[str]):
+    """
+    Streaming variant of extractAttributesFromText.
+    Reads the chat completion as it is generated and yields (attribute, value) pairs
+    as soon as each value is complete in the partial JSON.
+    """
+    attributesToFind, currentRecorded, fieldCount = extractionContext(correctedText, currentAttributes, templateAttributes)
+    if fieldCount == 0:
+        return
+
+    start_time = time.monotonic()
+    stream = await client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": attributeExtractionPrompt(attributesToFind, currentRecorded)},
+            {"role": "user", "content": correctedText},
+        ],
+        max_tokens=200,
+        temperature=0.0,
+        stream=True,
+    )
+
+    parser = PartialAttributeParser()
+    first = True
+    async for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        for name, value in parser.feed(chunk.choices[0].delta.content):
+            if first:
+                print(f"streamAttributesFromText: first field after {(time.monotonic() - start_time) * 1000:.0f} ms")
+                first = False
+            yield name, value
+
 
 async def parseFinalAttributes(fullTranscript: str, candidateAttributes: list[dict]) -> dict:
     """
     Given the full transcript and a list of candidate attribute dictionaries extracted over multiple rounds,
     use the OpenAI API to determine the most appropriate value for each attribute based on the transcript context.
     Returns a dictionary mapping each attribute name to its final selected value.
+    Errors propagate so the provider router can hedge; api/providers.py applies the fallback.
     """
     system_message = f"""
 You are an attribute extraction revision assistant designed to verify and correct structured data extracted from spoken text. 
@@ -144,38 +211,161 @@ Candidate Attributes:
 {json.dumps(candidateAttributes, indent=2)}
 """
 
+    response_text, usage = await response_cache.complete(
+        client,
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": system_message}
+        ],
+        temperature=0.0,
+        max_tokens=1000
+    )
+    # Parse the response using your validation model.
+    parsed_response = FinalAttributeExtractionResponse.parse_raw(response_text)
+    verified_attributes = parsed_response.finalAttributes
+    return verified_attributes
+
+async def parseFinalAttributesDelta(precedingContext: str, newTranscript: str, candidateAttributes: list[dict]) -> dict:
+    """
+    Incremental final sweep: the candidate values have already been verified against the transcript
+    up to `precedingContext`, so only the newly arrived portion of the transcript is reviewed.
+    Fields the new portion does not address keep their verified value.
+    Returns a dictionary mapping each attribute name to its final selected value; errors propagate as above.
+    """
+    system_message = f"""
+You are an attribute extraction revision assistant designed to verify and correct structured data extracted from spoken text.
+The candidate attribute values below have already been verified against the earlier part of a meeting transcript
+(or conversation between a professional and a client). You are given the end of that earlier part for context,
+followed by the new portion of the transcript that has not been reviewed yet.
+
+Review only the new portion and determine the final, most appropriate value for each attribute. For each field:
+- If the new portion corrects, completes or contradicts the current value, provide the most correct value.
+- Otherwise keep the current value exactly as given, including 'N/A'.
+
+Return your result as a pure JSON object with a single key "finalAttributes" mapping each field name to its final verified value.
+Do not include any markdown formatting, code fences, or extra characters.
+
+Earlier context:
+{precedingContext}
+
+New portion of the transcript:
+{newTranscript}
+
+Candidate Attributes:
+{json.dumps(candidateAttributes, indent=2)}
+"""
+
+    response_text, usage = await response_cache.complete(
+        client,
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": system_message}
+        ],
+        temperature=0.0,
+        max_tokens=1000
+    )
+    parsed_response = FinalAttributeExtractionResponse.parse_raw(response_text)
+    return parsed_response.finalAttributes
+
+# --------------------
+# 3a) Rolling Transcript Summary
+# --------------------
+async def summariseTranscript(previousSummary: str, transcriptText: str, fieldNames: List[str], maxChars: int):
+    """
+    Folds a stretch of transcript into the running summary of the conversation so far.
+    Everything that bears on a form field (values, corrections, spellings, dates and numbers) is kept
+    verbatim; the rest is condensed. Returns the updated summary, or None if the call fails.
+    """
+    systemMessage = f"""
+You maintain a running summary of a long meeting (or conversation between a professional and a client) whose
+transcript is used to fill in a form. You are given the current summary and the next part of the transcript.
+Return an updated summary that covers both, in at most {maxChars} characters.
+
+- Keep every statement that gives, corrects or spells out a value for one of these form fields, with the exact wording
+  of the value (names, dates, numbers, addresses): {", ".join(fieldNames)}
+- If a later statement corrects an earlier one, keep only the corrected value and note that it was corrected.
+- Condense everything else to brief notes, and do not invent information.
+
+Return the result as a JSON object with the key "summary".
+Do not include any markdown formatting, code fences, or extra characters; return pure JSON.
+"""
+    userMessage = f"Current summary:\n{previousSummary or '(none)'}\n\nNext part of the transcript:\n{transcriptText}"
+
     try:
-        loop = asyncio.get_event_loop()
-        # Call the OpenAI API in an executor so as not to block the event loop.
-        response = await loop.run_in_executor(
-            None,
-            lambda: openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_message}
-                ],
-                temperature=0.0,
-                max_tokens=1000
-            )
+        response_text, usage = await response_cache.complete(
+            client,
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": systemMessage},
+                {"role": "user", "content": userMessage},
+            ],
+            temperature=0.0,
+            max_tokens=maxChars // 3
         )
-        response_text = response.choices[0].message.content
-        # Parse the response using your validation model.
-        parsed_response = FinalAttributeExtractionResponse.parse_raw(response_text)
-        verified_attributes = parsed_response.finalAttributes
-        return verified_attributes
-    except json.JSONDecodeError as e:
-        print("JSON decode error during final sweep:", e)
+        return TranscriptSummaryResponse.parse_raw(response_text).summary
     except Exception as e:
-        print("Error during final sweep with OpenAI API:", e)
-    
-    # Fallback: return candidate attributes mapped to their current_value
-    fallback_attributes = {attr["field_name"]: attr["current_value"] for attr in candidateAttributes}
-    return fallback_attributes
+        print("Error summarising transcript with OpenAI API:", e)
+        return None
+
+# --------------------
+# 3b) Combined Mode: Revise and Extract in One Call
+# --------------------
+async def reviseAndExtractAttributes(prevText: str, rawText: str, currentAttributes: dict, templateAttributes: List[str]):
+    """
+    Corrects the raw transcription and extracts attribute values from it in a single structured call,
+    saving the second round trip of the sequential mode.
+    Returns a tuple of (correctedText, parsedAttributes).
+    """
+    attributesToFind, currentRecorded, fieldCount = extractionContext(prevText + rawText, currentAttributes, templateAttributes)
+
+    systemMessage = f"""
+You are a transcription editor and attribute extraction assistant working in a professional, Australian context
+where meetings often involve topics in finance, healthcare, social work and human resources.
+You are provided with:
+1. The previous portion of the transcript, for context only.
+2. A newly transcribed segment that may contain errors.
+3. A list of attributes to extract.
+4. The current recorded attribute values.
+First, correct the errors in the new segment for clarity and accuracy while preserving its original meaning and formal tone.
+Do not include the previous portion in the corrected text.
+Then, using the previous portion and the corrected segment, for each attribute:
+- If the text contains a value that is more accurate or contextually appropriate than the current recorded value, return the new value.
+- If the current recorded value is more suitable, retain it.
+- If no relevant value is found, do not include that attribute in your result.
+Return a pure JSON object with the key "correctedText" holding the corrected segment and the key "parsedAttributes"
+mapping each attribute to its final selected value.
+Do not include any markdown formatting, code fences, or extra characters.
+A recorded attribute missing from the attributes to find may still be corrected; return it under the same name.
+Attributes to find: {attributesToFind}
+Current Recorded Attributes: {currentRecorded}
+"""
+
+    response_text, usage = await response_cache.complete(
+        client,
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": systemMessage},
+            {"role": "user", "content": f"Previous portion:\n{prevText}\n\nNew segment:\n{rawText}"},
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=300,
+        temperature=0.0,
+    )
+
+    reportPromptTokens("reviseAndExtractAttributes", usage, fieldCount, attributesToFind, currentRecorded, currentAttributes, templateAttributes)
+
+    try:
+        parsed_response = CombinedParseResponse.parse_raw(response_text)
+    except Exception as e:
+        print("Error parsing JSON in reviseAndExtractAttributes:", e)
+        parsed_response = CombinedParseResponse(correctedText=rawText, parsedAttributes={})
+
+    return parsed_response.correctedText, parsed_response.parsedAttributes
 
 # --------------------
 # 4) Orchestrator: Steps 2–6
 # --------------------
-def parseTranscribedText(prevtranscribedText:str, transcribedText: str, currentAttributes: dict, templateAttributes: List[str]):
+async def parseTranscribedText(prevtranscribedText:str, transcribedText: str, currentAttributes: dict, templateAttributes: List[str]):
     """
     High-level function that:
     (1) Revises the transcription (Step 2).
@@ -183,14 +373,38 @@ def parseTranscribedText(prevtranscribedText:str, transcribedText: str, currentA
     (3) Returns the final JSON object with the found attributes (Step 5).
     (4) Revise final full transcript (Step 6) if needed.
     In your actual flow, you might convert this JSON to PDF.
+    With GPT_PARSE_MODE=combined, steps 2-4 are answered by one structured call instead.
     """
+    if GPT_PARSE_MODE == "combined":
+        return await reviseAndExtractAttributes(prevtranscribedText, transcribedText, currentAttributes, templateAttributes)
+
     # Step 2: Revise the transcription.
-    correctedText = reviseTranscription(transcribedText)
+    correctedText = await reviseTranscription(transcribedText)
     
     # Step 3 & 4: Extract attributes.
     correctedTextInContext = prevtranscribedText + correctedText
-    parsedAttributes = extractAttributesFromText(correctedTextInContext, currentAttributes, templateAttributes)
+    parsedAttributes = await extractAttributesFromText(correctedTextInContext, currentAttributes, templateAttributes)
     
     # Step 5: Return the results.
     return correctedText, parsedAttributes
     
+
+async def streamTranscribedText(prevtranscribedText: str, transcribedText: str, currentAttributes: dict, templateAttributes: List[str], onAttribute):
+    """
+    Streaming orchestrator: revises the transcription, then streams attribute extraction,
+    awaiting onAttribute(name, value) for every value as soon as it completes.
+    Returns (correctedText, parsedAttributes) like parseTranscribedText, for reconciliation.
+    """
+    correctedText = await reviseTranscription(transcribedText)
+
+    parsedAttributes = {}
+    try:
+        async for name, value in streamAttributesFromText(prevtranscribedText + correctedText, currentAttributes, templateAttributes):
+            parsedAttributes[name] = value
+            await onAttribute(name, value)
+    except Exception as e:
+        # As in the blocking path, a bad answer costs only its attributes: the corrected text and
+        # the pairs already pushed as partials are still returned for the reconciling message.
+        print("Error streaming attributes in streamTranscribedText:", e)
+
+    return correctedText, parsedAttributes
@@ -1,12 +1,20 @@
+import time
 import json
 import os
 from typing import List, Dict, Any
-from groq import Groq
+from groq import AsyncGroq
 from pydantic import BaseModel
+from .llm_cache import response_cache
+from .streaming import PartialAttributeParser
+from .prompting import extractionContext, reportPromptTokens
+from .http_client import GROQ_BASE_URL, get_http_client, get_timeout
 
-# Create a global Groq client and usage counter.
-client = Groq(
-    api_key=os.getenv("GROQ_API_KEY")
+# Create a global async Groq client on the shared, pooled HTTP connection layer.
+client = AsyncGroq(
+    api_key=os.getenv("GROQ_API_KEY"),
+    base_url=GROQ_BASE_URL,
+    http_client=get_http_client(),
+    timeout=get_timeout(),
 )
 # --------------------
 # 1) Pydantic Models
@@ -29,10 +37,14 @@ class FinalAttributeExtractionResponse(BaseModel):
     """
     finalAttributes: Dict[str, str]
 
+class TranscriptSummaryResponse(BaseModel):
+    """Model for rolling compaction - the updated summary of the earlier transcript."""
+    summary: str
+
 # --------------------
 # 2) Step 2: Revise Transcribed Text
 # --------------------
-def reviseTranscription(rawText: str) -> str:
+async def reviseTranscription(rawText: str) -> str:
     """
     Takes the raw transcribed text (possibly with errors) and uses GPT to refine it.
     Returns the corrected transcription.
@@ -44,7 +56,8 @@ Your job is to correct these errors for clarity and accuracy while preserving th
 and the formal tone expected in these settings. Return the corrected text as a JSON object with the key "correctedText". 
 Do not include any markdown formatting, code fences, or extra characters; return pure JSON.
 """
-    completion = client.chat.completions.create(
+    response_text, usage = await response_cache.complete(
+        client,
         model="llama-3.3-70b-versatile",
         messages=[
             {"role": "system", "content": systemMessage},
@@ -53,7 +66,6 @@ Do not include any markdown formatting, code fences, or extra characters; return
         max_tokens=100,
         temperature=0.0,
     )
-    response_text = completion.choices[0].message.content
     try:
         parsed_response = TranscriptionRevisionResponse.parse_raw(response_text)
     except Exception as e:
@@ -64,14 +76,9 @@ Do not include any markdown formatting, code fences, or extra characters; return
 # --------------------
 # 3) Step 3: Extract/Revise Attributes into JSON
 # --------------------
-def extractAttributesFromText(correctedText: str, currentAttributes: dict, templateAttributes: List[str]) -> Dict[str, str]:
-    """
-    Takes the refined transcription, the current recorded attributes, and a list of attribute names.
-    Uses GPT to compare the values found in the corrected transcription with the current recorded values.
-    If the transcription contains a more accurate or contextually appropriate value for an attribute, it should replace the current value.
-    Returns a dictionary of { attribute: value } as a JSON object with the key "parsedAttributes".
-    """
-    systemMessage = f"""
+def attributeExtractionPrompt(attributesToFind, currentRecorded) -> str:
+    """System message shared by the blocking and streaming attribute extraction calls."""
+    return f"""
 You are an attribute extraction assistant specialized for an Australian environment.
 This tool is used primarily in Finance, Healthcare, Social Work, and Human Resource contexts.
 You are provided with:
@@ -84,10 +91,26 @@ For each attribute:
 - If no relevant value is found in the transcription, do not include that attribute in your result.
 Return your result as a pure JSON object with the key "parsedAttributes" mapping each attribute to its final selected value.
 Do not include any markdown formatting, code fences, or extra characters.
-Attributes to find: {templateAttributes}
-Current Recorded Attributes: {json.dumps(currentAttributes, indent=2)}
+A recorded attribute missing from the attributes to find may still be corrected; return it under the same name.
+Attributes to find: {attributesToFind}
+Current Recorded Attributes: {currentRecorded}
 """
-    completion = client.chat.completions.create(
+
+async def extractAttributesFromText(correctedText: str, currentAttributes: dict, templateAttributes: List[str]) -> Dict[str, str]:
+    """
+    Takes the refined transcription, the current recorded attributes, and a list of attribute names.
+    Uses GPT to compare the values found in the corrected transcription with the current recorded values.
+    If the transcription contains a more accurate or contextually appropriate value for an attribute, it should replace the current value.
+    Returns a dictionary of { attribute: value } as a JSON object with the key "parsedAttributes".
+    In incremental mode only fields still empty or touched by the text are sent, compactly encoded.
+    """
+    attributesToFind, currentRecorded, fieldCount = extractionContext(correctedText, currentAttributes, templateAttributes)
+    if fieldCount == 0:
+        return {}
+
+    systemMessage = attributeExtractionPrompt(attributesToFind, currentRecorded)
+    response_text, usage = await response_cache.complete(
+        client,
         model="llama-3.3-70b-versatile", 
         messages=[
             {"role": "system", "content": systemMessage},
@@ -96,7 +119,7 @@ Current Recorded Attributes: {json.dumps(currentAttributes, indent=2)}
         max_tokens=200,
         temperature=0.0,
     )
-    response_text = completion.choices[0].message.content
+    reportPromptTokens("extractAttributesFromText", usage, fieldCount, attributesToFind, currentRecorded, currentAttributes, templateAttributes)
     try:
         parsed_response = AttributeExtractionResponse.parse_raw(response_text)
     except Exception as e:
@@ -104,6 +127,39 @@ Current Recorded Attributes: {json.dumps(currentAttributes, indent=2)}
         parsed_response = AttributeExtractionResponse(parsedAttributes={})
     return parsed_response.parsedAttributes
 
+async def streamAttributesFromText(correctedText: str, currentAttributes: dict, templateAttributes: List[str]):
+    """
+    Streaming variant of extractAttributesFromText.
+    Reads the chat completion as it is generated and yields (attribute, value) pairs
+    as soon as each value is complete in the partial JSON.
+    """
+    attributesToFind, currentRecorded, fieldCount = extractionContext(correctedText, currentAttributes, templateAttributes)
+    if fieldCount == 0:
+        return
+
+    start_time = time.monotonic()
+    stream = await client.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {"role": "system", "content": attributeExtractionPrompt(attributesToFind, currentRecorded)},
+            {"role": "user", "content": correctedText},
+        ],
+        max_tokens=200,
+        temperature=0.0,
+        stream=True,
+    )
+
+    parser = PartialAttributeParser()
+    first = True
+    async for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        for name, value in parser.feed(chunk.choices[0].delta.content):
+            if first:
+                print(f"streamAttributesFromText: first field after {(time.monotonic() - start_time) * 1000:.0f} ms")
+                first = False
+            yield name, value
+
 # --------------------
 # 4) Final Attribute Extraction (Asynchronous)
 # --------------------
@@ -112,6 +168,7 @@ async def parseFinalAttributes(fullTranscript: str, candidateAttributes: list[di
     Given the full transcript and a list of candidate attribute dictionaries extracted over multiple rounds,
     use the OpenAI API to determine the most appropriate value for each attribute based on the transcript context.
     Returns a dictionary mapping each attribute name to its final selected value.
+    Errors propagate so the provider router can hedge; api/providers.py applies the fallback.
     """
     system_message = f"""
 You are an attribute extraction revision assistant designed to verify and correct structured data extracted from spoken text. 
@@ -132,34 +189,105 @@ Transcript:
 Candidate Attributes:
 {json.dumps(candidateAttributes, indent=2)}
 """
+    response_text, usage = await response_cache.complete(
+        client,
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {"role": "system", "content": system_message}
+        ],
+        temperature=0.0,
+        max_tokens=1000
+    )
+    parsed_response = FinalAttributeExtractionResponse.parse_raw(response_text)
+    verified_attributes = parsed_response.finalAttributes
+    return verified_attributes
+
+async def parseFinalAttributesDelta(precedingContext: str, newTranscript: str, candidateAttributes: list[dict]) -> dict:
+    """
+    Incremental final sweep: the candidate values have already been verified against the transcript
+    up to `precedingContext`, so only the newly arrived portion of the transcript is reviewed.
+    Fields the new portion does not address keep their verified value.
+    Returns a dictionary mapping each attribute name to its final selected value; errors propagate as above.
+    """
+    system_message = f"""
+You are an attribute extraction revision assistant designed to verify and correct structured data extracted from spoken text.
+The candidate attribute values below have already been verified against the earlier part of a meeting transcript
+(or conversation between a professional and a client). You are given the end of that earlier part for context,
+followed by the new portion of the transcript that has not been reviewed yet.
+
+Review only the new portion and determine the final, most appropriate value for each attribute. For each field:
+- If the new portion corrects, completes or contradicts the current value, provide the most correct value.
+- Otherwise keep the current value exactly as given, including 'N/A'.
+
+Return your result as a pure JSON object with a single key "finalAttributes" mapping each field name to its final verified value.
+Do not include any markdown formatting, code fences, or extra characters.
+
+Earlier context:
+{precedingContext}
+
+New portion of the transcript:
+{newTranscript}
+
+Candidate Attributes:
+{json.dumps(candidateAttributes, indent=2)}
+"""
+
+    response_text, usage = await response_cache.complete(
+        client,
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {"role": "system", "content": system_message}
+        ],
+        temperature=0.0,
+        max_tokens=1000
+    )
+    parsed_response = FinalAttributeExtractionResponse.parse_raw(response_text)
+    return parsed_response.finalAttributes
+
+# --------------------
+# 4b) Rolling Transcript Summary
+# --------------------
+async def summariseTranscript(previousSummary: str, transcriptText: str, fieldNames: List[str], maxChars: int):
+    """
+    Folds a stretch of transcript into the running summary of the conversation so far.
+    Everything that bears on a form field (values, corrections, spellings, dates and numbers) is kept
+    verbatim; the rest is condensed. Returns the updated summary, or None if the call fails.
+    """
+    systemMessage = f"""
+You maintain a running summary of a long meeting (or conversation between a professional and a client) whose
+transcript is used to fill in a form. You are given the current summary and the next part of the transcript.
+Return an updated summary that covers both, in at most {maxChars} characters.
+
+- Keep every statement that gives, corrects or spells out a value for one of these form fields, with the exact wording
+  of the value (names, dates, numbers, addresses): {", ".join(fieldNames)}
+- If a later statement corrects an earlier one, keep only the corrected value and note that it was corrected.
+- Condense everything else to brief notes, and do not invent information.
+
+Return the result as a JSON object with the key "summary".
+Do not include any markdown formatting, code fences, or extra characters; return pure JSON.
+"""
+    userMessage = f"Current summary:\n{previousSummary or '(none)'}\n\nNext part of the transcript:\n{transcriptText}"
+
     try:
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": system_message}
-                ],
-                temperature=0.0,
-                max_tokens=1000
-            )
+        response_text, usage = await response_cache.complete(
+            client,
+            model="llama-3.3-70b-versatile",
+            messages=[
+                {"role": "system", "content": systemMessage},
+                {"role": "user", "content": userMessage},
+            ],
+            temperature=0.0,
+            max_tokens=maxChars // 3
         )
-        response_text = response.choices[0].message.content
-        parsed_response = FinalAttributeExtractionResponse.parse_raw(response_text)
-        verified_attributes = parsed_response.finalAttributes
-        return verified_attributes
-    except json.JSONDecodeError as e:
-        print("JSON decode error during final sweep:", e)
+        return TranscriptSummaryResponse.parse_raw(response_text).summary
     except Exception as e:
-        print("Error during final sweep with OpenAI API:", e)
-    fallback_attributes = {attr["field_name"]: attr["current_value"] for attr in candidateAttributes}
-    return fallback_attributes
+        print("Error summarising transcript with Groq API:", e)
+        return None
 
 # --------------------
 # 5) Orchestrator: Steps 2–6
 # --------------------
-def parseTranscribedText(transcribedText: str, currentAttributes: dict, templateAttributes: List[str]):
+async def parseTranscribedText(prevtranscribedText: str, transcribedText: str, currentAttributes: dict, templateAttributes: List[str]):
     """
     High-level function that:
     (1) Revises the transcription (Step 2).
@@ -169,9 +297,30 @@ def parseTranscribedText(transcribedText: str, currentAttributes: dict, template
     In your actual flow, you might convert this JSON to PDF.
     """
     # Step 2: Revise the transcription.
-    correctedText = reviseTranscription(transcribedText)
+    correctedText = await reviseTranscription(transcribedText)
     
     # Step 3 & 4: Extract attributes.
-    parsedAttributes = extractAttributesFromText(correctedText, currentAttributes, templateAttributes)
+    correctedTextInContext = prevtranscribedText + correctedText
+    parsedAttributes = await extractAttributesFromText(correctedTextInContext, currentAttributes, templateAttributes)
     
     return correctedText, parsedAttributes
+
+async def streamTranscribedText(prevtranscribedText: str, transcribedText: str, currentAttributes: dict, templateAttributes: List[str], onAttribute):
+    """
+    Streaming orchestrator: revises the transcription, then streams attribute extraction,
+    awaiting onAttribute(name, value) for every value as soon as it completes.
+    Returns (correctedText, parsedAttributes) like parseTranscribedText, for reconciliation.
+    """
+    correctedText = await reviseTranscription(transcribedText)
+
+    parsedAttributes = {}
+    try:
+        async for name, value in streamAttributesFromText(prevtranscribedText + correctedText, currentAttributes, templateAttributes):
+            parsedAttributes[name] = value
+            await onAttribute(name, value)
+    except Exception as e:
+        # As in the blocking path, a bad answer costs only its attributes: the corrected text and
+        # the pairs already pushed as partials are still returned for the reconciling message.
+        print("Error streaming attributes in streamTranscribedText:", e)
+
+    return correctedText, parsedAttributes
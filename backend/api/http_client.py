@@ -0,0 +1,51 @@
+import os
+from urllib.parse import urlsplit
+import httpx
+
+# Provider endpoints get their own connection pool so one slow provider cannot starve the other.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com")
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))                  # Read/write/pool timeout (s)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))   # TCP + TLS handshake (s)
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "50"))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+_client = None
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def _pooled_transport():
+    return httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        retries=1,  # Retries connection failures only, never a sent request
+    )
+
+def get_timeout():
+    return httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide async HTTP client used for every provider call
+    (Whisper uploads and the OpenAI/Groq SDKs). Connections are pooled and kept alive per host,
+    so concurrent sessions reuse TLS connections instead of handshaking on every flush.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        mounts = {
+            _origin(url): _pooled_transport()
+            for url in (OPENAI_BASE_URL, GROQ_BASE_URL)
+        }
+        _client = httpx.AsyncClient(
+            timeout=get_timeout(),
+            transport=_pooled_transport(),
+            mounts=mounts,
+        )
+    return _client
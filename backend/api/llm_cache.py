@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+import contextvars
+from collections import OrderedDict
+
+# "memory" (in-process LRU), "disk" (SQLite file shared by workers on one node) or "none".
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))            # Seconds an answer stays valid
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_EVICT_INTERVAL = float(os.getenv("LLM_CACHE_EVICT_INTERVAL", "60"))  # Seconds between disk eviction passes
+# "user" keys answers per user; "global" shares them across users (see ResponseCache)
+LLM_CACHE_SCOPE = os.getenv("LLM_CACHE_SCOPE", "user")
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "llm_cache.sqlite3"),
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Set per connection by the consumer; tasks it starts inherit it
+cache_scope = contextvars.ContextVar("llm_cache_scope", default="")
+
+class MemoryBackend:
+    """In-process LRU store with per-entry expiry."""
+    blocking = False
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+class DiskBackend:
+    """
+    SQLite-backed store; survives restarts and is shared by every worker on the node.
+    Calls block on disk, so ResponseCache runs them in a thread. Expired and least recently used rows
+    are evicted at most every `evict_interval` seconds, so the table may briefly exceed `max_entries`.
+    """
+    blocking = True
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, evict_interval=LLM_CACHE_EVICT_INTERVAL):
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires ON llm_cache (expires)")
+        self._evicted_at = 0.0
+        self._entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                return None   # Expired rows are left to the next eviction pass
+            self._db.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            self._entries += 1
+            if now - self._evicted_at >= self.evict_interval:
+                self._evict(now)
+
+    def _evict(self, now):
+        """Drop expired rows, then the least recently used ones beyond the size bound."""
+        self._evicted_at = now
+        self._db.execute("DELETE FROM llm_cache WHERE expires < ?", (now,))
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self._entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def __len__(self):
+        # As of the last write by this process; counting the table here would block the caller
+        return self._entries
+
+class ResponseCache:
+    """
+    Content-addressed cache of chat completion answers.
+    The key is a hash of the model, the (whitespace-normalised) messages and the sampling parameters,
+    so silence chunks, repeated boilerplate and replayed audio skip the provider entirely.
+
+    With LLM_CACHE_SCOPE=user (the default) the key also holds the connection's user (`cache_scope`).
+    Prompts carry transcript text, and a shared answer comes back measurably faster, so a global cache
+    would let one user probe whether another's session contained a given sentence. "global" shares
+    boilerplate across users and accepts that.
+    """
+
+    def __init__(self, backend, ttl=LLM_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(request, scope=""):
+        normalised = dict(request, scope=scope)
+        normalised["messages"] = [
+            {**message, "content": _WHITESPACE.sub(" ", message.get("content", "")).strip()}
+            for message in request.get("messages", [])
+        ]
+        payload = json.dumps(normalised, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def complete(self, client, **request):
+        """
+        Returns (response_text, usage) for a chat completion request.
+        On a hit the provider is not called and usage is None.
+        """
+        if self.backend is None:
+            completion = await client.chat.completions.create(**request)
+            return completion.choices[0].message.content, completion.usage
+
+        key = self.key(request, cache_scope.get() if LLM_CACHE_SCOPE == "user" else "")
+        cached = await self._call(self.backend.get, key)
+        if cached is not None:
+            self.hits += 1
+            return cached, None
+
+        self.misses += 1
+        completion = await client.chat.completions.create(**request)
+        response_text = completion.choices[0].message.content
+        if response_text:
+            await self._call(self.backend.set, key, response_text, self.ttl)
+        return response_text, completion.usage
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": LLM_CACHE_BACKEND,
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+def _make_backend():
+    if LLM_CACHE_BACKEND == "disk":
+        return DiskBackend()
+    if LLM_CACHE_BACKEND == "memory":
+        return MemoryBackend()
+    return None
+
+response_cache = ResponseCache(_make_backend())
@@ -0,0 +1,123 @@
+import time
+import random
+from django.core.management.base import BaseCommand
+from api.audio import AudioUpload
+from api.webm import WebmStream, CLUSTER_ID, SIMPLE_BLOCK_ID, TIMECODE_ID
+
+EBML_SIGNATURE = b"\x1A\x45\xDF\xA3"
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+UPLOAD_READ_SIZE = 64 * 1024   # httpx reads file uploads in chunks of this size
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark of session audio accumulation per flush size: the old path (bytes += per chunk, "
+        "header prepended per flush), a bytearray read through AudioUpload (the accumulation alone), "
+        "and WebmStream feed/take plus the upload reads (what the consumer runs, block parsing included)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-chunks", type=int, nargs="+", default=[8, 64, 256, 1024],
+                            help="Chunks per flushed window (MIN_CHUNK_NUM) to compare.")
+        parser.add_argument("--chunk-bytes", type=int, default=4000,
+                            help="Recorder chunk size; ~4 KB is 500 ms of 64 kbit/s Opus.")
+        parser.add_argument("--seconds", type=float, default=1800.0, help="Recording length to replay.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per path; the best is reported.")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        chunks = recording_chunks(options["seconds"], options["chunk_bytes"], options["seed"])
+        total = sum(len(chunk) for chunk in chunks)
+        self.stdout.write(f"{len(chunks)} chunks, {total / 1e6:.1f} MB of audio")
+        self.stdout.write(f"{'min chunks':<12}{'window':>10}{'bytes +=':>11}{'bytearray':>11}{'WebmStream':>12}")
+        for min_chunks in options["min_chunks"]:
+            timings = [
+                best_of(options["repeat"], path, chunks, min_chunks)
+                for path in (old_path, buffer_path, stream_path)
+            ]
+            self.stdout.write(
+                f"{min_chunks:<12}{min_chunks * options['chunk_bytes'] / 1024:>8.0f}KB"
+                + "".join(f"{timing * 1000:>9.1f}ms" for timing in timings[:2])
+                + f"{timings[2] * 1000:>10.1f}ms"
+            )
+
+def best_of(repeat, path, chunks, min_chunks):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        path(chunks, min_chunks)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def old_path(chunks, min_chunks):
+    """The consumer's original accumulation, kept verbatim apart from the Whisper call."""
+    audio_buffer, webm_header, nchunks, windows = b"", None, 0, 0
+    for bytes_data in chunks:
+        if webm_header is None and bytes_data[:4] == EBML_SIGNATURE:
+            webm_header = bytes_data
+            audio_buffer += bytes_data
+        elif bytes_data[:4] == EBML_SIGNATURE:
+            audio_buffer += bytes_data[4:]
+        else:
+            audio_buffer += bytes_data
+        nchunks += 1
+        if nchunks >= min_chunks:
+            audio_data = audio_buffer
+            if audio_data[:4] != EBML_SIGNATURE and webm_header:
+                audio_data = webm_header + audio_data
+            windows += 1
+            audio_buffer = b""
+            nchunks = 0
+    return windows
+
+def buffer_path(chunks, min_chunks):
+    """Amortised O(1) appends to a bytearray that starts with the header, uploaded through memoryviews."""
+    header, window, nchunks, windows = b"", bytearray(), 0, 0
+    for bytes_data in chunks:
+        if not header and bytes_data[:4] == EBML_SIGNATURE:
+            header = bytes_data
+        window += bytes_data
+        nchunks += 1
+        if nchunks >= min_chunks:
+            with AudioUpload(window) as upload:
+                while upload.read(UPLOAD_READ_SIZE):
+                    pass
+            window = bytearray(header)
+            windows += 1
+            nchunks = 0
+    return windows
+
+def stream_path(chunks, min_chunks):
+    """WebmStream as the consumer drives it, with the window read the way httpx streams the upload."""
+    stream, nchunks, windows = WebmStream(), 0, 0
+    for bytes_data in chunks:
+        stream.feed(bytes_data)
+        nchunks += 1
+        if nchunks >= min_chunks:
+            window = stream.take()
+            if window is not None:
+                with AudioUpload(window) as upload:
+                    while upload.read(UPLOAD_READ_SIZE):
+                        pass
+                windows += 1
+            nchunks = 0
+    return windows
+
+def element(element_id, payload):
+    length = next(n for n in range(1, 9) if len(payload) < (1 << (7 * n)) - 1)
+    size = ((1 << (7 * length)) | len(payload)).to_bytes(length, "big")
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + size + payload
+
+def recording_chunks(seconds, chunk_bytes, seed):
+    """A MediaRecorder-like WebM stream (20 ms Opus frames, 1 s clusters) cut into timeslice chunks."""
+    rng = random.Random(seed)
+    frame_bytes = max(1, chunk_bytes // 25)
+    data = bytearray(element(0x1A45DFA3, element(0x4282, b"webm")))
+    data += (0x18538067).to_bytes(4, "big") + UNKNOWN_SIZE
+    data += element(0x1654AE6B, element(0xAE, element(0xD7, b"\x01") + element(0x86, b"A_OPUS")))
+    for second in range(int(seconds)):
+        data += CLUSTER_ID.to_bytes(4, "big") + UNKNOWN_SIZE
+        data += element(TIMECODE_ID, (second * 1000).to_bytes(4, "big"))
+        for frame in range(50):
+            data += element(SIMPLE_BLOCK_ID, b"\x81" + (frame * 20).to_bytes(2, "big") + b"\x80"
+                            + rng.randbytes(frame_bytes))
+    return [bytes(data[start:start + chunk_bytes]) for start in range(0, len(data), chunk_bytes)]
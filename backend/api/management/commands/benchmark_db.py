@@ -0,0 +1,99 @@
+import time
+import uuid
+import random
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from rest_framework.test import APIClient
+from api.form_cache import form_details
+from api.management.commands.benchmark_form_create import form_payload
+from api.models import Form
+
+class Command(BaseCommand):
+    help = (
+        "Runs concurrent clients against the form endpoints (create, list, detail) on the configured "
+        "database and reports throughput, latency and errors such as \"database is locked\". "
+        "Switch databases with DB_ENGINE / SQLITE_PATH / SQLITE_TUNING."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=400, help="Total requests across all clients.")
+        parser.add_argument("--write-ratio", type=float, default=0.3, help="Share of requests that create a form.")
+        parser.add_argument("--fields", type=int, default=30, help="Fields per created form.")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        user = User.objects.create(username=f"benchmark-db-{uuid.uuid4().hex[:8]}")
+        seed_ids = [form.id for form in Form.objects.bulk_create(
+            [Form(user=user, form_name=f"Seed {i}") for i in range(20)]
+        )]
+        self.stdout.write(f"{connection.vendor} {self.describe()}: "
+                          f"{options['requests']} requests, concurrency {options['concurrency']}")
+        try:
+            started = time.perf_counter()
+            results = self.run(user, seed_ids, options)
+            elapsed = time.perf_counter() - started
+        finally:
+            Form.objects.filter(user=user).delete()
+            user.delete()
+
+        self.stdout.write(f"{'endpoint':<10}{'count':>7}{'errors':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for kind in ("create", "list", "detail"):
+            rows = [r for r in results if r[0] == kind]
+            latencies = sorted(r[2] for r in rows if r[1] < 400)
+            errors = len(rows) - len(latencies)
+            self.stdout.write(f"{kind:<10}{len(rows):>7}{errors:>8}" + "".join(
+                f"{percentile(latencies, p) * 1000:>7.1f}ms" for p in (50, 95, 99)
+            ))
+        self.stdout.write(f"throughput {len(results) / elapsed:.0f} req/s")
+
+    def run(self, user, seed_ids, options):
+        rng = random.Random(options["seed"])
+        plan = [
+            "create" if rng.random() < options["write_ratio"] else rng.choice(("list", "detail"))
+            for _ in range(options["requests"])
+        ]
+        payload = form_payload(options["fields"], 10, 0)
+
+        def request(kind):
+            client = APIClient(HTTP_HOST="localhost")
+            client.force_authenticate(user)
+            form_details.clear()   # Measure the database, not the detail cache
+            began = time.perf_counter()
+            try:
+                if kind == "create":
+                    response = client.post("/api/auth/forms/create/", payload, format="json")
+                elif kind == "list":
+                    response = client.get("/api/auth/forms/list/")
+                else:
+                    response = client.get(f"/api/auth/forms/{rng.choice(seed_ids)}/")
+                code = response.status_code
+            except Exception as e:
+                self.stderr.write(f"{kind}: {e}")
+                code = 500
+            return kind, code, time.perf_counter() - began
+
+        def worker(kinds):
+            try:
+                return [request(kind) for kind in kinds]
+            finally:
+                connections.close_all()
+
+        n = options["concurrency"]
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            return [r for batch in executor.map(worker, [plan[i::n] for i in range(n)]) for r in batch]
+
+    @staticmethod
+    def describe():
+        db = settings.DATABASES["default"]
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+            return f"{db['NAME']} (journal_mode={mode}, tuning={'on' if db.get('OPTIONS') else 'off'})"
+        return f"{db['HOST']}/{db['NAME']} (pool={db.get('OPTIONS', {}).get('pool')})"
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
@@ -0,0 +1,47 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from api.serializers import FormSerializer
+
+class Command(BaseCommand):
+    help = (
+        "Creates nested forms of growing size through FormSerializer and reports the queries "
+        "and time each takes. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fields", type=int, nargs="+", default=[10, 100, 500, 1000],
+                            help="Total fields per form to benchmark.")
+        parser.add_argument("--fields-per-block", type=int, default=10)
+        parser.add_argument("--forms", type=int, default=1,
+                            help="Forms per request; above 1 the batch (many=True) path is used.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'fields':>8}{'forms':>7}{'queries':>9}{'time':>10}")
+        for nfields in options["fields"]:
+            payload = [form_payload(nfields, options["fields_per_block"], i) for i in range(options["forms"])]
+            with transaction.atomic():
+                user = User.objects.create(username="benchmark_form_create")
+                serializer = FormSerializer(data=payload if options["forms"] > 1 else payload[0],
+                                            many=options["forms"] > 1)
+                serializer.is_valid(raise_exception=True)
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    serializer.save(user=user)
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+            self.stdout.write(f"{nfields:>8}{options['forms']:>7}{len(queries):>9}{elapsed * 1000:>8.1f}ms")
+
+def form_payload(nfields, fields_per_block, index):
+    blocks = []
+    for b in range(0, nfields, fields_per_block):
+        blocks.append({
+            "block_name": f"Block {b // fields_per_block}",
+            "fields": [
+                {"field_name": f"Field {f}", "field_type": "text"}
+                for f in range(b, min(b + fields_per_block, nfields))
+            ],
+        })
+    return {"form_name": f"Benchmark form {index}", "blocks": blocks}
@@ -0,0 +1,149 @@
+import os
+import re
+import json
+from django.core.management.base import BaseCommand
+from api.stitching import stitchWindow
+from api.webm import WebmStream, _read_vint, CLUSTER_ID, SIMPLE_BLOCK_ID, TIMECODE_ID
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "testdata", "transcripts.json")
+FRAME_MS = 20          # Opus frame per SimpleBlock, as MediaRecorder writes them
+TIMESLICE_MS = 500     # Recorder chunk length
+CLUSTER_MS = 1000
+SILENCE = 0xFFFF
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+_NON_WORD = re.compile(r"[^\w']+")
+
+class Command(BaseCommand):
+    help = (
+        "Word error rate of windowed transcription with and without AUDIO_OVERLAP_MS, on the stored "
+        "transcripts in api/testdata. Each fixture becomes a WebM recording whose blocks carry word ids; "
+        "a deterministic stub transcriber garbles or drops any word a window boundary cuts, and the "
+        "windows go through WebmStream and stitchWindow exactly as in the consumer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fixtures", default=FIXTURES_PATH)
+        parser.add_argument("--windows-ms", type=int, nargs="+", default=[1000, 2000, 4000],
+                            help="Flush sizes; multiples of the 500 ms recorder timeslice.")
+        parser.add_argument("--overlaps-ms", type=int, nargs="+", default=[0, 600, 1000, 1500])
+
+    def handle(self, *args, **options):
+        with open(options["fixtures"]) as f:
+            fixtures = json.load(f)
+        recordings = [(fixture["text"].split(), record(fixture)) for fixture in fixtures]
+        self.stdout.write(f"{len(fixtures)} fixtures, {sum(len(words) for words, _ in recordings)} words")
+        self.stdout.write(f"{'window':<9}" + "".join(f"{f'overlap {ms}':>14}" for ms in options["overlaps_ms"]))
+        for window_ms in options["windows_ms"]:
+            row = []
+            for overlap_ms in options["overlaps_ms"]:
+                errors = total = 0
+                for words, (chunks, spans) in recordings:
+                    hypothesis = transcribe(chunks, spans, words, window_ms, overlap_ms)
+                    errors += word_errors(words, hypothesis.split())
+                    total += len(words)
+                row.append(errors / total)
+            self.stdout.write(f"{window_ms:>6}ms" + "".join(f"{wer * 100:>13.1f}%" for wer in row))
+
+def record(fixture):
+    """
+    (recorder chunks, frames per word) for a fixture. Word lengths follow the number of letters,
+    scaled to the fixture's speaking rate, with a short pause after punctuation.
+    """
+    words = fixture["text"].split()
+    speech_ms = len(words) / fixture["words_per_minute"] * 60000
+    weights = [2 + len(word) for word in words]
+    spans, frames = [], []
+    for index, (word, weight) in enumerate(zip(words, weights)):
+        count = max(1, round(speech_ms * weight / sum(weights) / FRAME_MS))
+        spans.append(count)
+        frames += [index] * count
+        if word[-1] in ".,?!":
+            frames += [SILENCE] * (300 // FRAME_MS)
+
+    init = element(0x1A45DFA3, element(0x4282, b"webm")) + (0x18538067).to_bytes(4, "big") + UNKNOWN_SIZE
+    init += element(0x1654AE6B, element(0xAE, element(0xD7, b"\x01") + element(0x86, b"A_OPUS")))
+    per_chunk, per_cluster = TIMESLICE_MS // FRAME_MS, CLUSTER_MS // FRAME_MS
+    chunks = []
+    for start in range(0, len(frames), per_chunk):
+        chunk = bytearray(init if start == 0 else b"")
+        for frame in range(start, min(start + per_chunk, len(frames))):
+            if frame % per_cluster == 0:
+                chunk += CLUSTER_ID.to_bytes(4, "big") + UNKNOWN_SIZE
+                chunk += element(TIMECODE_ID, (frame * FRAME_MS).to_bytes(4, "big"))
+            relative = (frame % per_cluster) * FRAME_MS
+            chunk += element(SIMPLE_BLOCK_ID, b"\x81" + relative.to_bytes(2, "big") + b"\x80"
+                             + frames[frame].to_bytes(2, "big") + bytes(60))
+        chunks.append(bytes(chunk))
+    return chunks, spans
+
+def transcribe(chunks, spans, words, window_ms, overlap_ms):
+    """Flushes every `window_ms` of chunks, like the consumer's chunk-count policy, and joins the stitched text."""
+    stream, texts, previous, held = WebmStream(overlap_ms=overlap_ms), [], "", ""
+    flush_every = max(1, window_ms // TIMESLICE_MS)
+    for index, chunk in enumerate(chunks):
+        stream.feed(chunk)
+        if (index + 1) % flush_every == 0 or index == len(chunks) - 1:
+            window = stream.take()
+            if window is None:
+                continue
+            raw = stub_transcriber(window, spans, words)
+            if overlap_ms:
+                raw, previous, held = stitchWindow(previous, held, raw)
+            texts.append(raw)
+    texts.append(held)   # Released at stop_recording
+    return " ".join(text for text in texts if text)
+
+def stub_transcriber(window, spans, words):
+    """
+    Deterministic stand-in for Whisper: reads the word id of every frame in the window. A word heard
+    whole is returned as spoken; one cut by the window edge is misheard if at least half of it is
+    present (its first letters only) and dropped otherwise.
+    """
+    heard = []
+    pos = 0
+    while pos < len(window):
+        element_id, id_length = _read_vint(window, pos, True)
+        size, size_length = _read_vint(window, pos + id_length, False)
+        if size == -1:
+            pos += id_length + size_length   # Segment and Cluster: descend into the children
+            continue
+        if element_id == SIMPLE_BLOCK_ID:
+            payload = pos + id_length + size_length + 4
+            heard.append(int.from_bytes(window[payload:payload + 2], "big"))
+        pos += id_length + size_length + size
+
+    text, run = [], 0
+    for position, index in enumerate(heard):
+        run += 1
+        if position + 1 < len(heard) and heard[position + 1] == index:
+            continue
+        if index != SILENCE:
+            fraction = run / spans[index]
+            word = words[index]
+            if fraction >= 1:
+                text.append(word)
+            elif fraction >= 0.5:
+                text.append(word[:max(1, int(len(word) * fraction) - 1)])
+        run = 0
+    return " ".join(text)
+
+def normalise(words):
+    return [word for word in (_NON_WORD.sub("", w.lower()) for w in words) if word]
+
+def word_errors(reference, hypothesis):
+    """Substitutions, insertions and deletions between the normalised word sequences."""
+    reference, hypothesis = normalise(reference), normalise(hypothesis)
+    previous = list(range(len(hypothesis) + 1))
+    for i, word in enumerate(reference, 1):
+        current = [i]
+        for j, other in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != other)))
+        previous = current
+    return previous[-1]
+
+def element(element_id, payload):
+    length = next(n for n in range(1, 9) if len(payload) < (1 << (7 * n)) - 1)
+    size = ((1 << (7 * length)) | len(payload)).to_bytes(length, "big")
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + size + payload
@@ -0,0 +1,105 @@
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+from openai import AsyncOpenAI
+from api import gpt_parse
+from api.llm_cache import response_cache
+
+class Command(BaseCommand):
+    help = (
+        "Compares end-to-end flush latency of GPT_PARSE_MODE=sequential (revise, then extract) and "
+        "GPT_PARSE_MODE=combined (one structured call) against a local stub of the chat completions API. "
+        "The stub answers after a fixed per-call latency plus a cost per prompt character."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--flushes", type=int, default=30, help="Flushes per mode, run one after another.")
+        parser.add_argument("--latency", type=float, default=0.3,
+                            help="Seconds the stub takes per call (round trip plus generation).")
+        parser.add_argument("--ms-per-kchar", type=float, default=5.0,
+                            help="Extra stub milliseconds per 1000 prompt characters (prompt processing).")
+        parser.add_argument("--fields", type=int, default=20, help="Template fields to extract.")
+
+    def handle(self, *args, **options):
+        stub = StubCompletions(options["latency"], options["ms_per_kchar"] / 1e6)
+        client, backend = gpt_parse.client, response_cache.backend
+        gpt_parse.client = AsyncOpenAI(api_key="stub", base_url=stub.url, max_retries=0)
+        response_cache.backend = None   # Every flush must reach the provider
+        try:
+            self.stdout.write(f"{'mode':<12}{'calls':>7}{'prompt chars':>14}{'mean':>9}{'p50':>9}{'p95':>9}")
+            for mode in ("sequential", "combined"):
+                stub.calls = stub.prompt_chars = 0
+                latencies = asyncio.run(run_flushes(mode, options["flushes"], options["fields"]))
+                self.stdout.write(
+                    f"{mode:<12}{stub.calls:>7}{stub.prompt_chars:>14}"
+                    f"{sum(latencies) / len(latencies) * 1000:>7.0f}ms"
+                    + "".join(f"{percentile(latencies, p) * 1000:>7.0f}ms" for p in (50, 95))
+                )
+        finally:
+            gpt_parse.client, response_cache.backend = client, backend
+            stub.close()
+
+async def run_flushes(mode, flushes, fields):
+    template = [f"Field {i}" for i in range(fields)]
+    attributes, previous, latencies = {}, "", []
+    configured_mode = gpt_parse.GPT_PARSE_MODE
+    gpt_parse.GPT_PARSE_MODE = mode
+    try:
+        for flush in range(flushes):
+            segment = f"In window {flush} the client confirmed the details for field {flush % fields}. " * 4
+            started = time.perf_counter()
+            corrected, parsed = await gpt_parse.parseTranscribedText(previous, segment, attributes, template)
+            latencies.append(time.perf_counter() - started)
+            attributes.update(parsed)
+            previous = corrected
+    finally:
+        gpt_parse.GPT_PARSE_MODE = configured_mode
+    return sorted(latencies)
+
+class StubCompletions:
+    """OpenAI-compatible /chat/completions on localhost; every answer satisfies all three response models."""
+
+    def __init__(self, latency, seconds_per_char):
+        self.calls = 0
+        self.prompt_chars = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                chars = sum(len(message["content"]) for message in request["messages"])
+                stub.calls += 1
+                stub.prompt_chars += chars
+                time.sleep(latency + chars * seconds_per_char)
+                segment = request["messages"][-1]["content"].split("New segment:\n")[-1]
+                content = json.dumps({"correctedText": segment, "parsedAttributes": {"Field 0": "value"}})
+                body = json.dumps({
+                    "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": request["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": chars // 4, "completion_tokens": len(content) // 4,
+                              "total_tokens": (chars + len(content)) // 4},
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
@@ -0,0 +1,52 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+from api.password_pool import password_checks
+
+class Command(BaseCommand):
+    help = (
+        "Fires concurrent logins at LoginView in-process and reports latency percentiles and "
+        "how many were refused by the password pool. Size the pool with PASSWORD_WORKERS, "
+        "PASSWORD_QUEUE and PASSWORD_ADMIT_WAIT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=16, help="Simultaneous clients.")
+        parser.add_argument("--requests", type=int, default=64, help="Total login attempts.")
+
+    def handle(self, *args, **options):
+        suffix = uuid.uuid4().hex[:8]
+        email, password = f"loadtest-{suffix}@example.com", uuid.uuid4().hex
+        user = User.objects.create_user(f"loadtest-{suffix}", email, password)
+        try:
+            results = self.run(email.upper(), password, options["concurrency"], options["requests"])
+        finally:
+            user.delete()
+
+        latencies = sorted(elapsed for code, elapsed in results if code == 200)
+        refused = sum(1 for code, _ in results if code == 429)
+        failed = len(results) - len(latencies) - refused
+        self.stdout.write(
+            f"{len(results)} logins at concurrency {options['concurrency']}: "
+            f"{len(latencies)} ok, {refused} refused (429), {failed} failed; pool {password_checks.stats()}"
+        )
+        if latencies:
+            self.stdout.write("  ".join(
+                f"p{p}={percentile(latencies, p) * 1000:.0f}ms" for p in (50, 95, 99)
+            ) + f"  max={latencies[-1] * 1000:.0f}ms")
+
+    def run(self, email, password, concurrency, total):
+        def login(_):
+            client = APIClient(HTTP_HOST="localhost")
+            started = time.perf_counter()
+            response = client.post("/api/auth/login/", {"email": email, "password": password}, format="json")
+            return response.status_code, time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(login, range(total)))
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
@@ -0,0 +1,92 @@
+import json
+import random
+from django.core.management.base import BaseCommand
+from api.flush_policy import FlushWindow, ChunkCountPolicy, AdaptivePolicy, FLUSH, DROP
+
+class Command(BaseCommand):
+    help = (
+        "Replays recorded chunk timings through the flush policies and compares "
+        "Whisper call count against how long audio waits before it is sent."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "trace", nargs="?",
+            help='JSON file of chunks as [[arrival_seconds, nbytes], ...]. Omit to use a synthetic trace.',
+        )
+        parser.add_argument("--min-chunks", type=int, nargs="+", default=[4, 8, 16],
+                            help="Chunk counts to simulate for the fixed-count policy.")
+        parser.add_argument("--duration", type=float, default=300.0, help="Synthetic trace length (s).")
+        parser.add_argument("--timeslice", type=float, default=0.5, help="Synthetic recorder timeslice (s).")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        if options["trace"]:
+            with open(options["trace"]) as f:
+                trace = [(float(t), int(n)) for t, n in json.load(f)]
+        else:
+            trace = synthetic_trace(options["duration"], options["timeslice"], options["seed"])
+
+        policies = [(f"chunks({n})", ChunkCountPolicy(n)) for n in options["min_chunks"]]
+        policies.append(("adaptive", AdaptivePolicy()))
+
+        self.stdout.write(f"{len(trace)} chunks over {trace[-1][0] - trace[0][0]:.1f}s")
+        self.stdout.write(f"{'policy':<14}{'calls':>8}{'dropped':>9}{'mean wait':>11}{'p95 wait':>10}{'max wait':>10}")
+        for name, policy in policies:
+            result = replay(trace, policy)
+            self.stdout.write(
+                f"{name:<14}{result['calls']:>8}{result['dropped']:>9}"
+                f"{result['mean_wait']:>10.2f}s{result['p95_wait']:>9.2f}s{result['max_wait']:>9.2f}s"
+            )
+
+def replay(trace, policy):
+    """
+    Feeds (arrival, nbytes) chunks through a policy. The wait of a chunk is the time from its arrival
+    until the window holding it is sent to Whisper, i.e. the latency the policy adds.
+    """
+    window = FlushWindow()
+    pending, waits = [], []
+    calls = dropped = 0
+
+    def apply(decision, now):
+        nonlocal calls, dropped
+        if decision == FLUSH:
+            calls += 1
+            waits.extend(now - arrival for arrival in pending)
+        elif decision == DROP and pending:
+            dropped += 1
+        if decision in (FLUSH, DROP):
+            pending.clear()
+            window.reset()
+
+    for arrival, nbytes in trace:
+        deadline = policy.deadline_at(window)
+        if deadline is not None and deadline < arrival:
+            apply(policy.decide(window, deadline), deadline)   # The consumer's deadline timer
+        window.add(nbytes, arrival, policy)
+        pending.append(arrival)
+        apply(policy.decide(window, arrival), arrival)
+    apply(policy.decide_at_stop(window), trace[-1][0])
+
+    waits.sort()
+    return {
+        "calls": calls,
+        "dropped": dropped,
+        "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+        "p95_wait": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+        "max_wait": waits[-1] if waits else 0.0,
+    }
+
+def synthetic_trace(duration, timeslice, seed):
+    """Alternating speech and silence runs at ~4 KB/s and ~300 B/s, with small arrival jitter."""
+    rng = random.Random(seed)
+    trace, t, speaking = [], 0.0, True
+    while t < duration:
+        run = rng.uniform(1.0, 6.0) if speaking else rng.uniform(0.3, 4.0)
+        end = t + run
+        while t < end and t < duration:
+            rate = rng.gauss(4000, 600) if speaking else rng.gauss(300, 80)
+            trace.append((t + rng.uniform(0, 0.02), max(40, int(rate * timeslice))))
+            t += timeslice
+        speaking = not speaking
+    return trace
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_remove_filledform_client_remove_filledform_form_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='form',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Expression index for LoginView's case-insensitive email lookup (auth.User has no email index)."""
+
+    dependencies = [
+        ('api', '0004_form_version'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS api_user_email_lower_idx ON auth_user (LOWER(email));',
+            reverse_sql='DROP INDEX IF EXISTS api_user_email_lower_idx;',
+        ),
+    ]
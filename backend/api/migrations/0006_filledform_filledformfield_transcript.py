@@ -0,0 +1,47 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_user_email_lower_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilledForm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=64, unique=True)),
+                ('final', models.BooleanField(default=False)),
+                ('submission_date', models.DateTimeField(auto_now_add=True)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='api.form')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-id'], name='api_filledf_user_id_48eb49_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FilledFormField',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_name', models.CharField(max_length=255)),
+                ('field_value', models.TextField()),
+                ('field', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.field')),
+                ('filled_form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='filled_fields', to='api.filledform')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Transcript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('transcript_chars', models.PositiveIntegerField(default=0)),
+                ('filled_form', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='transcript', to='api.filledform')),
+            ],
+        ),
+    ]
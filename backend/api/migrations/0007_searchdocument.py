@@ -0,0 +1,87 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# SQLite: an FTS5 table over api_searchdocument.body, kept in step by triggers.
+SQLITE_INDEX = [
+    """CREATE VIRTUAL TABLE api_search_fts USING fts5(
+        body, content='api_searchdocument', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER api_search_fts_ai AFTER INSERT ON api_searchdocument BEGIN
+        INSERT INTO api_search_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+    """CREATE TRIGGER api_search_fts_ad AFTER DELETE ON api_searchdocument BEGIN
+        INSERT INTO api_search_fts(api_search_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    END""",
+    """CREATE TRIGGER api_search_fts_au AFTER UPDATE ON api_searchdocument BEGIN
+        INSERT INTO api_search_fts(api_search_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO api_search_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS api_search_fts_au",
+    "DROP TRIGGER IF EXISTS api_search_fts_ad",
+    "DROP TRIGGER IF EXISTS api_search_fts_ai",
+    "DROP TABLE IF EXISTS api_search_fts",
+]
+# Postgres: a stored tsvector column with a GIN index.
+POSTGRES_INDEX = [
+    """ALTER TABLE api_searchdocument ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', body)) STORED""",
+    "CREATE INDEX api_searchdocument_vector_idx ON api_searchdocument USING GIN (search_vector)",
+]
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS api_searchdocument_vector_idx",
+    "ALTER TABLE api_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_INDEX, "postgresql": POSTGRES_INDEX}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def index_existing_fills(apps, schema_editor):
+    FilledForm = apps.get_model("api", "FilledForm")
+    SearchDocument = apps.get_model("api", "SearchDocument")
+    fills = FilledForm.objects.select_related("form", "transcript").prefetch_related("filled_fields")
+    documents = []
+    for fill in fills.iterator(chunk_size=500):
+        transcript = getattr(fill, "transcript", None)
+        body = "\n".join([
+            fill.form.form_name,
+            *(f"{field.field_name}: {field.field_value}" for field in fill.filled_fields.all()),
+            transcript.text if transcript is not None else "",
+        ])
+        documents.append(SearchDocument(filled_form_id=fill.id, user_id=fill.user_id, body=body))
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+    """Full-text search over fills: FTS5 on SQLite, tsvector + GIN on Postgres; indexes existing fills."""
+
+    dependencies = [
+        ('api', '0006_filledform_filledformfield_transcript'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('body', models.TextField()),
+                ('filled_form', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='api.filledform')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_existing_fills, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,17 @@ from django.contrib.auth.models import User
 class Form(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     form_name = models.CharField(max_length=255)
+    version = models.PositiveIntegerField(default=1)  # Bumped whenever the form, its blocks or fields change
+
+    def save(self, *args, update_fields=None, **kwargs):
+        # The version only ever moves through the F() bump in api/signals.py: writing it back from an
+        # instance loaded before a bump would let one version (and ETag) stand for two payloads.
+        if update_fields is not None:
+            update_fields = [name for name in update_fields if name != "version"]
+        elif not self._state.adding and not kwargs.get("force_insert"):
+            update_fields = [field.name for field in self._meta.concrete_fields
+                             if not field.primary_key and field.name != "version"]
+        super().save(*args, update_fields=update_fields, **kwargs)
 
     def __str__(self):
         return self.form_name
@@ -22,4 +33,56 @@ class Field(models.Model):
     field_type = models.CharField(max_length=50)
 
     def __str__(self):
-        return self.field_name
\ No newline at end of file
+        return self.field_name
+
+class FilledForm(models.Model):
+    """The result of one recording session, written by the write-behind queue in api/write_behind.py."""
+    form = models.ForeignKey(Form, related_name="submissions", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    session_id = models.CharField(max_length=64, unique=True)  # Re-flushing a session replaces its fill
+    final = models.BooleanField(default=False)  # False: saved on disconnect before the final sweep
+    submission_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "-id"])]
+
+    def __str__(self):
+        return f"{self.form_id} ({self.session_id})"
+
+class FilledFormField(models.Model):
+    filled_form = models.ForeignKey(FilledForm, related_name="filled_fields", on_delete=models.CASCADE)
+    field = models.ForeignKey(Field, null=True, on_delete=models.SET_NULL)  # Kept if the template changes
+    field_name = models.CharField(max_length=255)
+    field_value = models.TextField()
+
+    def __str__(self):
+        return self.field_name
+
+class Transcript(models.Model):
+    filled_form = models.OneToOneField(FilledForm, related_name="transcript", on_delete=models.CASCADE)
+    text = models.TextField()  # Raw transcript of the whole session, from its TranscriptSegment log
+    transcript_chars = models.PositiveIntegerField(default=0)  # Characters the session transcribed
+
+    def __str__(self):
+        return f"Transcript of {self.filled_form_id}"
+
+class TranscriptSegment(models.Model):
+    """
+    One window's corrected text in a live session's raw transcript log, written as it arrives (see
+    api/session_store.py), so neither the worker nor the session store holds the growing log.
+    """
+    session_id = models.CharField(max_length=64, db_index=True)
+    text = models.TextField()
+    created = models.DateTimeField(auto_now_add=True, db_index=True)  # Abandoned logs are swept by age
+
+    def __str__(self):
+        return f"{self.session_id} #{self.id}"
+
+class SearchDocument(models.Model):
+    """
+    Searchable text of one fill (form name, field values, transcript), written with the fill by
+    api/write_behind.py. The full-text index over `body` is backend specific; see api/search.py.
+    """
+    filled_form = models.OneToOneField(FilledForm, related_name="search_document", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    body = models.TextField()
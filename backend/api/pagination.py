@@ -0,0 +1,26 @@
+import os
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+FORM_PAGE_SIZE = int(os.getenv("FORM_PAGE_SIZE", "50"))
+FORM_MAX_PAGE_SIZE = int(os.getenv("FORM_MAX_PAGE_SIZE", "200"))
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "100"))
+
+class FormCursorPagination(CursorPagination):
+    """
+    Newest forms first. Cursor pages stay cheap however many forms a user has: no COUNT query
+    and no OFFSET scan, and pages do not shift while forms are being created.
+    """
+    page_size = FORM_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = FORM_MAX_PAGE_SIZE
+    ordering = "-id"
+
+class SearchPagination(PageNumberPagination):
+    """
+    Search results are ordered by rank, which a cursor cannot encode, so they are paged by number.
+    Each page is one COUNT and one LIMIT/OFFSET query against the full-text index.
+    """
+    page_size = SEARCH_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = SEARCH_MAX_PAGE_SIZE
@@ -0,0 +1,48 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.hashers import check_password
+
+# PBKDF2 runs in C without the GIL, so a few threads use a few cores; the rest of the request
+# threads are left for everything else.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+PASSWORD_QUEUE = int(os.getenv("PASSWORD_QUEUE", "16"))          # Checks allowed to wait for a worker
+PASSWORD_ADMIT_WAIT = float(os.getenv("PASSWORD_ADMIT_WAIT", "0.5"))  # Seconds to wait for a queue slot
+
+class PasswordPoolBusy(Exception):
+    """Raised when a password check cannot be admitted; the caller should answer 429."""
+
+class PasswordPool:
+    """
+    Bounded worker pool for password verification with admission control.
+
+    At most `workers` hashes run at once and `queue` more may wait; a check that cannot get one of
+    those slots within `admit_wait` seconds is refused instead of piling onto the request threads,
+    so a burst of logins degrades into fast 429s rather than starving every other endpoint.
+    """
+
+    def __init__(self, workers=PASSWORD_WORKERS, queue=PASSWORD_QUEUE, admit_wait=PASSWORD_ADMIT_WAIT):
+        self.workers = workers
+        self.admit_wait = admit_wait
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejected = 0
+
+    def check(self, password, encoded):
+        if not self._slots.acquire(timeout=self.admit_wait):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy()
+        try:
+            return self._executor.submit(check_password, password, encoded).result()
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.checked += 1
+
+    def stats(self):
+        return {"workers": self.workers, "checked": self.checked, "rejected": self.rejected}
+
+password_checks = PasswordPool()
@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+class _Job:
+    """A single flushed audio window travelling through the pipeline."""
+    __slots__ = ("seq", "audio_data", "transcription", "enqueued_at", "transcribed_at")
+
+    def __init__(self, seq, audio_data):
+        self.seq = seq
+        self.audio_data = audio_data
+        self.transcription = ""
+        self.enqueued_at = time.monotonic()
+        self.transcribed_at = None
+
+class StageStats:
+    """Rolling timings for one pipeline stage (queue wait and service time)."""
+
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.last_wait = 0.0
+        self.last_service = 0.0
+        self.total_wait = 0.0
+        self.total_service = 0.0
+
+    def record(self, wait, service):
+        self.processed += 1
+        self.last_wait = wait
+        self.last_service = service
+        self.total_wait += wait
+        self.total_service += service
+
+    def as_dict(self):
+        n = self.processed or 1
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "last_wait_ms": round(self.last_wait * 1000, 1),
+            "last_service_ms": round(self.last_service * 1000, 1),
+            "avg_wait_ms": round(self.total_wait / n * 1000, 1),
+            "avg_service_ms": round(self.total_service / n * 1000, 1),
+        }
+
+class AudioPipeline:
+    """
+    Per-connection audio pipeline.
+
+    Ingestion (the websocket receive handler) submits flushed audio windows into a bounded
+    queue. A transcription worker and an extraction worker drain their own queues concurrently,
+    so window n+1 is being transcribed while window n is being parsed. Each stage has a single
+    worker, which keeps results in submission order.
+
+    `transcribe(audio_data) -> str` and `extract(seq, transcription)` are coroutines supplied
+    by the consumer.
+    """
+
+    def __init__(self, transcribe, extract, maxsize=PIPELINE_QUEUE_SIZE):
+        self.transcribe = transcribe
+        self.extract = extract
+        self.transcription_queue = asyncio.Queue(maxsize=maxsize)
+        self.extraction_queue = asyncio.Queue(maxsize=maxsize)
+        self.transcription_stats = StageStats()
+        self.extraction_stats = StageStats()
+        self.submitted = 0
+        self._unfinished = {}   # seq -> job, until its extraction completes or fails
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._transcription_worker()),
+            asyncio.create_task(self._extraction_worker()),
+        ]
+
+    async def submit(self, audio_data):
+        """Queue a flushed window. Blocks only when the bounded queue is full (backpressure)."""
+        job = _Job(self.submitted, audio_data)
+        self.submitted += 1
+        self._unfinished[job.seq] = job
+        await self.transcription_queue.put(job)
+
+    async def submit_transcription(self, transcription):
+        """Queue an already transcribed window straight for extraction (used when resuming a session)."""
+        job = _Job(self.submitted, None)
+        job.transcription = transcription
+        job.transcribed_at = time.monotonic()
+        self.submitted += 1
+        self._unfinished[job.seq] = job
+        await self.extraction_queue.put(job)
+
+    async def drain(self):
+        """Wait until every submitted window has been transcribed and extracted."""
+        await self.transcription_queue.join()
+        await self.extraction_queue.join()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def unfinished(self):
+        """
+        Work not yet through the pipeline, oldest first, as (audio windows awaiting transcription,
+        transcriptions awaiting extraction). Lets a closing session hand it over instead of losing it.
+        """
+        jobs = sorted(self._unfinished.values(), key=lambda job: job.seq)
+        transcriptions = [job.transcription for job in jobs if job.audio_data is None]
+        audio = [job.audio_data for job in jobs if job.audio_data is not None]
+        return audio, transcriptions
+
+    def stats(self):
+        """Queue depth and per-stage lag, for logging and the `pipeline_stats` action."""
+        return {
+            "submitted": self.submitted,
+            "transcription_queue_depth": self.transcription_queue.qsize(),
+            "extraction_queue_depth": self.extraction_queue.qsize(),
+            "transcription": self.transcription_stats.as_dict(),
+            "extraction": self.extraction_stats.as_dict(),
+        }
+
+    async def _transcription_worker(self):
+        while True:
+            job = await self.transcription_queue.get()
+            started = time.monotonic()
+            try:
+                job.transcription = await self.transcribe(job.audio_data)
+                job.audio_data = None
+                job.transcribed_at = time.monotonic()
+                self.transcription_stats.record(started - job.enqueued_at, job.transcribed_at - started)
+                await self.extraction_queue.put(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.transcription_stats.failed += 1
+                self._unfinished.pop(job.seq, None)
+                print(f"Error in transcription stage (window {job.seq}):", e)
+            finally:
+                self.transcription_queue.task_done()
+
+    async def _extraction_worker(self):
+        while True:
+            job = await self.extraction_queue.get()
+            started = time.monotonic()
+            try:
+                await self.extract(job.seq, job.transcription)
+                self._unfinished.pop(job.seq, None)
+                self.extraction_stats.record(started - job.transcribed_at, time.monotonic() - started)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.extraction_stats.failed += 1
+                self._unfinished.pop(job.seq, None)
+                print(f"Error in extraction stage (window {job.seq}):", e)
+            finally:
+                self.extraction_queue.task_done()
@@ -0,0 +1,94 @@
+import os
+import re
+import json
+
+# "full" embeds the whole template and attribute state on every flush;
+# "incremental" sends a compact encoding of only the fields the new text can affect.
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "full")
+
+_EMPTY_VALUES = ("", "N/A")
+_WORD = re.compile(r"[a-z0-9]+")
+_STEM_CHARS = 5   # "married" and "marriage" share "marri"
+_NUMBER = "#"     # Stands for any number or date, so "born in 1991" reaches a recorded "1 Jan 1990"
+_NUMERIC_TYPES = ("date", "time", "number", "phone")
+
+def fieldList(templateAttributes):
+    """Normalises a template (compiled JSON prompt, list of field dicts or list of names) to field dicts."""
+    if isinstance(templateAttributes, str):
+        templateAttributes = json.loads(templateAttributes) if templateAttributes else []
+    return [f if isinstance(f, dict) else {"field_name": f} for f in templateAttributes]
+
+def _stems(text):
+    stems = set()
+    for word in _WORD.findall(str(text).lower()):
+        if any(c.isdigit() for c in word):
+            stems.add(_NUMBER)
+        elif len(word) > 2:
+            stems.add(word[:_STEM_CHARS])
+    return stems
+
+def selectRelevantFields(text: str, currentAttributes: dict, fields: list[dict]) -> list[dict]:
+    """
+    Fields whose template entry is worth sending for this flush: those without a value yet, plus
+    those whose name, type or current value shares a word stem with the new text, or a number
+    when the text has one. The filter is generous on purpose; recorded values are sent regardless.
+    """
+    textStems = _stems(text)
+    relevant = []
+    for field in fields:
+        name = field["field_name"]
+        value = currentAttributes.get(name, "")
+        stems = _stems(name) | _stems(value)
+        if any(kind in field.get("field_type", "").lower() for kind in _NUMERIC_TYPES):
+            stems.add(_NUMBER)
+        if value in _EMPTY_VALUES or textStems & stems:
+            relevant.append(field)
+    return relevant
+
+def encodeTemplate(fields: list[dict]) -> str:
+    """Compact template encoding: {block: {field: type}} without whitespace."""
+    blocks = {}
+    for field in fields:
+        blocks.setdefault(field.get("block_name", ""), {})[field["field_name"]] = field.get("field_type", "text")
+    return json.dumps(blocks, separators=(",", ":"))
+
+def encodeAttributes(currentAttributes: dict, fields: list[dict]) -> str:
+    """Compact encoding of the recorded values for the given fields only, skipping empty ones."""
+    names = {field["field_name"] for field in fields}
+    values = {k: v for k, v in currentAttributes.items() if k in names and v not in _EMPTY_VALUES}
+    return json.dumps(values, separators=(",", ":"))
+
+def extractionContext(text: str, currentAttributes: dict, templateAttributes):
+    """
+    Returns (attributesToFind, currentRecorded, fieldCount) for the attribute extraction prompt.
+    In incremental mode only the relevant fields' template entries are sent, but every recorded value
+    is, compactly encoded, so the model can still correct any of them; fieldCount is the number of
+    fields it may answer, 0 only when there are none. In full mode fieldCount is None.
+    """
+    if EXTRACTION_MODE != "incremental":
+        return templateAttributes, json.dumps(currentAttributes, indent=2), None
+    fields = fieldList(templateAttributes)
+    relevant = selectRelevantFields(text, currentAttributes, fields)
+    currentRecorded = encodeAttributes(currentAttributes, fields)
+    answerable = {field["field_name"] for field in relevant} | set(json.loads(currentRecorded))
+    return encodeTemplate(relevant), currentRecorded, len(answerable)
+
+def estimateTokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) for reporting prompt sizes."""
+    return len(text) // 4 + 1
+
+def contextTokens(attributesToFind, currentRecorded) -> int:
+    """Estimated tokens of the template and attribute state embedded in an extraction prompt."""
+    return estimateTokens(str(attributesToFind)) + estimateTokens(currentRecorded)
+
+def reportPromptTokens(name: str, usage, fieldCount, attributesToFind, currentRecorded, currentAttributes: dict, templateAttributes):
+    """
+    Logs the template and state this prompt embedded next to what full mode would have embedded for
+    the same flush (the same estimate, so the saving of incremental mode is visible per flush),
+    and the provider-reported tokens of the whole prompt.
+    """
+    sent = contextTokens(attributesToFind, currentRecorded)
+    full = contextTokens(templateAttributes, json.dumps(currentAttributes, indent=2))
+    print(f"{name} [{EXTRACTION_MODE}]: fields={fieldCount if fieldCount is not None else 'all'}, "
+          f"template+state ~{sent} tokens (full mode ~{full}), "
+          f"prompt_tokens={usage.prompt_tokens if usage else 'cached'}")
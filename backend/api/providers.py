@@ -0,0 +1,174 @@
+import os
+import time
+import asyncio
+import importlib
+from collections import deque
+
+# Extraction back ends are interchangeable: both modules expose the same coroutine signatures.
+# Modules are imported on first use; each builds its SDK client (and needs its API key) on import.
+PROVIDERS = {"openai": "gpt_parse", "groq": "groq_parse"}
+PROVIDER_HEDGING = os.getenv("PROVIDER_HEDGING", "false").lower() == "true"
+PRIMARY_PROVIDER = os.getenv("PRIMARY_PROVIDER", "openai")
+# Without hedging the secondary is never called, so it is only set up when asked for.
+SECONDARY_PROVIDER = os.getenv("SECONDARY_PROVIDER", "groq" if PROVIDER_HEDGING else "")
+
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "2.0"))   # Used until enough samples exist
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "500"))
+
+class LatencyHistogram:
+    """Rolling latency distribution of one provider call, in seconds."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+
+    def percentile(self, q):
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self):
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+        return {
+            "count": len(self._samples),
+            "p50_ms": ms(self.percentile(0.50)),
+            "p95_ms": ms(self.percentile(0.95)),
+            "p99_ms": ms(self.percentile(0.99)),
+        }
+
+class Provider:
+    def __init__(self, name, module):
+        self.name = name
+        self._module = module   # A module, or the name of one in this package to import on first call
+        self.latency = {}   # call name -> LatencyHistogram
+        self.wins = 0
+        self.errors = 0
+
+    @property
+    def module(self):
+        if isinstance(self._module, str):
+            self._module = importlib.import_module(f".{self._module}", __package__)
+        return self._module
+
+    def histogram(self, call):
+        return self.latency.setdefault(call, LatencyHistogram())
+
+    async def run(self, call, *args):
+        started = time.monotonic()
+        try:
+            result = await getattr(self.module, call)(*args)
+        except asyncio.CancelledError:
+            # Lost a hedge race: the call took at least this long. Recording only the calls that
+            # finished would bias the histogram fast and shrink the hedge delay call after call.
+            self.histogram(call).record(time.monotonic() - started)
+            raise
+        except Exception:
+            self.errors += 1
+            self.histogram(call).record(time.monotonic() - started)
+            raise
+        self.histogram(call).record(time.monotonic() - started)
+        return result
+
+class ProviderRouter:
+    """
+    Routes extraction calls to the primary provider and, when hedging is on, fires the same
+    request at the secondary if the primary has not answered within its observed p95 latency.
+    Whichever answers first wins and the other request is cancelled. Cancelled and failed calls
+    are recorded with their elapsed time (a lower bound), so the p95 stays honest.
+    """
+
+    def __init__(self, primary, secondary=None, hedging=PROVIDER_HEDGING):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedging = hedging and secondary is not None
+        self.hedged = 0
+
+    def hedge_delay(self, call):
+        histogram = self.primary.histogram(call)
+        if len(histogram) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return histogram.percentile(HEDGE_PERCENTILE)
+
+    async def call(self, call, *args):
+        if not self.hedging:
+            return await self.primary.run(call, *args)
+
+        tasks = {asyncio.create_task(self.primary.run(call, *args)): self.primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(call))
+            if not done or next(iter(done)).exception() is not None:
+                # Primary is slow (or already failed): race the secondary against it.
+                self.hedged += 1
+                tasks[asyncio.create_task(self.secondary.run(call, *args))] = self.secondary
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        tasks[task].wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        return {
+            "hedging": self.hedging,
+            "hedged": self.hedged,
+            "providers": {
+                provider.name: {
+                    "wins": provider.wins,
+                    "errors": provider.errors,
+                    "latency": {call: h.stats() for call, h in provider.latency.items()},
+                }
+                for provider in (self.primary, self.secondary) if provider is not None
+            },
+        }
+
+router = ProviderRouter(
+    Provider(PRIMARY_PROVIDER, PROVIDERS[PRIMARY_PROVIDER]),
+    Provider(SECONDARY_PROVIDER, PROVIDERS[SECONDARY_PROVIDER]) if SECONDARY_PROVIDER in PROVIDERS else None,
+)
+
+async def parseTranscribedText(prevtranscribedText, transcribedText, currentAttributes, templateAttributes):
+    return await router.call("parseTranscribedText", prevtranscribedText, transcribedText, currentAttributes, templateAttributes)
+
+def candidateFallback(candidateAttributes):
+    return {attr["field_name"]: attr["current_value"] for attr in candidateAttributes}
+
+# The provider modules raise on final sweep failures so the router can hedge them; when every
+# provider fails, the sweep keeps the candidate values.
+async def parseFinalAttributes(fullTranscript, candidateAttributes):
+    try:
+        return await router.call("parseFinalAttributes", fullTranscript, candidateAttributes)
+    except Exception as e:
+        print("Error during final sweep:", e)
+        return candidateFallback(candidateAttributes)
+
+async def parseFinalAttributesDelta(precedingContext, newTranscript, candidateAttributes):
+    try:
+        return await router.call("parseFinalAttributesDelta", precedingContext, newTranscript, candidateAttributes)
+    except Exception as e:
+        print("Error during incremental final sweep:", e)
+        return candidateFallback(candidateAttributes)
+
+async def summariseTranscript(previousSummary, transcriptText, fieldNames, maxChars):
+    return await router.call("summariseTranscript", previousSummary, transcriptText, fieldNames, maxChars)
+
+async def streamTranscribedText(prevtranscribedText, transcribedText, currentAttributes, templateAttributes, onAttribute):
+    # Partial results go straight to the socket, so a streamed call is never hedged.
+    return await router.primary.run("streamTranscribedText", prevtranscribedText, transcribedText, currentAttributes, templateAttributes, onAttribute)
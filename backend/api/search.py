@@ -0,0 +1,127 @@
+import os
+import re
+from collections import namedtuple
+from django.db import connection
+
+SEARCH_SNIPPET_WORDS = int(os.getenv("SEARCH_SNIPPET_WORDS", "16"))  # Words of context around a match
+SEARCH_HIGHLIGHT = "**"   # Marks matched terms in snippets; plain text, so clients need not trust HTML
+
+SearchHit = namedtuple("SearchHit", ["fill_id", "rank", "snippet"])
+
+def document_body(form_name, attributes, transcript):
+    """The text indexed for a fill; kept in step with the backfill in migration 0007."""
+    return "\n".join([
+        form_name,
+        *(f"{name}: {value}" for name, value in attributes.items()),
+        transcript,
+    ])
+
+class SearchBackend:
+    """
+    Ranked full-text search over api_searchdocument. Both backends index rows as they are inserted
+    (see migration 0007), so fills become searchable in the transaction that writes them.
+    `fills` is a FilledForm queryset restricting the candidates (user, final, form, dates).
+    """
+    vendor = None
+
+    def count(self, user_id, query, fills):
+        sql, params = self.matches(user_id, query, fills)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) {sql}", params)
+            return cursor.fetchone()[0]
+
+    def hits(self, user_id, query, fills, offset, limit):
+        sql, params = self.matches(user_id, query, fills)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT d.filled_form_id, {self.rank_sql}, {self.snippet_sql} {sql} "
+                f"ORDER BY {self.order_sql}, d.filled_form_id DESC LIMIT %s OFFSET %s",
+                [*self.select_params, *params, limit, offset],
+            )
+            return [SearchHit(*row) for row in cursor.fetchall()]
+
+    def matches(self, user_id, query, fills):
+        """FROM/WHERE clause and parameters selecting the user's matching documents."""
+        raise NotImplementedError
+
+class SqliteSearch(SearchBackend):
+    """FTS5 with BM25 ranking; terms are quoted so user input can never be read as FTS5 syntax."""
+    vendor = "sqlite"
+    rank_sql = "-bm25(api_search_fts)"
+    order_sql = "bm25(api_search_fts)"
+    snippet_sql = "snippet(api_search_fts, 0, %s, %s, '…', %s)"
+
+    @property
+    def select_params(self):
+        return [SEARCH_HIGHLIGHT, SEARCH_HIGHLIGHT, SEARCH_SNIPPET_WORDS]
+
+    def matches(self, user_id, query, fills):
+        terms = " ".join(f'"{term}"' for term in re.findall(r"\w+", query))
+        fills_sql, fills_params = fills.values("id").query.sql_with_params()
+        # CROSS JOIN pins the join order: MATCH once, then look up the hits. Left to the planner,
+        # SQLite walks the user's documents and re-runs the MATCH for each (~13x slower at 20k fills).
+        return (
+            "FROM api_search_fts CROSS JOIN api_searchdocument d ON d.id = api_search_fts.rowid "
+            f"WHERE api_search_fts MATCH %s AND d.user_id = %s AND d.filled_form_id IN ({fills_sql})",
+            [terms, user_id, *fills_params],
+        )
+
+class PostgresSearch(SearchBackend):
+    """Stored tsvector with a GIN index, ranked by cover density; queries use web search syntax."""
+    vendor = "postgresql"
+    rank_sql = "ts_rank_cd(d.search_vector, q)"
+    order_sql = "ts_rank_cd(d.search_vector, q) DESC"
+    snippet_sql = "ts_headline('english', d.body, q, %s)"
+
+    @property
+    def select_params(self):
+        return [
+            f"StartSel={SEARCH_HIGHLIGHT}, StopSel={SEARCH_HIGHLIGHT}, "
+            f"MaxWords={SEARCH_SNIPPET_WORDS}, MinWords={max(1, SEARCH_SNIPPET_WORDS // 3)}"
+        ]
+
+    def matches(self, user_id, query, fills):
+        fills_sql, fills_params = fills.values("id").query.sql_with_params()
+        return (
+            "FROM api_searchdocument d, websearch_to_tsquery('english', %s) q "
+            f"WHERE d.search_vector @@ q AND d.user_id = %s AND d.filled_form_id IN ({fills_sql})",
+            [query, user_id, *fills_params],
+        )
+
+BACKENDS = {
+    SqliteSearch.vendor: SqliteSearch,
+    PostgresSearch.vendor: PostgresSearch,
+}
+
+def get_search_backend():
+    """The search backend for the configured database (DB_ENGINE)."""
+    return BACKENDS[connection.vendor]()
+
+class SearchResults:
+    """
+    Lazily evaluated hits for one query, in rank order. Supports count() and slicing, which is all
+    Django's Paginator needs, so each page costs one COUNT and one LIMIT/OFFSET query.
+    """
+
+    def __init__(self, user_id, query, fills, backend=None):
+        self.user_id = user_id
+        self.query = query
+        self.fills = fills
+        self.backend = backend or get_search_backend()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.user_id, self.query, self.fills)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop if index.stop is not None else self.count()
+        if stop <= start:
+            return []
+        return self.backend.hits(self.user_id, self.query, self.fills, start, stop - start)
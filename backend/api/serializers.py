@@ -1,7 +1,32 @@
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
 from rest_framework import serializers
-from .models import Form, Block, Field
+from .models import Form, Block, Field, FilledForm
+
+def bulk_create_forms(forms_data):
+    """
+    Creates forms with their nested blocks and fields using one batched INSERT per table,
+    so the query count does not grow with the number of blocks or fields.
+    Must run inside a transaction; returns the created forms in input order.
+    """
+    forms = Form.objects.bulk_create([
+        Form(**{key: value for key, value in data.items() if key != "blocks"}) for data in forms_data
+    ])
+
+    blocks, fields_per_block = [], []
+    for form, data in zip(forms, forms_data):
+        for block_data in data["blocks"]:
+            blocks.append(Block(form=form, **{key: value for key, value in block_data.items() if key != "fields"}))
+            fields_per_block.append(block_data["fields"])
+    Block.objects.bulk_create(blocks)
+
+    Field.objects.bulk_create([
+        Field(block=block, **field_data)
+        for block, fields_data in zip(blocks, fields_per_block)
+        for field_data in fields_data
+    ])
+    return forms
 
 class FieldSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,26 +47,53 @@ class FormDetailSerializer(serializers.ModelSerializer):
         model = Form
         fields = ['id', 'form_name', 'blocks']
 
-class FormSerializer(serializers.ModelSerializer):
-    blocks = BlockSerializer(many=True)  # Include nested blocks
+class FormSummarySerializer(serializers.ModelSerializer):
+    """Lean listing representation; the counts come from annotations on the list queryset."""
+    block_count = serializers.IntegerField(read_only=True)
+    field_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Form
-        fields = ["id", "form_name", "blocks"]
+        fields = ["id", "form_name", "block_count", "field_count"]
+
+class FilledFormSerializer(serializers.ModelSerializer):
+    """A completed (or draft) fill with its values keyed by field name; the transcript only when asked for."""
+    form_name = serializers.CharField(source="form.form_name", read_only=True)
+    values = serializers.SerializerMethodField()
+    transcript = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FilledForm
+        fields = ["id", "form", "form_name", "session_id", "final", "submission_date", "values", "transcript"]
+
+    def get_values(self, obj):
+        return {field.field_name: field.field_value for field in obj.filled_fields.all()}
+
+    def get_transcript(self, obj):
+        if not self.context.get("include_transcript"):
+            return None
+        transcript = getattr(obj, "transcript", None)
+        return transcript.text if transcript is not None else None
+
+class FormListSerializer(serializers.ListSerializer):
+    """Used for FormSerializer(many=True): every form in the request is created in the same batched INSERTs."""
 
     def create(self, validated_data):
-        """Override create() to handle nested data"""
-        blocks_data = validated_data.pop("blocks")
-        form = Form.objects.create(**validated_data)
+        with transaction.atomic():
+            return bulk_create_forms(validated_data)
 
-        for block_data in blocks_data:
-            fields_data = block_data.pop("fields")
-            block = Block.objects.create(form=form, **block_data)
+class FormSerializer(serializers.ModelSerializer):
+    blocks = BlockSerializer(many=True)  # Include nested blocks
 
-            for field_data in fields_data:
-                Field.objects.create(block=block, **field_data)
+    class Meta:
+        model = Form
+        fields = ["id", "form_name", "blocks"]
+        list_serializer_class = FormListSerializer
 
-        return form
+    def create(self, validated_data):
+        """Override create() to handle nested data; all or nothing is written."""
+        with transaction.atomic():
+            return bulk_create_forms([validated_data])[0]
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from .models import TranscriptSegment
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Only needed for SESSION_STORE=redis
+    aioredis = None
+
+# "local" keeps sessions in this process (resume only works on the same worker);
+# "redis" shares them between every worker and node pointed at the same server.
+SESSION_STORE = os.getenv("SESSION_STORE", "local")
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+SESSION_TTL = int(os.getenv("SESSION_TTL", "1800"))                # Seconds a dropped session stays resumable
+SESSION_MAX_LOCAL = int(os.getenv("SESSION_MAX_LOCAL", "256"))
+SESSION_KEY_PREFIX = "formify:session:"
+# Transcript logs of sessions that never finished are deleted once this old (well past any session)
+SESSION_TRANSCRIPT_RETENTION = int(os.getenv("SESSION_TRANSCRIPT_RETENTION", "86400"))
+SESSION_TRANSCRIPT_SWEEP_INTERVAL = 3600   # Seconds between sweeps of abandoned logs, per process
+
+class SessionStore:
+    """
+    Persists a recording session's state (a JSON-serialisable dict) under its session id, so a
+    reconnecting client can continue on any worker that shares the store.
+    """
+    name = "base"
+
+    async def load(self, session_id):
+        raise NotImplementedError
+
+    async def save(self, session_id, state, ttl=SESSION_TTL):
+        raise NotImplementedError
+
+    async def delete(self, session_id):
+        """Drops the state and the transcript log."""
+        raise NotImplementedError
+
+    # The raw transcript log is shared by every store: segments are rows written as they arrive, so
+    # it grows in the database, never in the worker (which keeps only the bounded TranscriptMemory)
+    # or in Redis, and a session resumed on another node or worker still finds the whole log.
+
+    async def append_transcript(self, session_id, segment):
+        """Appends a segment to the session's raw transcript log; this is what gets persisted with the fill."""
+        await sync_to_async(_append_segment)(session_id, segment)
+
+    async def transcript(self, session_id):
+        """The session's raw transcript: every appended segment, in order."""
+        return await sync_to_async(_read_segments)(session_id)
+
+    async def delete_transcript(self, session_id):
+        await sync_to_async(_delete_segments)(session_id)
+
+_last_sweep = None
+
+def _append_segment(session_id, segment):
+    global _last_sweep
+    TranscriptSegment.objects.create(session_id=session_id, text=segment)
+    if _last_sweep is None or time.monotonic() - _last_sweep > SESSION_TRANSCRIPT_SWEEP_INTERVAL:
+        _last_sweep = time.monotonic()
+        cutoff = timezone.now() - timedelta(seconds=SESSION_TRANSCRIPT_RETENTION)
+        TranscriptSegment.objects.filter(created__lt=cutoff).delete()
+
+def _read_segments(session_id):
+    return "".join(TranscriptSegment.objects.filter(session_id=session_id).order_by("id").values_list("text", flat=True))
+
+def _delete_segments(session_id):
+    TranscriptSegment.objects.filter(session_id=session_id).delete()
+
+class LocalSessionStore(SessionStore):
+    """In-process LRU store with per-session expiry."""
+    name = "local"
+
+    def __init__(self, max_sessions=SESSION_MAX_LOCAL):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    async def load(self, session_id):
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        expires, payload = entry
+        if expires < time.time():
+            del self._sessions[session_id]
+            return None
+        return json.loads(payload)
+
+    async def save(self, session_id, state, ttl=SESSION_TTL):
+        # Stored serialised so the state behaves exactly as it would coming back from Redis.
+        self._sessions[session_id] = (time.time() + ttl, json.dumps(state))
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)   # Its transcript log goes with the retention sweep
+
+    async def delete(self, session_id):
+        self._sessions.pop(session_id, None)
+        await self.delete_transcript(session_id)
+
+class RedisSessionStore(SessionStore):
+    """
+    Networked store: one JSON value per session, with a TTL.
+    `client` can be any object with the redis.asyncio get/set/delete interface,
+    so a local stand-in can take the server's place.
+    """
+    name = "redis"
+
+    def __init__(self, client=None, url=SESSION_REDIS_URL):
+        if client is None:
+            if aioredis is None:
+                raise RuntimeError("SESSION_STORE=redis requires the 'redis' package.")
+            client = aioredis.from_url(url)
+        self.client = client
+
+    async def load(self, session_id):
+        payload = await self.client.get(SESSION_KEY_PREFIX + session_id)
+        return json.loads(payload) if payload is not None else None
+
+    async def save(self, session_id, state, ttl=SESSION_TTL):
+        await self.client.set(SESSION_KEY_PREFIX + session_id, json.dumps(state), ex=ttl)
+
+    async def delete(self, session_id):
+        await self.client.delete(SESSION_KEY_PREFIX + session_id)
+        await self.delete_transcript(session_id)
+
+STORES = {
+    LocalSessionStore.name: LocalSessionStore,
+    RedisSessionStore.name: RedisSessionStore,
+}
+
+_store = None
+
+def get_session_store():
+    """The process-wide session store, created on first use."""
+    global _store
+    if _store is None:
+        _store = STORES[SESSION_STORE]()
+    return _store
@@ -0,0 +1,64 @@
+import os
+import re
+
+# How many words at each side of a window boundary are compared when aligning the overlap.
+STITCH_WINDOW_WORDS = int(os.getenv("STITCH_WINDOW_WORDS", "12"))
+# Alignment slack: the overlap may start this many words into the new transcript (words garbled
+# or half-heard at the window's leading edge are skipped).
+STITCH_SLACK_WORDS = int(os.getenv("STITCH_SLACK_WORDS", "2"))
+
+_NON_WORD = re.compile(r"[^\w']+")
+
+def _normalise(word):
+    return _NON_WORD.sub("", word.lower())
+
+def overlapEnd(previousText: str, currentText: str, windowWords: int = STITCH_WINDOW_WORDS):
+    """
+    Where the words repeating the end of `previousText` stop in `currentText` (an index into its words),
+    or None if it does not start by repeating it.
+
+    Suffixes of the previous text are compared word by word (case and punctuation insensitive) with the
+    head of the current one, starting up to STITCH_SLACK_WORDS words in; the longest match wins. A single
+    shared word is only trusted at the very start (after at most one word garbled by the window edge).
+    """
+    tail = [_normalise(w) for w in previousText.split()[-windowWords:]]
+    head = [_normalise(w) for w in currentText.split()[:windowWords]]
+    best = None   # (overlap words, -start)
+    for start in range(min(STITCH_SLACK_WORDS, len(head) - 1) + 1):
+        for size in range(1 if start <= 1 else 2, min(len(tail), len(head) - start) + 1):
+            if tail[-size:] == head[start:start + size]:
+                best = max(best or (0, 0), (size, -start))
+    if best is None:
+        return None
+    return best[0] - best[1]
+
+def stitchTranscripts(previousText: str, currentText: str, windowWords: int = STITCH_WINDOW_WORDS) -> str:
+    """
+    Removes from `currentText` the words that repeat the end of `previousText`.
+
+    With overlapping audio windows, the start of each transcription re-transcribes the tail of the
+    previous window. If no overlap is found (see overlapEnd) the text is returned unchanged.
+    """
+    end = overlapEnd(previousText, currentText, windowWords)
+    if end is None:
+        return currentText
+    return " ".join(currentText.split()[end:])
+
+def stitchWindow(previousText: str, heldWord: str, currentText: str):
+    """
+    Stitches one overlapping window, holding back its last word until the next window confirms it.
+
+    The window edge cuts into the last word of a transcription, which the next window hears whole at
+    the end of its overlap. So the last word is not passed on: the next window is aligned against the
+    text before it (`previousText`), and whatever follows the overlap, including the word again, is
+    passed on. If no overlap is found the held word is passed on as it was.
+    Returns (text to pass on, previousText and heldWord for the next window).
+    """
+    currentWords = currentText.split()
+    if not currentWords:
+        return heldWord, "", ""
+    end = overlapEnd(previousText, currentText)
+    if end == len(currentWords):
+        return heldWord, currentText, ""   # Only repeated words: the held word was not heard again
+    words = currentWords[end:] if end is not None else [heldWord] * bool(heldWord) + currentWords
+    return " ".join(words[:-1]), " ".join(currentWords[:-1]), currentWords[-1]
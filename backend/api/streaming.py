@@ -0,0 +1,82 @@
+import os
+import json
+
+# Push each extracted attribute to the client as soon as its value is complete.
+STREAMING_EXTRACTION = os.getenv("STREAMING_EXTRACTION", "false").lower() == "true"
+
+class PartialAttributeParser:
+    """
+    Incremental parser for a streamed {"parsedAttributes": {name: value, ...}} JSON answer.
+
+    `feed()` takes the next fragment of generated text and returns the (name, value) pairs whose
+    values completed within it, so attributes can be pushed before the whole object has arrived.
+    Pairs are read from the second nesting level; string escapes are decoded with json.loads and
+    other scalars are passed on in their JSON form ("true", "42"). Nested values, nulls and anything
+    json.loads rejects (an unquoted word, a broken escape) are skipped, never raised.
+    """
+    PAIR_DEPTH = 2
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._raw = []
+        self._scalar = []
+        self._key = None
+        self._expect_value = False
+
+    def feed(self, fragment):
+        completed = []
+        for char in fragment:
+            if self._in_string:
+                self._raw.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._string("".join(self._raw), completed)
+            elif char == '"':
+                self._in_string = True
+                self._raw = [char]
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._scalar_done(completed)
+                self._depth -= 1
+            elif self._depth != self.PAIR_DEPTH:
+                continue
+            elif char == ":":
+                self._expect_value = True
+            elif char == ",":
+                self._scalar_done(completed)
+                self._expect_value = False
+            elif self._expect_value and not char.isspace():
+                self._scalar.append(char)   # Unquoted value: number, true/false or null
+        return completed
+
+    def _string(self, raw, completed):
+        if self._depth != self.PAIR_DEPTH:
+            return
+        try:
+            token = json.loads(raw)
+        except ValueError:
+            token = None   # Broken escape: the key (and so its value) or the value is skipped
+        if self._expect_value:
+            if token is not None and self._key is not None:
+                completed.append((self._key, token))
+            self._expect_value = False
+        else:
+            self._key = token
+
+    def _scalar_done(self, completed):
+        if self._depth == self.PAIR_DEPTH and self._scalar:
+            try:
+                value = json.loads("".join(self._scalar))
+            except ValueError:
+                value = None   # Not a JSON literal (e.g. "DOB": unknown)
+            if value is not None and self._key is not None:
+                completed.append((self._key, json.dumps(value)))
+            self._expect_value = False
+        self._scalar = []
@@ -1,3 +1,1416 @@
+import os
+import re
+import json
+import time
+import fcntl
+import random
+import asyncio
+import tempfile
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+import httpx
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .management.commands.benchmark_overlap_wer import FIXTURES_PATH, record, transcribe, word_errors
+from .models import Form, Block, Field, FilledForm, FilledFormField, Transcript, TranscriptSegment
+from .authentication import TokenAuthMiddleware, token_users
+from .form_cache import FormTemplateCache, form_details, form_templates
+from .final_sweep import SpeculativeSweep
+from .transcript_memory import TranscriptMemory
+from .pipeline import AudioPipeline
+from .llm_cache import DiskBackend, ResponseCache, cache_scope
+from .flush_policy import FlushWindow, AdaptivePolicy, FLUSH, DROP, WAIT
+from .workloads import WorkloadLane
+from .stitching import overlapEnd, stitchWindow
+from .webm import WebmStream, _read_vint, CLUSTER_ID, SIMPLE_BLOCK_ID, TIMECODE_ID
+from .password_pool import PasswordPool
+from .providers import Provider, ProviderRouter, parseFinalAttributes, router
+from .streaming import PartialAttributeParser
+from .prompting import selectRelevantFields, extractionContext, reportPromptTokens
+from . import gpt_parse
+from .routing import websocket_urlpatterns
+from .session_store import LocalSessionStore, RedisSessionStore, SESSION_KEY_PREFIX
+from .pagination import FORM_PAGE_SIZE
+from .serializers import bulk_create_forms
+from .signals import VersionBump, pending_bump
+from .write_behind import FillWriteBehind, write_fills
 
-# Create your tests here.
+def make_forms(user, count, blocks=2, fields_per_block=3):
+    return bulk_create_forms([
+        {
+            "user": user,
+            "form_name": f"Form {i}",
+            "blocks": [
+                {
+                    "block_name": f"Block {b}",
+                    "fields": [{"field_name": f"Field {f}", "field_type": "text"} for f in range(fields_per_block)],
+                }
+                for b in range(blocks)
+            ],
+        }
+        for i in range(count)
+    ])
+
+class FormListViewTests(TestCase):
+    url = "/api/auth/forms/list/"
+
+    def setUp(self):
+        self.user = User.objects.create_user("lister", "lister@example.com", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_query_count_does_not_grow_with_forms_or_fields(self):
+        make_forms(self.user, 3)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        make_forms(self.user, 40, blocks=10, fields_per_block=20)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_lists_summaries_with_counts(self):
+        make_forms(self.user, 1, blocks=3, fields_per_block=4)
+        make_forms(User.objects.create_user("other", "other@example.com", "password"), 2)
+        results = self.client.get(self.url).json()["results"]
+        self.assertEqual(len(results), 1)
+        self.assertEqual(set(results[0]), {"id", "form_name", "block_count", "field_count"})
+        self.assertEqual((results[0]["block_count"], results[0]["field_count"]), (3, 12))
+
+    def test_cursor_pages_cover_every_form_once(self):
+        forms = make_forms(self.user, FORM_PAGE_SIZE + 7)
+        first = self.client.get(self.url).json()
+        self.assertEqual(len(first["results"]), FORM_PAGE_SIZE)
+        second = self.client.get(first["next"]).json()
+        self.assertIsNone(second["next"])
+        ids = [form["id"] for form in first["results"] + second["results"]]
+        self.assertEqual(ids, sorted((form.id for form in forms), reverse=True))
+
+    def test_response_size_is_independent_of_form_size(self):
+        make_forms(self.user, 10, blocks=1, fields_per_block=1)
+        small = len(self.client.get(self.url).content)
+        Form.objects.all().delete()
+        make_forms(self.user, 10, blocks=20, fields_per_block=25)
+        large = len(self.client.get(self.url).content)
+        self.assertLess(large, small + 10 * 8)   # Only the count digits differ
+
+class FormDetailViewTests(TestCase):
+    def setUp(self):
+        form_details.clear()
+        self.user = User.objects.create_user("viewer", "viewer@example.com", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_nested_detail_is_prefetched(self):
+        form = make_forms(self.user, 1, blocks=15, fields_per_block=10)[0]
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/api/auth/forms/{form.id}/")
+        blocks = response.json()["blocks"]
+        self.assertEqual(len(blocks), 15)
+        self.assertTrue(all(len(block["fields"]) == 10 for block in blocks))
+
+    def test_other_users_forms_are_not_found(self):
+        form = make_forms(User.objects.create_user("owner", "owner@example.com", "password"), 1)[0]
+        self.assertEqual(self.client.get(f"/api/auth/forms/{form.id}/").status_code, 404)
+
+    def test_repeat_opens_skip_the_database(self):
+        form = make_forms(self.user, 1)[0]
+        first = self.client.get(f"/api/auth/forms/{form.id}/")
+        with self.assertNumQueries(0):
+            second = self.client.get(f"/api/auth/forms/{form.id}/")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second["ETag"], f'"{form.id}-1"')
+
+    def test_if_none_match_returns_not_modified(self):
+        form = make_forms(self.user, 1)[0]
+        etag = self.client.get(f"/api/auth/forms/{form.id}/")["ETag"]
+        response = self.client.get(f"/api/auth/forms/{form.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_field_change_bumps_version_and_refreshes_payload(self):
+        form = make_forms(self.user, 1)[0]
+        etag = self.client.get(f"/api/auth/forms/{form.id}/")["ETag"]
+        field = Field.objects.filter(block__form=form).first()
+        field.field_name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            field.save()
+        response = self.client.get(f"/api/auth/forms/{form.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("Renamed", response.content.decode())
+
+    def test_renaming_twice_never_reuses_a_version(self):
+        form = make_forms(self.user, 1)[0]
+        for name in ("First", "Second"):
+            form.form_name = name
+            with self.captureOnCommitCallbacks(execute=True):
+                form.save()
+        form.refresh_from_db()
+        self.assertEqual(form.version, 3)
+
+    def test_saving_a_stale_instance_never_reuses_a_version(self):
+        form = make_forms(self.user, 1)[0]
+        stale = Form.objects.get(id=form.id)
+        field = Field.objects.filter(block__form=form).first()
+        field.field_name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            field.save()
+        etag = self.client.get(f"/api/auth/forms/{form.id}/")["ETag"]
+        stale.form_name = "Stale rename"
+        with self.captureOnCommitCallbacks(execute=True):
+            stale.save()
+        form.refresh_from_db()
+        self.assertEqual((form.version, form.form_name), (3, "Stale rename"))
+        response = self.client.get(f"/api/auth/forms/{form.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Stale rename", response.content.decode())
+
+    def test_pending_bump_reads_djangos_on_commit_entries(self):
+        # pending_bump relies on this private layout; a Django upgrade that changes it must fail here
+        connection = transaction.get_connection()
+        with self.captureOnCommitCallbacks():
+            with transaction.atomic():
+                bump = VersionBump(0)
+                transaction.on_commit(bump)
+                savepoints, callback, robust = connection.run_on_commit[-1]
+                self.assertIs(callback, bump)
+                self.assertIsInstance(savepoints, set)
+                self.assertIsInstance(robust, bool)
+                self.assertIs(pending_bump(form_id=0), bump)
+            self.assertIs(pending_bump(form_id=0), bump)   # Released savepoint: still due at the commit
+            try:
+                with transaction.atomic():
+                    transaction.on_commit(VersionBump(1))
+                    raise ValueError
+            except ValueError:
+                pass
+            self.assertIsNone(pending_bump(form_id=1))     # Rolled back: Django dropped it
+
+    def test_nested_savepoints_share_one_bump(self):
+        form = make_forms(self.user, 1)[0]
+        fields = list(Field.objects.filter(block__form=form))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for field in fields:
+                with transaction.atomic():
+                    field.save()
+        self.assertEqual(len(callbacks), 1)
+        form.refresh_from_db()
+        self.assertEqual(form.version, 2)
+
+    def test_field_changes_bump_the_version_once_per_transaction(self):
+        form = make_forms(self.user, 1, blocks=3, fields_per_block=5)[0]
+        fields = list(Field.objects.filter(block__form=form))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertNumQueries(len(fields) + 3):   # Each UPDATE, and one form lookup per block
+                for field in fields:
+                    field.field_name += "!"
+                    field.save()
+        self.assertEqual(len(callbacks), 1)
+        form.refresh_from_db()
+        self.assertEqual(form.version, 2)
+
+    def test_rolled_back_savepoint_keeps_the_outer_bump(self):
+        form = make_forms(self.user, 1)[0]
+        field = Field.objects.filter(block__form=form).first()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    field.save()   # Registers the bump inside the savepoint...
+                    raise ValueError
+            except ValueError:
+                pass
+            field.save()           # ...so this change must register its own
+        self.assertEqual(len(callbacks), 1)
+        form.refresh_from_db()
+        self.assertEqual(form.version, 2)
+
+def form_payload(name, blocks=2, fields_per_block=3):
+    return {
+        "form_name": name,
+        "blocks": [
+            {"block_name": f"Block {b}",
+             "fields": [{"field_name": f"Field {f}", "field_type": "TEXT"} for f in range(fields_per_block)]}
+            for b in range(blocks)
+        ],
+    }
+
+class FormBatchCreateViewTests(TestCase):
+    url = "/api/auth/forms/create/batch/"
+
+    def setUp(self):
+        self.user = User.objects.create_user("batcher", "batcher@example.com", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counts(self):
+        return Form.objects.count(), Block.objects.count(), Field.objects.count()
+
+    def test_bare_list_and_wrapped_input_create_the_forms(self):
+        for data in ([form_payload("A"), form_payload("B")], {"forms": [form_payload("C"), form_payload("D")]}):
+            response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, 201)
+            sent = data["forms"] if isinstance(data, dict) else data
+            self.assertEqual([form["form_name"] for form in response.json()], [form["form_name"] for form in sent])
+            self.assertTrue(all(len(block["fields"]) == 3 for form in response.json() for block in form["blocks"]))
+        self.assertEqual(self.counts(), (4, 8, 24))
+        self.assertEqual(set(Form.objects.values_list("user_id", flat=True)), {self.user.id})
+
+    def test_one_invalid_form_writes_nothing(self):
+        invalid = form_payload("Broken")
+        del invalid["blocks"][1]["fields"][0]["field_type"]
+        response = self.client.post(self.url, [form_payload("A"), invalid, form_payload("C")], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("field_type", json.dumps(response.json()[1]))
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_a_failed_insert_rolls_back_the_batch(self):
+        with mock.patch.object(Field.objects, "bulk_create", side_effect=DatabaseError("disk full")):
+            with self.assertRaises(DatabaseError):
+                self.client.post(self.url, [form_payload("A"), form_payload("B")], format="json")
+        self.assertEqual(self.counts(), (0, 0, 0))   # Forms and blocks were already inserted
+
+    def test_rejects_empty_and_oversized_batches(self):
+        self.assertEqual(self.client.post(self.url, [], format="json").status_code, 400)
+        self.assertEqual(self.client.post(self.url, {"forms": "A"}, format="json").status_code, 400)
+        with mock.patch("api.views.FORM_BATCH_MAX", 3):
+            response = self.client.post(self.url, [form_payload(str(i)) for i in range(4)], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("At most 3", response.json()["error"])
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_query_count_does_not_grow_with_forms_or_fields(self):
+        queries = []
+        for forms, blocks, fields in ((1, 1, 1), (20, 4, 4)):   # 320 fields: one INSERT batch on SQLite (999 parameters)
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.post(self.url, [form_payload(str(i), blocks, fields) for i in range(forms)], format="json")
+            self.assertEqual(response.status_code, 201)
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(self.counts(), (21, 81, 321))
+
+class FormTemplateCacheTests(TestCase):
+    def test_templates_expire_for_changes_made_in_other_workers(self):
+        form = make_forms(User.objects.create_user("templater"), 1)[0]
+        cache = FormTemplateCache(ttl=60)
+        self.assertEqual(cache.get(form.id).form_name, form.form_name)
+        Form.objects.filter(id=form.id).update(form_name="Renamed elsewhere")   # No signal reaches this cache
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get(form.id).form_name, form.form_name)
+        later = time.monotonic() + 61
+        with mock.patch("api.form_cache.time.monotonic", lambda: later):
+            self.assertEqual(cache.get(form.id).form_name, "Renamed elsewhere")
+
+class CachedTokenAuthenticationTests(TestCase):
+    url = "/api/auth/forms/list/"
+
+    def setUp(self):
+        token_users.clear()
+        self.user = User.objects.create_user("tokened", "tokened@example.com", "password")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_token_lookup_is_cached(self):
+        with self.assertNumQueries(2):   # Token+User join, then the listing
+            self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+class TranscriptionSocketAuthTests(TestCase):
+    def setUp(self):
+        token_users.clear()
+        self.owner = User.objects.create_user("owner", "owner@example.com", "password")
+        self.form = make_forms(self.owner, 1)[0]
+        self.application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        patcher = mock.patch("api.views.form_fills", FillWriteBehind(spool_dir=spool.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def handshake(self, key=None, query=""):
+        communicator = WebsocketCommunicator(self.application, f"/ws/transcription/{self.form.id}/{query}",
+                                             subprotocols=["token", key] if key else None)
+        connected, subprotocol = await communicator.connect()
+        if connected:
+            self.assertEqual(subprotocol, "token" if key else None)
+            await communicator.receive_json_from()
+        await communicator.disconnect()
+        return connected
+
+    async def test_rejects_missing_or_invalid_token(self):
+        self.assertFalse(await self.handshake())
+        self.assertFalse(await self.handshake("invalid"))
+
+    async def test_rejects_other_users_form(self):
+        other = await User.objects.acreate(username="intruder", email="intruder@example.com")
+        token = await Token.objects.acreate(user=other)
+        self.assertFalse(await self.handshake(token.key))
+
+    async def test_accepts_owner_token(self):
+        token = await Token.objects.acreate(user=self.owner)
+        self.assertTrue(await self.handshake(token.key))
+
+    async def test_deprecated_query_token_still_accepted(self):
+        token = await Token.objects.acreate(user=self.owner)
+        self.assertTrue(await self.handshake(query=f"?token={token.key}"))
+
+    def test_token_is_removed_from_the_scope(self):
+        scope = {
+            "query_string": b"token=query-key&session=abc",
+            "subprotocols": ["token", "protocol-key"],
+            "headers": [(b"sec-websocket-protocol", b"token, protocol-key"), (b"host", b"example.com")],
+        }
+        self.assertEqual(TokenAuthMiddleware.token_key(scope), "protocol-key")
+        self.assertEqual(scope["query_string"], b"session=abc")
+        self.assertEqual(scope["subprotocols"], ["token"])
+        self.assertNotIn(b"key", b"".join(value for _, value in scope["headers"]))
+
+def fill(form, session_id, final=True, transcript=None, **attributes):
+    return {
+        "session_id": session_id, "form_id": form.id, "user_id": form.user_id, "final": final,
+        "attributes": attributes, "transcript": transcript or f"transcript of {session_id}", "transcript_chars": 100,
+    }
+
+class FillWriteBehindTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("filler", "filler@example.com", "password")
+        self.form = make_forms(self.user, 1)[0]
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        self.spool_dir = spool.name
+
+    def test_rewriting_a_session_replaces_its_fill(self):
+        write_fills([fill(self.form, "s1", final=False, **{"Field 0": "draft"})])
+        write_fills([fill(self.form, "s1", **{"Field 0": "done", "Unknown": "x"}), fill(self.form, "s2")])
+        self.assertEqual(FilledForm.objects.count(), 2)
+        values = {f.field_name: (f.field_value, f.field_id) for f in FilledFormField.objects.filter(filled_form__session_id="s1")}
+        field = Field.objects.filter(block__form=self.form, field_name="Field 0").first()
+        self.assertEqual(values, {"Field 0": ("done", field.id), "Unknown": ("x", None)})
+        self.assertTrue(FilledForm.objects.get(session_id="s1").final)
+
+    def test_fills_of_deleted_forms_are_dropped(self):
+        orphan = make_forms(self.user, 1)[0]
+        record = fill(orphan, "orphan")
+        orphan.delete()
+        write_fills([record, fill(self.form, "s1")])
+        self.assertEqual(list(FilledForm.objects.values_list("session_id", flat=True)), ["s1"])
+
+    def test_batch_is_written_in_constant_queries(self):
+        with self.assertNumQueries(9):   # Form and field lookups, savepoint pair, delete, four INSERTs
+            write_fills([fill(self.form, f"s{i}", **{"Field 0": i, "Field 1": i}) for i in range(30)])
+        self.assertEqual(FilledFormField.objects.count(), 60)
+
+    def queue(self):
+        queue = FillWriteBehind(interval=3600, spool_dir=self.spool_dir)
+        self.addCleanup(lambda: queue._task and queue._task.cancel())
+        return queue
+
+    def spool(self, pid, *records):
+        path = os.path.join(self.spool_dir, f"spool-{pid}.jsonl")
+        with open(path, "w") as spool:
+            spool.writelines(json.dumps(record) + "\n" for record in records)
+        return path
+
+    async def test_spooled_fills_survive_a_crash(self):
+        crashed = self.queue()
+        await crashed.enqueue(fill(self.form, "s1", **{"Field 0": "kept"}))
+        crashed._task.cancel()   # The process dies before the flush
+        recovered = self.queue()
+        await recovered.flush()
+        self.assertTrue(await FilledForm.objects.filter(session_id="s1", final=True).aexists())
+        self.assertEqual(recovered.stats()["pending"], 0)
+
+    async def test_rejected_fills_are_dead_lettered_without_blocking_the_rest(self):
+        queue = self.queue()
+        poison = {**fill(self.form, "poison"), "user_id": None}
+        for record in (fill(self.form, "before"), poison, fill(self.form, "after")):
+            await queue.enqueue(record)
+        await queue.flush()
+        sessions = {session async for session in FilledForm.objects.values_list("session_id", flat=True)}
+        self.assertEqual(sessions, {"before", "after"})
+        self.assertEqual((queue.stats()["pending"], queue.stats()["dead_lettered"], queue.stats()["written"]), (0, 1, 2))
+        with open(queue.dead_letter_path) as dead:
+            self.assertEqual([json.loads(line)["record"]["session_id"] for line in dead], ["poison"])
+
+    async def test_spool_of_a_dead_process_is_claimed(self):
+        dead_pid = 2 ** 22 + 12345   # Above Linux's pid_max: its lock is free, as after a crash
+        path = self.spool(dead_pid, fill(self.form, "orphan"))
+        queue = self.queue()
+        await queue.flush()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(await FilledForm.objects.filter(session_id="orphan").aexists())
+
+    async def test_spool_of_a_live_process_is_left_alone(self):
+        live_pid = 2 ** 22 + 54321
+        path = self.spool(live_pid, fill(self.form, "theirs"))
+        with open(os.path.join(self.spool_dir, f"spool-{live_pid}.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)   # Held by its (running) owner
+            await self.queue().flush()
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(await FilledForm.objects.filter(session_id="theirs").aexists())
+
+    async def test_spool_claimed_by_another_worker_is_skipped(self):
+        missing = os.path.join(self.spool_dir, f"spool-{2 ** 22 + 1}.jsonl")   # Renamed away by the other worker
+        with mock.patch("api.write_behind.glob.glob", return_value=[missing]):
+            queue = self.queue()
+            await queue.enqueue(fill(self.form, "mine"))
+        await queue.flush()
+        self.assertTrue(await FilledForm.objects.filter(session_id="mine").aexists())
+
+class FilledFormListViewTests(TestCase):
+    url = "/api/auth/fills/"
+
+    def setUp(self):
+        self.user = User.objects.create_user("reader", "reader@example.com", "password")
+        self.forms = make_forms(self.user, 2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_query_count_does_not_grow_with_fills(self):
+        write_fills([fill(self.forms[0], "s0", **{"Field 0": "a"})])
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        write_fills([fill(self.forms[i % 2], f"s{i}", **{f"Field {f}": f for f in range(5)}) for i in range(1, 40)])
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url + "?transcript=true")
+        self.assertEqual(len(response.json()["results"]), 40)
+
+    def test_returns_own_final_fills_with_filters(self):
+        other = make_forms(User.objects.create_user("other", "other@example.com", "password"), 1)[0]
+        write_fills([
+            fill(self.forms[0], "done", **{"Field 0": "value"}),
+            fill(self.forms[1], "draft", final=False),
+            fill(other, "foreign"),
+        ])
+        results = self.client.get(self.url).json()["results"]
+        self.assertEqual([r["session_id"] for r in results], ["done"])
+        self.assertEqual((results[0]["values"], results[0]["transcript"]), ({"Field 0": "value"}, None))
+        sessions = [r["session_id"] for r in self.client.get(self.url + "?drafts=true").json()["results"]]
+        self.assertEqual(sessions, ["draft", "done"])
+        filtered = self.client.get(f"{self.url}?drafts=true&form={self.forms[1].id}").json()["results"]
+        self.assertEqual([r["session_id"] for r in filtered], ["draft"])
+        detailed = self.client.get(self.url + "?transcript=true").json()["results"]
+        self.assertEqual(detailed[0]["transcript"], "transcript of done")
+
+class FilledFormSearchViewTests(TestCase):
+    url = "/api/auth/fills/search/"
+
+    def setUp(self):
+        self.user = User.objects.create_user("searcher", "searcher@example.com", "password")
+        self.form = make_forms(self.user, 1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def sessions(self, query, **params):
+        return [hit["session_id"] for hit in self.search(query, **params)["results"]]
+
+    def test_ranks_transcripts_and_values_of_own_fills(self):
+        other = make_forms(User.objects.create_user("other", "other@example.com", "password"), 1)[0]
+        write_fills([
+            fill(self.form, "once", transcript="She said Centrelink had called about her payments."),
+            fill(self.form, "twice", transcript="Centrelink appointment moved; Centrelink will write."),
+            fill(self.form, "value", **{"Field 0": "Centrelink"}),
+            fill(self.form, "unrelated", transcript="Talked about the weather."),
+            fill(other, "foreign", transcript="Centrelink"),
+        ])
+        results = self.search("centrelink")["results"]
+        self.assertEqual({hit["session_id"] for hit in results}, {"once", "twice", "value"})
+        sessions = [hit["session_id"] for hit in results]
+        self.assertLess(sessions.index("twice"), sessions.index("once"))   # More mentions rank higher
+        self.assertEqual([hit["rank"] for hit in results], sorted((hit["rank"] for hit in results), reverse=True))
+        self.assertTrue(all("**Centrelink**" in hit["snippet"] for hit in results))
+        self.assertEqual(next(hit for hit in results if hit["session_id"] == "value")["values"], {"Field 0": "Centrelink"})
+        self.assertEqual(self.sessions("called payments"), ["once"])   # Every term must match, stemmed
+
+    def test_index_follows_rewritten_sessions(self):
+        write_fills([fill(self.form, "s1", final=False, transcript="mentions Centrelink")])
+        self.assertEqual(self.sessions("Centrelink"), [])
+        self.assertEqual(self.sessions("Centrelink", drafts="true"), ["s1"])
+        write_fills([fill(self.form, "s1", transcript="no longer mentioned")])
+        self.assertEqual(self.sessions("Centrelink", drafts="true"), [])
+        self.assertEqual(self.sessions("mentioned"), ["s1"])
+
+    def test_filters_by_submission_date(self):
+        write_fills([fill(self.form, month, transcript="Centrelink") for month in ("february", "march")])
+        FilledForm.objects.filter(session_id="february").update(submission_date=datetime(2026, 2, 20, tzinfo=timezone.utc))
+        FilledForm.objects.filter(session_id="march").update(submission_date=datetime(2026, 3, 31, 22, tzinfo=timezone.utc))
+        self.assertEqual(self.sessions("Centrelink", since="2026-03-01", until="2026-03-31"), ["march"])
+        self.assertEqual(self.sessions("Centrelink", until="2026-02-28"), ["february"])
+        self.assertEqual(self.client.get(self.url, {"q": "x", "since": "March"}).status_code, 400)
+
+    def test_pages_are_counted_and_bounded(self):
+        write_fills([fill(self.form, f"s{i}", transcript="Centrelink") for i in range(5)])
+        first = self.search("Centrelink", page_size=2)
+        self.assertEqual((first["count"], len(first["results"])), (5, 2))
+        with self.assertNumQueries(4):   # COUNT, page of hits, fills, their fields
+            last = self.client.get(self.url, {"q": "Centrelink", "page_size": 2, "page": 3}).json()
+        ids = [hit["id"] for hit in first["results"] + self.search("Centrelink", page_size=2, page=2)["results"] + last["results"]]
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_query_syntax_is_not_interpreted(self):
+        write_fills([fill(self.form, "s1", transcript="Centrelink or near home")])
+        self.assertEqual(self.sessions('Centrelink" OR (NEAR*'), ["s1"])
+        self.assertEqual(self.client.get(self.url, {"q": " \"* "}).status_code, 400)
+
+class RecordingSessionTests(TestCase):
+    """
+    Whole sessions over the socket with the providers stubbed. Transcriptions are handed to the
+    consumer the way a resumed session receives its unfinished work, so no audio is needed.
+    """
+
+    def setUp(self):
+        token_users.clear()
+        self.user = User.objects.create_user("recorder", "recorder@example.com", "password")
+        self.form = make_forms(self.user, 1)[0]
+        self.token = Token.objects.create(user=self.user)
+        self.application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+        self.store = LocalSessionStore()
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        for target, value in (
+            ("api.views.get_session_store", lambda: self.store),
+            ("api.views.form_fills", FillWriteBehind(spool_dir=spool.name)),
+            ("api.views.parseTranscribedText", self.extract),
+            ("api.transcript_memory.summariseTranscript", self.summarise),
+            ("api.final_sweep.parseFinalAttributes", self.verify),
+            ("api.final_sweep.parseFinalAttributesDelta", self.verify_delta),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    async def extract(prevText, text, currentAttributes, template):
+        return text, {"Field 0": text.split()[0]}   # Each segment's first word is the value
+
+    @staticmethod
+    async def summarise(previousSummary, text, fieldNames, maxChars):
+        return "SUMMARY"
+
+    @staticmethod
+    async def verify(transcript, candidates):
+        return {candidate["field_name"]: candidate["current_value"] for candidate in candidates}
+
+    @classmethod
+    async def verify_delta(cls, context, text, candidates):
+        return await cls.verify(text, candidates)
+
+    async def open(self, session_id=None):
+        query = f"?session={session_id}" if session_id else ""
+        communicator = WebsocketCommunicator(
+            self.application, f"/ws/transcription/{self.form.id}/{query}",
+            headers=[(b"authorization", f"Token {self.token.key}".encode())],
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator, await self.receive(communicator, "session_id")
+
+    @staticmethod
+    async def receive(communicator, key):
+        """The next message carrying `key`, skipping progress messages."""
+        while True:
+            message = await communicator.receive_json_from(timeout=5)
+            if key in message:
+                return message
+
+    async def queue_transcriptions(self, session_id, segments):
+        """Leave transcriptions in the session as if the connection had dropped before they were processed."""
+        state = await self.store.load(session_id)
+        state["pending_transcriptions"] = segments
+        await self.store.save(session_id, state)
+
+    async def test_fill_keeps_the_raw_transcript_after_compaction(self):
+        communicator, hello = await self.open()
+        await communicator.disconnect()
+        segments = [f"segment{i} " + "words " * 600 for i in range(5)]   # Enough to compact the memory
+        await self.queue_transcriptions(hello["session_id"], segments)
+
+        communicator, _ = await self.open(hello["session_id"])
+        await communicator.send_json_to({"action": "stop_recording"})
+        final = await self.receive(communicator, "final_results")
+        await communicator.disconnect()
+
+        self.assertIn("SUMMARY", final["corrected_audio"])   # Prompts see the compacted memory...
+        transcript = await Transcript.objects.select_related("filled_form").aget(filled_form__session_id=hello["session_id"])
+        self.assertEqual(transcript.text, "".join(segments))   # ...the stored fill the raw text
+        self.assertTrue(transcript.filled_form.final)
+        self.assertIsNone(await self.store.load(hello["session_id"]))
+
+    async def test_crashed_session_resumes_from_its_checkpoint(self):
+        communicator, hello = await self.open()
+        session_id = hello["session_id"]
+        await communicator.disconnect()
+        await self.queue_transcriptions(session_id, ["Ada spoke first. "])
+        communicator, _ = await self.open(session_id)
+        await self.receive(communicator, "attributes")
+
+        # Crash here: only the checkpoint written while processing the window survives
+        checkpoint = await self.store.load(session_id)
+        self.assertIn("Ada spoke first.", checkpoint["memory"]["tail"])
+        self.assertEqual(checkpoint["attributes"]["Field 0"], "Ada")   # Saved together with its text
+        await communicator.disconnect()
+        await self.store.save(session_id, checkpoint)
+
+        communicator, hello = await self.open(session_id)
+        self.assertTrue(hello["resumed"])
+        self.assertEqual((hello["attributes"], hello["corrected_audio"]), ({"Field 0": "Ada"}, "Ada spoke first. "))
+        await communicator.send_json_to({"action": "stop_recording"})
+        final = await self.receive(communicator, "final_results")
+        await communicator.disconnect()
+        self.assertEqual(final["attributes"]["Field 0"], "Ada")
+
+    async def test_audio_never_touches_the_filesystem(self):
+        uploads = []
+        def whisper(request):
+            uploads.append(request.read())
+            return httpx.Response(200, json={"text": "Ada spoke. "})
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        data, _, _ = webm_recording(random.Random(7), 6)
+        step = len(data) // 20 + 1
+        communicator, hello = await self.open()
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(whisper)) as client:
+            with mock.patch("api.views.get_http_client", lambda: client), mock.patch("tempfile.tempdir", temp_dir.name):
+                for start in range(0, len(data), step):
+                    await communicator.send_to(bytes_data=data[start:start + step])
+                await communicator.send_json_to({"action": "stop_recording"})
+                final = await self.receive(communicator, "final_results")
+                await communicator.disconnect()
+
+        self.assertEqual(final["attributes"]["Field 0"], "Ada")
+        self.assertGreaterEqual(len(uploads), 2)
+        self.assertIn(data[-100:], uploads[-1])   # The buffer went into the multipart body as-is
+        self.assertEqual(os.listdir(temp_dir.name), [])
+
+    async def test_deadline_flushes_after_the_audio_stops(self):
+        def whisper(request):
+            return httpx.Response(200, json={"text": "Ada spoke. "})
+        data, _, _ = webm_recording(random.Random(8), 2)
+        policy = AdaptivePolicy(min_speech=60, max_duration=60, deadline=0.3)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(whisper)) as client:
+            with mock.patch("api.views.get_http_client", lambda: client), mock.patch("api.views.make_flush_policy", lambda: policy):
+                communicator, hello = await self.open()
+                for chunk in (data[:len(data) // 2], data[len(data) // 2:]):
+                    await communicator.send_to(bytes_data=chunk)
+                    await asyncio.sleep(0.02)
+                message = await self.receive(communicator, "attributes")   # No more chunks, no stop
+                await communicator.disconnect()
+
+        self.assertEqual(message["attributes"]["Field 0"], "Ada")
+
+    async def test_streamed_extraction_survives_a_malformed_answer(self):
+        fragments = ['{"parsedAttributes": {"Field 0": "A', 'da", "Field 1": unkn', 'own, "Field 2": tr', 'ue, "Field 3": 4']
+        async def create(**kwargs):
+            async def chunks():
+                for fragment in fragments:
+                    yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=fragment))])
+                raise httpx.ReadError("connection dropped")   # Mid-answer: "Field 3" never completes
+            return chunks()
+        async def revise(text):
+            return text
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+        communicator, hello = await self.open()
+        await communicator.disconnect()
+        await self.queue_transcriptions(hello["session_id"], ["Ada spoke first. "])
+        with mock.patch("api.views.STREAMING_EXTRACTION", True), mock.patch("api.gpt_parse.client", client), \
+                mock.patch("api.gpt_parse.reviseTranscription", revise), mock.patch.object(router.primary, "_module", gpt_parse):
+            communicator, _ = await self.open(hello["session_id"])
+            partials = []
+            while "corrected_audio" not in (message := await self.receive(communicator, "attributes")):
+                partials.append(message)
+            await communicator.send_json_to({"action": "stop_recording"})
+            final = await self.receive(communicator, "final_results")
+            await communicator.disconnect()
+
+        self.assertEqual(partials, [{"partial": True, "attributes": {"Field 0": "Ada"}},
+                                    {"partial": True, "attributes": {"Field 2": "true"}}])
+        self.assertEqual(message["attributes"], {"Field 0": "Ada", "Field 2": "true"})   # Reconciles the partials
+        self.assertEqual(message["corrected_audio"], "Ada spoke first. ")
+        self.assertEqual((final["attributes"]["Field 0"], final["attributes"]["Field 2"]), ("Ada", "true"))
+        transcript = await Transcript.objects.aget(filled_form__session_id=hello["session_id"])
+        self.assertEqual(transcript.text, "Ada spoke first. ")
+
+    async def test_unknown_session_starts_fresh(self):
+        communicator, hello = await self.open("no-such-session")
+        await communicator.disconnect()
+        self.assertFalse(hello["resumed"])
+        self.assertNotEqual(hello["session_id"], "no-such-session")
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio calls RedisSessionStore makes (values come back as bytes)."""
+
+    def __init__(self):
+        self.values, self.ttls = {}, {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+        self.ttls[key] = ex
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+class RedisSessionStoreTests(TestCase):
+    async def test_state_and_transcript_round_trip(self):
+        client = FakeRedis()
+        store = RedisSessionStore(client=client)
+        await store.save("s1", {"attributes": {"name": "Ada"}}, ttl=60)
+        await store.append_transcript("s1", "Hello ")
+        await store.append_transcript("s1", "there.")
+        self.assertEqual(await store.load("s1"), {"attributes": {"name": "Ada"}})
+        self.assertEqual(await store.transcript("s1"), "Hello there.")
+        self.assertEqual(list(client.values), [SESSION_KEY_PREFIX + "s1"])   # The log is not in Redis
+        self.assertEqual(set(client.ttls.values()), {60})
+        await store.delete("s1")
+        self.assertIsNone(await store.load("s1"))
+        self.assertEqual(await store.transcript("s1"), "")
+
+class TranscriptLogTests(TestCase):
+    async def test_segments_are_rows_not_memory(self):
+        store = LocalSessionStore(max_sessions=1)
+        await store.save("s1", {}, ttl=60)
+        for i in range(50):
+            await store.append_transcript("s1", f"segment {i}. ")
+        self.assertEqual(await TranscriptSegment.objects.filter(session_id="s1").acount(), 50)
+        self.assertEqual(len(store._sessions), 1)
+        await store.save("s2", {}, ttl=60)   # Evicts s1's state; its log survives for the fill
+        self.assertEqual(await store.transcript("s1"), "".join(f"segment {i}. " for i in range(50)))
+        await store.delete("s1")
+        self.assertEqual(await store.transcript("s1"), "")
+
+    async def test_abandoned_logs_are_swept(self):
+        store = LocalSessionStore()
+        await store.append_transcript("old", "forgotten ")
+        await TranscriptSegment.objects.filter(session_id="old").aupdate(
+            created=datetime(2000, 1, 1, tzinfo=timezone.utc))
+        with mock.patch("api.session_store._last_sweep", None):
+            await store.append_transcript("new", "fresh ")
+        self.assertEqual(await store.transcript("old"), "")
+        self.assertEqual(await store.transcript("new"), "fresh ")
+
+class LoginViewTests(TestCase):
+    url = "/api/auth/login/"
+
+    def setUp(self):
+        User.objects.create_user("mixedcase", "Mixed.Case@Example.com", "password")
+
+    def test_email_lookup_ignores_case(self):
+        response = APIClient().post(self.url, {"email": "mixed.case@example.COM", "password": "password"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("token", response.json())
+
+    def test_wrong_password_is_rejected(self):
+        response = APIClient().post(self.url, {"email": "mixed.case@example.com", "password": "nope"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_full_password_pool_answers_429(self):
+        pool = PasswordPool(workers=1, queue=0, admit_wait=0)
+        pool._slots.acquire()   # The only slot is taken by another login
+        with mock.patch("api.views.password_checks", pool):
+            response = APIClient().post(self.url, {"email": "mixed.case@example.com", "password": "password"}, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(pool.stats()["rejected"], 1)
+
+class StubProviderServer:
+    """Local HTTP provider answering after `delay` seconds, or with a 500 when `fail` is set."""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name, self.delay, self.fail = name, delay, fail
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                time.sleep(stub.delay)
+                body = json.dumps({"finalAttributes": {"provider": stub.name}}).encode()
+                try:
+                    self.send_response(500 if stub.fail else 200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass   # The router cancelled this request
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def module(self):
+        """Stands in for gpt_parse/groq_parse: same call name, answered over HTTP."""
+        async def parseFinalAttributes(fullTranscript, candidateAttributes):
+            async with httpx.AsyncClient() as client:
+                response = await client.post(self.url, json={"transcript": fullTranscript})
+                response.raise_for_status()
+                return response.json()["finalAttributes"]
+        return SimpleNamespace(parseFinalAttributes=parseFinalAttributes)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class ProviderRouterTests(TestCase):
+    def stub(self, name, **options):
+        server = StubProviderServer(name, **options)
+        self.addCleanup(server.close)
+        return Provider(name, server.module())
+
+    def router(self, primary, secondary):
+        patcher = mock.patch("api.providers.HEDGE_DEFAULT_DELAY", 0.1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return ProviderRouter(primary, secondary, hedging=True)
+
+    async def test_slow_primary_is_hedged_and_recorded(self):
+        primary, secondary = self.stub("primary", delay=1.0), self.stub("secondary", delay=0.01)
+        router = self.router(primary, secondary)
+        started = time.monotonic()
+        result = await router.call("parseFinalAttributes", "text", [])
+        self.assertEqual(result, {"provider": "secondary"})
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assertEqual((router.hedged, secondary.wins, primary.wins), (1, 1, 0))
+        await asyncio.sleep(0.05)   # Let the cancelled primary unwind
+        # The cancelled primary still counts, at no less than the hedge delay
+        self.assertEqual(len(primary.histogram("parseFinalAttributes")), 1)
+        self.assertGreaterEqual(primary.histogram("parseFinalAttributes").percentile(0.5), 0.1)
+
+    async def test_fast_primary_is_not_hedged(self):
+        primary, secondary = self.stub("primary", delay=0.01), self.stub("secondary")
+        router = self.router(primary, secondary)
+        self.assertEqual(await router.call("parseFinalAttributes", "text", []), {"provider": "primary"})
+        self.assertEqual((router.hedged, primary.wins), (0, 1))
+        self.assertEqual(secondary.histogram("parseFinalAttributes").stats()["count"], 0)
+
+    async def test_failed_primary_hedges_immediately(self):
+        primary, secondary = self.stub("primary", fail=True), self.stub("secondary", delay=0.01)
+        router = self.router(primary, secondary)
+        self.assertEqual(await router.call("parseFinalAttributes", "text", []), {"provider": "secondary"})
+        self.assertEqual((router.hedged, primary.errors), (1, 1))
+
+    async def test_final_sweep_keeps_candidates_when_every_provider_fails(self):
+        router = self.router(self.stub("primary", fail=True), self.stub("secondary", fail=True))
+        with mock.patch("api.providers.router", router):
+            result = await parseFinalAttributes("text", [{"field_name": "name", "current_value": "Ada"}])
+        self.assertEqual(result, {"name": "Ada"})
+
+class SpeculativeSweepTests(TestCase):
+    def setUp(self):
+        self.template = form_templates.get(make_forms(User.objects.create_user("sweeper"), 1)[0].id)
+
+    @staticmethod
+    async def verify(*args):
+        return {candidate["field_name"]: candidate["current_value"] for candidate in args[-1]}
+
+    async def test_stop_does_not_queue_behind_background_sweeps(self):
+        lane = WorkloadLane("speculative_sweep", 1)
+        release = asyncio.Event()
+
+        async def other_session():
+            async with lane.slot():
+                await release.wait()
+
+        with mock.patch("api.final_sweep.speculative_sweep_lane", lane), \
+             mock.patch("api.final_sweep.parseFinalAttributes", self.verify), \
+             mock.patch("api.final_sweep.parseFinalAttributesDelta", self.verify):
+            holder = asyncio.create_task(other_session())   # Every speculative slot is busy
+            await asyncio.sleep(0)
+            memory = TranscriptMemory(["Field 0"])
+            memory.append("My name is Ada.")
+            sweep = SpeculativeSweep(self.template, interval=0, enabled=True)
+            sweep.refresh(memory, {"Field 0": "Ada"})
+            await asyncio.sleep(0)
+            self.assertEqual(lane.waiting, 1)
+
+            result = await asyncio.wait_for(sweep.finalise(memory, {"Field 0": "Ada"}), timeout=1)
+            self.assertEqual(result["Field 0"], "Ada")
+            self.assertTrue(sweep._task.cancelled())   # The queued background sweep gave way
+            release.set()
+            await holder
+
+def webm_element(element_id, payload):
+    length = next(n for n in range(1, 9) if len(payload) < (1 << (7 * n)) - 1)
+    size = ((1 << (7 * length)) | len(payload)).to_bytes(length, "big")
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + size + payload
+
+def webm_recording(rng, clusters, known_size=False):
+    """A recorder-like stream: (bytes, number of SimpleBlocks, expected init segment)."""
+    header = webm_element(0x1A45DFA3, webm_element(0x4282, b"webm"))
+    segment = (0x18538067).to_bytes(4, "big") + b"\x01\xff\xff\xff\xff\xff\xff\xff"
+    metadata = webm_element(0x1549A966, webm_element(0x2AD7B1, b"\x0f\x42\x40")) + webm_element(
+        0x1654AE6B, webm_element(0xAE, webm_element(0xD7, b"\x01") + webm_element(0x86, b"A_OPUS"))
+    )
+    data, blocks = header + segment + metadata, 0
+    for cluster in range(clusters):
+        body = webm_element(TIMECODE_ID, (cluster * 1000).to_bytes(2, "big"))
+        for block in range(rng.randint(1, 30)):
+            frame = b"\x81" + (block * 20).to_bytes(2, "big") + b"\x80" + rng.randbytes(rng.randint(1, 300))
+            body += webm_element(SIMPLE_BLOCK_ID, frame)
+            blocks += 1
+        if known_size:
+            data += webm_element(CLUSTER_ID, body)
+        else:
+            data += CLUSTER_ID.to_bytes(4, "big") + b"\x01\xff\xff\xff\xff\xff\xff\xff" + body
+    return data, blocks, header + segment + metadata
+
+class WebmStreamFuzzTests(TestCase):
+    """Seeded fuzzing of the chunk parser: random chunk sizes, duplicated headers, truncation and corruption."""
+
+    def window_blocks(self, window, init):
+        """Checks a window is the init segment plus unknown-size Clusters of Timecodes and blocks; counts the blocks."""
+        self.assertEqual(bytes(window[:len(init)]), init)
+        pos, blocks = len(init), 0
+        self.assertEqual(bytes(window[pos:pos + 4]), CLUSTER_ID.to_bytes(4, "big"))
+        while pos < len(window):
+            element_id, id_len = _read_vint(window, pos, True)
+            size, size_len = _read_vint(window, pos + id_len, False)
+            if element_id == CLUSTER_ID:
+                self.assertEqual(size, -1)
+                pos += id_len + size_len
+                continue
+            self.assertIn(element_id, (TIMECODE_ID, SIMPLE_BLOCK_ID))
+            blocks += element_id == SIMPLE_BLOCK_ID
+            pos += id_len + size_len + size
+        self.assertEqual(pos, len(window))
+        return blocks
+
+    def stream_through(self, rng, stream, data, init, take_chance=0.3, max_chunk=700):
+        blocks, pos = 0, 0
+        while pos < len(data):
+            size = rng.randint(1, max_chunk)
+            stream.feed(data[pos:pos + size])
+            pos += size
+            if rng.random() < take_chance:
+                blocks += self.take_blocks(stream, init)
+        return blocks + self.take_blocks(stream, init)
+
+    def take_blocks(self, stream, init):
+        """New blocks in the next window: those carried over as overlap were counted last time."""
+        carried = stream.overlap_blocks
+        window = stream.take()
+        return 0 if window is None else self.window_blocks(window, init) - carried
+
+    def test_every_block_arrives_once_in_a_valid_window(self):
+        rng = random.Random(1)
+        for trial in range(150):
+            data, blocks, init = webm_recording(rng, rng.randint(1, 6), known_size=trial % 2 == 0)
+            with self.subTest(trial=trial):
+                self.assertEqual(self.stream_through(rng, WebmStream(), data, init), blocks)
+
+    def test_duplicated_header_from_a_restarted_recorder(self):
+        rng = random.Random(2)
+        for trial in range(100):
+            data, blocks, init = webm_recording(rng, rng.randint(1, 4), known_size=trial % 2 == 0)
+            stream = WebmStream()
+            with self.subTest(trial=trial):
+                self.assertEqual(self.stream_through(rng, stream, data + data, init), 2 * blocks)
+                self.assertEqual(stream.init_segment, init)
+                self.assertEqual(stream.skipped, 0)
+
+    def test_truncated_block_waits_for_the_rest(self):
+        rng = random.Random(3)
+        data, blocks, init = webm_recording(rng, 2)
+        cut = len(data) - 5   # Inside the last block
+        stream = WebmStream()
+        stream.feed(data[:cut])
+        self.assertEqual(self.window_blocks(stream.take(), init), blocks - 1)
+        stream.feed(data[cut:])
+        self.assertEqual(self.window_blocks(stream.take(), init), 1)
+
+    def test_truncated_and_corrupted_input_never_breaks_the_parser(self):
+        rng = random.Random(4)
+        for trial in range(300):
+            data, _, _ = webm_recording(rng, 3)
+            cut = rng.randint(0, len(data))
+            data = bytearray(data[:cut] + rng.randbytes(rng.randint(0, 50)) + data[cut:])
+            for _ in range(rng.randint(0, 5)):
+                data[rng.randrange(len(data))] = rng.randrange(256)
+            data = bytes(data[rng.randint(0, 20):])   # Possibly without the start of the header
+            stream, pos = WebmStream(), 0
+            with self.subTest(trial=trial):
+                while pos < len(data):
+                    size = rng.randint(1, 500)
+                    stream.feed(data[pos:pos + size])
+                    pos += size
+                    window = stream.take()
+                    if window is not None:
+                        self.assertTrue(bytes(window).startswith(stream.init_segment or b""))
+                self.assertLessEqual(len(stream._pending), len(data))
+
+    def test_overlap_repeats_blocks_without_losing_any(self):
+        rng = random.Random(5)
+        for trial in range(100):
+            data, blocks, init = webm_recording(rng, rng.randint(1, 6), known_size=trial % 2 == 0)
+            with self.subTest(trial=trial):
+                self.assertEqual(self.stream_through(rng, WebmStream(overlap_ms=60), data, init), blocks)
+
+    def test_resumed_stream_restarts_at_the_next_cluster(self):
+        rng = random.Random(6)
+        for trial in range(50):
+            data, _, init = webm_recording(rng, 4)
+            clusters = [i for i in range(len(data)) if data.startswith(CLUSTER_ID.to_bytes(4, "big"), i)]
+            cut = rng.randint(clusters[0] + 1, clusters[-1] - 1)   # The old connection dropped mid-cluster
+            later = [i for i in clusters if i >= cut]
+            expected = sum(
+                self.window_blocks(init + data[start:end], init)
+                for start, end in zip(later, later[1:] + [len(data)])
+            )
+            stream = WebmStream()
+            stream.resume(init)
+            with self.subTest(trial=trial):
+                self.assertEqual(self.stream_through(rng, stream, data[cut:], init), expected)
+
+class PromptingTests(TestCase):
+    template = [
+        {"block_name": "Client", "field_name": "Name", "field_type": "TEXT"},
+        {"block_name": "Client", "field_name": "Date of Birth", "field_type": "DATE"},
+        {"block_name": "Client", "field_name": "Marital Status", "field_type": "TEXT"},
+        {"block_name": "Work", "field_name": "Employer", "field_type": "TEXT"},
+    ]
+    filled = {"Name": "Ada Lovelace", "Date of Birth": "1 Jan 1990", "Marital Status": "Single", "Employer": "N/A"}
+
+    def selected(self, text, attributes=None):
+        attributes = self.filled if attributes is None else attributes
+        return [field["field_name"] for field in selectRelevantFields(text, attributes, self.template)]
+
+    def test_empty_fields_are_always_selected(self):
+        self.assertEqual(self.selected("Nothing relevant here."), ["Employer"])
+
+    def test_numbers_reach_numeric_values(self):
+        self.assertEqual(self.selected("Sorry, I was born in 1991."), ["Date of Birth", "Employer"])
+        self.assertIn("Date of Birth", self.selected("Born in 1991.", {"Date of Birth": "unknown"}))   # DATE type
+
+    def test_word_stems_match(self):
+        self.assertIn("Marital Status", self.selected("I got married last year; my status changed."))
+        self.assertIn("Name", self.selected("Her name is Ada Byron, not Lovelace."))
+
+    def test_full_mode_embeds_everything(self):
+        with mock.patch("api.prompting.EXTRACTION_MODE", "full"):
+            attributesToFind, currentRecorded, fieldCount = extractionContext("text", self.filled, self.template)
+        self.assertIs(attributesToFind, self.template)
+        self.assertEqual((json.loads(currentRecorded), fieldCount), (self.filled, None))
+
+    def test_incremental_mode_filters_only_the_template(self):
+        attributes = dict(self.filled, Employer="Analytical Engines")   # Every field filled
+        with mock.patch("api.prompting.EXTRACTION_MODE", "incremental"):
+            attributesToFind, currentRecorded, fieldCount = extractionContext("I was born in 1991.", attributes, self.template)
+        self.assertEqual(json.loads(attributesToFind), {"Client": {"Date of Birth": "DATE"}})
+        self.assertEqual(currentRecorded, json.dumps(attributes, separators=(",", ":")))   # All still correctable...
+        self.assertEqual(fieldCount, 4)   # ...so the call is made
+
+    def test_incremental_mode_skips_empty_values_and_unknown_keys(self):
+        attributes = {"Name": "N/A", "Employer": "", "Nickname": "Countess"}
+        with mock.patch("api.prompting.EXTRACTION_MODE", "incremental"):
+            _, currentRecorded, fieldCount = extractionContext("text", attributes, json.dumps(self.template))
+        self.assertEqual((currentRecorded, fieldCount), ("{}", 4))
+
+    def test_token_report_compares_like_with_like(self):
+        for mode in ("full", "incremental"):
+            with mock.patch("api.prompting.EXTRACTION_MODE", mode), mock.patch("builtins.print") as log:
+                context = extractionContext("Nothing relevant here.", self.filled, self.template)
+                reportPromptTokens("extract", SimpleNamespace(prompt_tokens=500), context[2], *context[:2], self.filled, self.template)
+            sent, full = map(int, re.search(r"~(\d+) tokens \(full mode ~(\d+)\)", log.call_args.args[0]).groups())
+            if mode == "full":
+                self.assertEqual(sent, full)
+            else:
+                self.assertLess(sent, full)
+
+class StitchingTests(TestCase):
+    def test_overlap_only_counts_at_the_window_start(self):
+        self.assertEqual(overlapEnd("we spoke about the", "the budget for"), 1)
+        self.assertEqual(overlapEnd("about the budget,", "Budget for next year"), 1)
+        self.assertEqual(overlapEnd("spoke about the", "um about the plan"), 3)
+        self.assertIsNone(overlapEnd("we spoke about the", "so then we met the"))   # One word, far in
+
+    def test_held_word_is_passed_on_as_the_next_window_heard_it(self):
+        self.assertEqual(
+            stitchWindow("my name is Ellen", "Thomps", "Ellen Thompson, and my"),
+            ("Thompson, and", "Ellen Thompson, and", "my"),
+        )
+        self.assertEqual(stitchWindow("my name is", "Ellen", "Thompson, and my"), ("Ellen Thompson, and", "Thompson, and", "my"))
+        self.assertEqual(stitchWindow("my name is", "Ellen", ""), ("Ellen", "", ""))
+
+    def test_overlap_lowers_word_error_rate_on_the_fixtures(self):
+        with open(FIXTURES_PATH) as f:
+            recordings = [(fixture["text"].split(), record(fixture)) for fixture in json.load(f)]
+
+        def wer(overlap_ms):
+            errors = sum(
+                word_errors(words, transcribe(chunks, spans, words, 2000, overlap_ms).split())
+                for words, (chunks, spans) in recordings
+            )
+            return errors / sum(len(words) for words, _ in recordings)
+
+        self.assertLess(wer(1500), 0.05)
+        self.assertGreater(wer(0), 3 * wer(1500))
+
+class PartialAttributeParserTests(TestCase):
+    @staticmethod
+    def parse(answer, size=1):
+        parser = PartialAttributeParser()
+        return [pair for start in range(0, len(answer), size) for pair in parser.feed(answer[start:start + size])]
+
+    def test_pairs_complete_across_fragments(self):
+        answer = '{"parsedAttributes": {"Name": "Ada Lovelace", "Age": 36, "City": "London"}}'
+        expected = [("Name", "Ada Lovelace"), ("Age", "36"), ("City", "London")]
+        for size in (1, 3, 7, len(answer)):
+            self.assertEqual(self.parse(answer, size), expected)
+
+    def test_pairs_are_pushed_as_they_complete(self):
+        parser = PartialAttributeParser()
+        self.assertEqual(parser.feed('{"parsedAttributes": {"Name": "Ad'), [])
+        self.assertEqual(parser.feed('a", "Age": 3'), [("Name", "Ada")])
+        self.assertEqual(parser.feed('6}'), [("Age", "36")])
+
+    def test_escapes_are_decoded(self):
+        answer = r'{"parsedAttributes": {"Quote": "she said \"hi, {there}\"\n", "Path": "C:\\temp", "Accent": "\u00e9"}}'
+        self.assertEqual(self.parse(answer), [("Quote", 'she said "hi, {there}"\n'), ("Path", "C:\\temp"), ("Accent", "\u00e9")])
+
+    def test_nested_values_are_skipped(self):
+        answer = '{"parsedAttributes": {"Address": {"Street": "Main", "No": 1}, "Tags": ["a", 2], "Name": "Ada"}}'
+        self.assertEqual(self.parse(answer, 4), [("Name", "Ada")])
+
+    def test_scalars_keep_their_json_form(self):
+        answer = '{"parsedAttributes": {"Married": true, "Retired": false, "Height": 1.5, "Notes": null, "Name": "Ada"}}'
+        self.assertEqual(self.parse(answer), [("Married", "true"), ("Retired", "false"), ("Height", "1.5"), ("Name", "Ada")])
+
+    def test_malformed_values_are_skipped(self):
+        answer = r'{"parsedAttributes": {"DOB": unknown, "Bad": "\q", "Also": 1.2.3, "Name": "Ada"}}'
+        self.assertEqual(self.parse(answer, 5), [("Name", "Ada")])
+
+class AudioPipelineTests(TestCase):
+    """The stages are driven by events, so every interleaving below is forced rather than timed."""
+
+    def setUp(self):
+        self.transcribing = {}   # audio -> Event that lets its transcription finish
+        self.extracting = {}     # transcription -> Event that lets its extraction finish
+        self.started = []
+        self.extracted = []
+
+    async def transcribe(self, audio):
+        self.started.append(("transcribe", audio))
+        await self.transcribing.setdefault(audio, asyncio.Event()).wait()
+        if audio == "bad":
+            raise ValueError("unreadable window")
+        return audio.upper()
+
+    async def extract(self, seq, transcription):
+        self.started.append(("extract", transcription))
+        await self.extracting.setdefault(transcription, asyncio.Event()).wait()
+        self.extracted.append((seq, transcription))
+
+    def release(self, events, *keys):
+        for key in keys:
+            events.setdefault(key, asyncio.Event()).set()
+
+    async def pipeline(self, maxsize=4):
+        pipeline = AudioPipeline(self.transcribe, self.extract, maxsize=maxsize)
+        pipeline.start()
+        self.addCleanup(lambda: [task.cancel() for task in pipeline._tasks])
+        return pipeline
+
+    async def settle(self):
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+    async def test_stages_overlap_and_results_keep_submission_order(self):
+        pipeline = await self.pipeline()
+        for audio in ("a", "b", "c"):
+            await pipeline.submit(audio)
+        self.release(self.transcribing, "a")
+        await self.settle()
+        # "A" is being extracted while "b" is already being transcribed
+        self.assertIn(("extract", "A"), self.started)
+        self.assertIn(("transcribe", "b"), self.started)
+        self.release(self.transcribing, "c", "b")
+        self.release(self.extracting, "C", "B", "A")
+        await asyncio.wait_for(pipeline.drain(), 1)
+        self.assertEqual(self.extracted, [(0, "A"), (1, "B"), (2, "C")])
+
+    async def test_full_queue_blocks_submit(self):
+        pipeline = await self.pipeline(maxsize=1)
+        await pipeline.submit("a")    # Taken by the transcription worker
+        await self.settle()
+        await pipeline.submit("b")    # Fills the queue
+        blocked = asyncio.ensure_future(pipeline.submit("c"))
+        await self.settle()
+        self.assertFalse(blocked.done())
+        self.assertEqual(pipeline.stats()["transcription_queue_depth"], 1)
+        self.release(self.transcribing, "a")
+        await asyncio.wait_for(blocked, 1)
+
+    async def test_drain_waits_for_both_stages(self):
+        pipeline = await self.pipeline()
+        await pipeline.submit("a")
+        await pipeline.submit_transcription("RESUMED")
+        self.release(self.transcribing, "a")
+        draining = asyncio.ensure_future(pipeline.drain())
+        await self.settle()
+        self.assertFalse(draining.done())   # Transcribed, but "A" is not extracted yet
+        self.release(self.extracting, "RESUMED", "A")
+        await asyncio.wait_for(draining, 1)
+        self.assertEqual(self.extracted, [(1, "RESUMED"), (0, "A")])
+        self.assertEqual(pipeline.unfinished(), ([], []))
+
+    async def test_close_hands_over_unfinished_work_oldest_first(self):
+        pipeline = await self.pipeline()
+        for audio in ("a", "b", "c"):
+            await pipeline.submit(audio)
+        self.release(self.transcribing, "a")
+        await self.settle()   # "A" waits in extraction, "b" in transcription, "c" in the queue
+        await pipeline.close()
+        self.assertEqual(pipeline.unfinished(), (["b", "c"], ["A"]))
+        self.assertEqual(self.extracted, [])
+
+    async def test_failed_window_is_counted_and_dropped(self):
+        pipeline = await self.pipeline()
+        await pipeline.submit("bad")
+        await pipeline.submit("b")
+        self.release(self.transcribing, "bad", "b")
+        self.release(self.extracting, "B")
+        await asyncio.wait_for(pipeline.drain(), 1)
+        stats = pipeline.stats()
+        self.assertEqual((stats["transcription"]["failed"], stats["extraction"]["processed"]), (1, 1))
+        self.assertEqual(self.extracted, [(1, "B")])
+        self.assertEqual(pipeline.unfinished(), ([], []))
+
+class FlushPolicyTests(TestCase):
+    def replay(self, policy, chunks, start=100.0):
+        """Feeds (seconds since the previous chunk, bytes) chunks; returns the decision after each one."""
+        window, now, decisions = FlushWindow(), start, []
+        for gap, nbytes in chunks:
+            now += gap
+            window.add(nbytes, now, policy)
+            decisions.append(policy.decide(window, now))
+        return window, decisions
+
+    def test_pause_after_enough_speech_flushes(self):
+        policy = AdaptivePolicy(min_speech=1.0, pause=0.8, silence_rate=1500)
+        _, decisions = self.replay(policy, [(0, 4000)] + [(0.5, 4000)] * 3 + [(0.5, 200)] * 2)
+        self.assertEqual(decisions, [WAIT] * 5 + [FLUSH])
+
+    def test_pause_before_enough_speech_waits(self):
+        policy = AdaptivePolicy(min_speech=2.0, pause=0.8, max_duration=8.0, silence_rate=1500)
+        _, decisions = self.replay(policy, [(0, 4000), (0.5, 4000)] + [(0.5, 200)] * 4)
+        self.assertEqual(decisions, [WAIT] * 6)
+
+    def test_silence_only_window_is_dropped(self):
+        policy = AdaptivePolicy(max_duration=4.0, silence_rate=1500)
+        window, decisions = self.replay(policy, [(0, 200)] + [(0.5, 200)] * 8)
+        self.assertEqual(decisions, [WAIT] * 8 + [DROP])
+        self.assertEqual(policy.decide_at_stop(window), DROP)
+
+    def test_deadline_flushes_a_slow_trickle(self):
+        policy = AdaptivePolicy(max_duration=60, deadline=10.0, silence_rate=1500)
+        window, decisions = self.replay(policy, [(0, 4000)] + [(3, 9000)] * 4)
+        self.assertEqual(decisions, [WAIT] * 4 + [FLUSH])   # 12 s after the first chunk
+        self.assertEqual(policy.deadline_at(window), 110.0)
+        window.reset()
+        self.assertIsNone(policy.deadline_at(window))
+
+class FakeCompletions:
+    """Stands in for an OpenAI/Groq client; answers with the call count."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **request):
+        self.calls += 1
+        message = SimpleNamespace(content=f"answer {self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+class ResponseCacheTests(TestCase):
+    request = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Ada  spoke."}], "temperature": 0.0}
+
+    def disk(self, **options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        backend = DiskBackend(os.path.join(directory.name, "cache.sqlite3"), **options)
+        self.addCleanup(backend._db.close)
+        return backend
+
+    async def test_disk_backend_runs_off_the_event_loop(self):
+        backend = self.disk()
+        threads = []
+        for name in ("get", "set"):
+            method = getattr(backend, name)
+            setattr(backend, name, lambda *args, method=method: threads.append(threading.get_ident()) or method(*args))
+        cache, client = ResponseCache(backend), FakeCompletions()
+        self.assertEqual(await cache.complete(client, **self.request), ("answer 1", None))
+        self.assertEqual(await cache.complete(client, **self.request), ("answer 1", None))
+        self.assertEqual((client.calls, cache.hits, cache.misses), (1, 1, 1))
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_disk_backend_indexes_expiry_and_access_time(self):
+        backend = self.disk()
+        indexes = {row[1] for row in backend._db.execute("PRAGMA index_list(llm_cache)")}
+        self.assertTrue({"llm_cache_expires", "llm_cache_accessed"} <= indexes)
+        plan = " ".join(row[3] for row in backend._db.execute("EXPLAIN QUERY PLAN DELETE FROM llm_cache WHERE expires < 1"))
+        self.assertIn("llm_cache_expires", plan)
+
+    def test_disk_eviction_runs_on_a_schedule(self):
+        backend = self.disk(max_entries=2, evict_interval=60)
+        clock = [1000.0]
+        with mock.patch("api.llm_cache.time.time", lambda: clock[0]):
+            backend.set("first", "1", ttl=5)   # First write evicts (nothing yet) and starts the interval
+            for key in ("a", "b", "c"):
+                clock[0] += 1
+                backend.set(key, key, ttl=3600)
+            self.assertEqual(len(backend), 4)   # No eviction pass inside the interval
+            clock[0] = 1061.0
+            self.assertIsNone(backend.get("first"))   # Expired, even before it is evicted
+            backend.set("d", "d", ttl=3600)
+            self.assertEqual([backend.get(key) for key in ("b", "c", "d")], [None, "c", "d"])
+        self.assertEqual(len(backend), 2)
+        self.assertEqual(backend._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0], 2)
+
+    async def test_answers_are_cached_per_user(self):
+        cache, client = ResponseCache(self.disk()), FakeCompletions()
+
+        async def complete_as(user_id):
+            cache_scope.set(user_id)
+            return await cache.complete(client, **self.request)
+
+        self.assertEqual(await asyncio.create_task(complete_as("1")), ("answer 1", None))
+        self.assertEqual(await asyncio.create_task(complete_as("2")), ("answer 2", None))
+        self.assertEqual(await asyncio.create_task(complete_as("1")), ("answer 1", None))
+        with mock.patch("api.llm_cache.LLM_CACHE_SCOPE", "global"):
+            await asyncio.create_task(complete_as("1"))
+            self.assertEqual(await asyncio.create_task(complete_as("2")), ("answer 3", None))
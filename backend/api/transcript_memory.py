@@ -0,0 +1,133 @@
+import os
+import asyncio
+from .providers import summariseTranscript
+
+TRANSCRIPT_TAIL_CHARS = int(os.getenv("TRANSCRIPT_TAIL_CHARS", "6000"))        # Recent transcript kept verbatim
+TRANSCRIPT_COMPACT_CHARS = int(os.getenv("TRANSCRIPT_COMPACT_CHARS", "4000"))  # Raw text folded per compaction
+TRANSCRIPT_SUMMARY_CHARS = int(os.getenv("TRANSCRIPT_SUMMARY_CHARS", "3000"))  # Target summary length
+TRANSCRIPT_MEMORY_CAP = int(os.getenv("TRANSCRIPT_MEMORY_CAP", "24000"))       # Hard cap on summary + tail
+
+class TranscriptMemory:
+    """
+    Bounded transcript for one session: a rolling, field-aware summary of the older conversation
+    plus the most recent text verbatim.
+
+    Once the raw tail outgrows `tail_chars` by `compact_chars`, its oldest stretch is folded into the
+    summary in the background (values for the form's fields are kept word for word). If compaction
+    falls behind or fails, the oldest raw text is dropped so summary + tail never exceed `cap`.
+    Offsets are absolute positions in the full transcript, so callers can ask for the text after a
+    point they have already processed.
+    """
+
+    def __init__(self, field_names, tail_chars=TRANSCRIPT_TAIL_CHARS, compact_chars=TRANSCRIPT_COMPACT_CHARS,
+                 summary_chars=TRANSCRIPT_SUMMARY_CHARS, cap=TRANSCRIPT_MEMORY_CAP):
+        self.field_names = list(field_names)
+        self.tail_chars = tail_chars
+        self.compact_chars = compact_chars
+        self.summary_chars = summary_chars
+        self.cap = max(cap, summary_chars + tail_chars + compact_chars)
+        self.summary = ""
+        self.tail = ""
+        self.tail_start = 0      # Absolute offset of tail[0]
+        self.total = 0           # Characters appended over the session
+        self.compactions = 0
+        self.dropped = 0         # Characters discarded by the hard cap
+        self._task = None
+
+    def append(self, text):
+        self.tail += text
+        self.total += len(text)
+        if len(self.tail) > self.tail_chars + self.compact_chars and (self._task is None or self._task.done()):
+            end = self.tail_start + self._cut(self.tail, self.compact_chars)
+            self._task = asyncio.create_task(self._compact(self.tail_start, end))
+        self._enforce_cap()
+
+    def text(self):
+        """Compacted transcript: the summary of the earlier conversation followed by the raw tail."""
+        if not self.summary:
+            return self.tail
+        return f"[Summary of the earlier conversation]\n{self.summary}\n\n[Recent transcript]\n{self.tail}"
+
+    def since(self, offset):
+        """Raw text after absolute `offset`, or None if part of it has already been compacted."""
+        if offset < self.tail_start:
+            return None
+        return self.tail[offset - self.tail_start:]
+
+    def context_before(self, offset, chars):
+        """Up to `chars` of raw text before absolute `offset`, falling back to the summary's end."""
+        local = offset - self.tail_start
+        if local <= 0:
+            return self.summary[-chars:]
+        return self.tail[max(0, local - chars):local]
+
+    def state(self):
+        """JSON-serialisable snapshot for the session store (an in-flight compaction is not included)."""
+        return {
+            "summary": self.summary,
+            "tail": self.tail,
+            "tail_start": self.tail_start,
+            "total": self.total,
+            "compactions": self.compactions,
+            "dropped": self.dropped,
+        }
+
+    def restore(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self):
+        return {
+            "summary_chars": len(self.summary),
+            "tail_chars": len(self.tail),
+            "memory_chars": len(self.summary) + len(self.tail),
+            "transcript_chars": self.total,
+            "compactions": self.compactions,
+            "dropped_chars": self.dropped,
+        }
+
+    async def _compact(self, start, end):
+        try:
+            summary = await summariseTranscript(
+                self.summary, self.tail[:end - self.tail_start], self.field_names, self.summary_chars
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Error compacting transcript:", e)
+            return
+        if summary is None or end <= self.tail_start:
+            return   # Failed, or the hard cap already dropped this text; the next append retries
+        self.summary = summary[:self.summary_chars * 2]
+        self.tail = self.tail[end - self.tail_start:]
+        self.tail_start = end
+        self.compactions += 1
+        print(f"Transcript compacted: {self.stats()}")
+
+    def _enforce_cap(self):
+        excess = len(self.summary) + len(self.tail) - self.cap
+        if excess <= 0:
+            return
+        cut = self._cut(self.tail, excess, at_least=True)
+        self.tail = self.tail[cut:]
+        self.tail_start += cut
+        self.dropped += cut
+        print(f"Transcript memory cap reached; dropped {cut} chars of unsummarised text.")
+
+    @staticmethod
+    def _cut(text, length, at_least=False):
+        """A cut point near `length` at a sentence or word boundary (never below `length` if `at_least`)."""
+        if length >= len(text):
+            return len(text)
+        if at_least:
+            space = text.find(" ", length)
+            return len(text) if space < 0 else space + 1
+        for boundary in (". ", " "):
+            pos = text.rfind(boundary, length // 2, length)
+            if pos >= 0:
+                return pos + len(boundary)
+        return length
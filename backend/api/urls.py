@@ -1,10 +1,14 @@
 from django.urls import path
-from .views import RegisterUserView, LoginView, FormCreateView, FormListView, FormDetailView
+from .views import (RegisterUserView, LoginView, FormCreateView, FormBatchCreateView, FormListView, FormDetailView,
+                    FilledFormListView, FilledFormSearchView)
 
 urlpatterns = [
     path("register/", RegisterUserView.as_view(), name="register"),
     path("login/", LoginView.as_view(), name="login"),
     path("forms/create/", FormCreateView.as_view(), name="create_form"),
+    path("forms/create/batch/", FormBatchCreateView.as_view(), name="create_forms_batch"),
     path("forms/list/", FormListView.as_view(), name="form_list"),
     path("forms/<int:form_id>/", FormDetailView.as_view(), name="form_detail"),
+    path("fills/", FilledFormListView.as_view(), name="filled_form_list"),
+    path("fills/search/", FilledFormSearchView.as_view(), name="filled_form_search"),
 ]
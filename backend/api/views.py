@@ -1,54 +1,127 @@
-import os, json
-import tempfile, asyncio, requests
+import os, re, json, time, uuid, base64, asyncio
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+import httpx
 from django.contrib.auth.models import User
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.contrib.auth.hashers import check_password
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework.generics import ListAPIView
-from asgiref.sync import sync_to_async
+from django.db.models import Count
+from django.db.models.functions import Lower
 from channels.generic.websocket import AsyncWebsocketConsumer
-from .models import Form
-from .gpt_parse import parseTranscribedText, parseFinalAttributes
-from .serializers import UserRegistrationSerializer, FormSerializer, FormDetailSerializer
+from .models import Form, FilledForm
+from .pipeline import AudioPipeline
+from .form_cache import form_templates, form_details
+from .llm_cache import response_cache, cache_scope
+from .workloads import transcription_lane, extraction_lane, workload_stats
+from .audio import AudioUpload
+from .webm import WebmStream
+from .stitching import stitchWindow
+from .flush_policy import FlushWindow, make_flush_policy, FLUSH, DROP
+from .authentication import TOKEN_SUBPROTOCOL
+from .http_client import OPENAI_BASE_URL, get_http_client
+from .providers import parseTranscribedText, streamTranscribedText, router
+from .final_sweep import SpeculativeSweep
+from .transcript_memory import TranscriptMemory
+from .session_store import get_session_store
+from .write_behind import form_fills, fill_record
+from .streaming import STREAMING_EXTRACTION
+from .serializers import UserRegistrationSerializer, FormSerializer, FormSummarySerializer, FilledFormSerializer
+from .pagination import FormCursorPagination, SearchPagination
+from .search import SearchResults
+from .password_pool import password_checks, PasswordPoolBusy
 
-MIN_CHUNK_NUM = 8
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-WHISPER_API_URL = "https://api.openai.com/v1/audio/transcriptions"
+WHISPER_API_URL = f"{OPENAI_BASE_URL}/audio/transcriptions"
+FORM_BATCH_MAX = int(os.getenv("FORM_BATCH_MAX", "100"))  # Forms accepted by one batch create request
 class TranscriptionConsumer(AsyncWebsocketConsumer):
+    pipeline = None  # Set once the handshake is accepted
+
     async def connect(self):
         formid = self.scope['url_route']['kwargs']['formid']
-        await self.accept()
-        self.nchunks = 0
-        self.audio_buffer = b""
-        self.full_transcript = ""   # Cumulative transcription
+        # The user comes from the API token (TokenAuthMiddleware); only the form's owner may record into it.
+        user = self.scope.get("user")
+        try:
+            form_template = await form_templates.aget(formid) if user is not None and user.is_authenticated else None
+        except Form.DoesNotExist:
+            form_template = None
+        if form_template is None or form_template.user_id != user.id:
+            await self.close()  # Rejects the handshake
+            return
+        # A browser drops the connection unless the token subprotocol it offered is accepted
+        subprotocol = TOKEN_SUBPROTOCOL if TOKEN_SUBPROTOCOL in self.scope.get("subprotocols", []) else None
+        await self.accept(subprotocol)
+        cache_scope.set(str(user.id))  # Cached LLM answers are per user; the pipeline tasks inherit it
+        self.audio = WebmStream()  # Parses the recorder stream and holds the current window
+        self.flush_policy = make_flush_policy()  # Decides when a window goes to Whisper
+        self.flush_window = FlushWindow()
+        self.flush_timer = None     # Applies the policy's deadline when no chunk arrives to check it
+        self.flush_timer_at = None
         self.prev_trancript = ""    # Look back for better attribute extraction
         self.curr_transcript = ""  # Most recent transcription
-        self.all_attributes = []     # Cumulative list of all attribute dictionaries
+        self.last_raw_transcript = ""  # Raw Whisper output of the previous window, for overlap stitching
+        self.held_word = ""  # Its last word, passed on once the next window has heard it whole
         self.current_attributes = {} # Cumulative current attribute dictionary
-        form = await sync_to_async(Form.objects.get)(id=formid)
-
-        # Build the prompt to send to OpenAI
-        self.template = []
-        for block in await sync_to_async(list)(form.blocks.all()):  # Convert queryset to list asynchronously
-            for field in await sync_to_async(list)(block.fields.all()):
-                self.template.append({
-                    "block_name": block.block_name,
-                    "field_name": field.field_name,
-                    "field_type": field.field_type
-                })
-
-        self.webm_header = None  # store the first valid chunk as header
+
+        # Transcription and extraction run off the receive path so incoming chunks never wait
+        self.pipeline = AudioPipeline(self.transcribe_window, self.process_transcription)
+        self.pipeline.start()
+
+        # Compiled template from the form cache; hot forms cost no DB round trip
+        self.form_template = form_template
+        self.template = self.form_template.prompt if self.form_template.fields else []
+        # Bounded transcript: rolling field-aware summary plus the recent text verbatim
+        self.memory = TranscriptMemory(field["field_name"] for field in self.form_template.fields)
+        # Verifies attributes in the background so stop_recording only checks the latest text
+        self.sweep = SpeculativeSweep(self.form_template)
+
         self.final_sweep_completed = False
 
+        # Session state lives in the shared store, so a dropped client can reconnect with
+        # ?session=<id> on any worker and continue where it left off.
+        self.formid = str(formid)
+        self.sessions = get_session_store()
+        resume_id = parse_qs(self.scope.get("query_string", b"").decode()).get("session", [None])[0]
+        state = await self.load_session(resume_id) if resume_id else None
+        self.session_id = resume_id if state else uuid.uuid4().hex
+        if state:
+            await self.restore_session(state)
+        await self.send(text_data=json.dumps({
+            "session_id": self.session_id,
+            "resumed": state is not None,
+            **({"corrected_audio": self.memory.text(), "attributes": self.current_attributes} if state else {})
+        }))
+
 
     async def disconnect(self, close_code):
+        if self.pipeline is None:
+            return  # Handshake was rejected
+        self.schedule_flush_timer(None)
+        await self.pipeline.close()
+        self.sweep.cancel()
+        self.memory.close()
+        if self.final_sweep_completed:
+            await self.save_session(delete=True)
+        else:
+            # Hand over audio and transcriptions the pipeline had not finished with
+            await self.save_session(pending=True)
+            # Keep what was captured as a draft fill; a resumed session overwrites it
+            await self.persist_fill(self.current_attributes, final=False)
+        try:
+            await form_fills.flush()  # The spool keeps the fill if this fails
+        except Exception as e:
+            print("Error writing form fills:", e)
         # On disconnect, if no final sweep was performed, send the current data
         if not self.final_sweep_completed:
             await self.send(text_data=json.dumps({
-                "corrected_audio": self.full_transcript,
+                "corrected_audio": self.memory.text(),
                 "attributes": self.current_attributes
             }))
 
@@ -56,15 +129,34 @@ class TranscriptionConsumer(AsyncWebsocketConsumer):
         # Handle text data (control messages)
         if text_data:
             data = json.loads(text_data)
+            if data.get('action') == 'pipeline_stats':
+                await self.send(text_data=json.dumps({
+                    "pipeline_stats": self.pipeline.stats(),
+                    "llm_cache": response_cache.stats(),
+                    "workloads": workload_stats(),
+                    "providers": router.stats(),
+                    "transcript_memory": self.memory.stats()
+                }))
+                return
             if data.get('action') == 'stop_recording':
+                # Flush the tail of the recording, then let in-flight windows finish
+                # before the final sweep sees the transcript
+                self.schedule_flush_timer(None)
+                await self.apply_flush_decision(self.flush_policy.decide_at_stop(self.flush_window))
+                await self.pipeline.drain()
+                await self.release_held_word()
+                print("Pipeline stats at stop:", self.pipeline.stats())
+
                 # Process final sweep
                 final_attributes = await self.process_final_sweep()
                 self.final_sweep_completed = True
+                await self.persist_fill(final_attributes, final=True)  # Reads the transcript log, so before the delete
+                await self.save_session(delete=True)
                 
                 # Send final results
                 await self.send(text_data=json.dumps({
                     "final_results": True,
-                    "corrected_audio": self.full_transcript,
+                    "corrected_audio": self.memory.text(),
                     "attributes": final_attributes
                 }))
                 return
@@ -75,112 +167,227 @@ class TranscriptionConsumer(AsyncWebsocketConsumer):
                 # Hard-coded template; ideally, load from your DB.
                 self.template = ["name", "DOB", "Location", "Place of Birth"]
 
-            # Check if this incoming chunk has a valid WebM header signature.
-            if self.webm_header is None and self.check_webm_integrity(bytes_data):
-                # Store the entire first chunk as the header.
-                self.webm_header = bytes_data
-                self.audio_buffer += bytes_data
-                print("Stored WebM header from initial chunk.")
+            # Only complete blocks enter the window; the header is tracked by the parser.
+            self.audio.feed(bytes_data)
+
+            now = time.monotonic()
+            self.flush_window.add(len(bytes_data), now, self.flush_policy)
+            await self.apply_flush_decision(self.flush_policy.decide(self.flush_window, now))
+            self.schedule_flush_timer(self.flush_policy.deadline_at(self.flush_window))
+
+    def schedule_flush_timer(self, at):
+        """(Re)arms the deadline timer for the current window; None cancels it."""
+        if at == self.flush_timer_at:
+            return
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+        self.flush_timer, self.flush_timer_at = None, at
+        if at is not None:
+            self.flush_timer = asyncio.create_task(self.flush_at_deadline(at))
+
+    async def flush_at_deadline(self, at):
+        await asyncio.sleep(max(0.0, at - time.monotonic()))
+        self.flush_timer, self.flush_timer_at = None, None
+        try:
+            await self.apply_flush_decision(self.flush_policy.decide(self.flush_window, time.monotonic()))
+        except Exception as e:
+            print("Error flushing at the deadline:", e)
+
+    async def apply_flush_decision(self, decision):
+        if decision == FLUSH:
+            # Each window is a minimal valid file (header plus the new clusters), so it goes
+            # to the pipeline as-is and the next aggregation round starts fresh. The window is
+            # reset first: chunks arriving while submit waits on a full queue start the next one.
+            window = self.audio.take()
+            self.flush_window.reset()
+            if window is not None:
+                await self.pipeline.submit(window)
+        elif decision == DROP:
+            # Silence only: skip the Whisper call entirely.
+            self.audio.take()
+            self.flush_window.reset()
+
+    async def process_transcription(self, seq, transcription):
+        """
+        Extraction stage of the pipeline: revise the transcription, extract attributes and
+        push the cumulative state to the client. Windows arrive here in submission order.
+        """
+        async with extraction_lane.slot():
+            if STREAMING_EXTRACTION:
+                # Push each attribute as soon as its value completes; the message below reconciles.
+                fixed_transcript, extracted_attributes = await streamTranscribedText(
+                    self.prev_trancript,
+                    transcription,
+                    self.current_attributes,
+                    self.template,
+                    self.send_partial_attribute
+                )
             else:
-                # For subsequent chunks, if they appear to include a header signature,
-                # strip the first 4 bytes (the EBML signature) to avoid duplicate headers.
-                if self.check_webm_integrity(bytes_data):
-                    print("Detected header in subsequent chunk. Stripping first 4 bytes.")
-                    self.audio_buffer += bytes_data[4:]
-                else:
-                    self.audio_buffer += bytes_data
-
-            self.nchunks += 1
-
-            if self.nchunks >= MIN_CHUNK_NUM:
-                # Ensure the aggregated audio starts with a valid header.
-                audio_data = self.audio_buffer
-                if not self.check_webm_integrity(audio_data) and self.webm_header:
-                    audio_data = self.webm_header + audio_data
-
-                # threading loop to ensure efficient gpt parsing 
-                # minimising effects of blocking functions
-                transcription = await self.run_whisper_on_buffer(audio_data)
-                loop = asyncio.get_event_loop()
-                fixed_transcript, extracted_attributes = await loop.run_in_executor(
-                    None,
-                    parseTranscribedText,
+                fixed_transcript, extracted_attributes = await parseTranscribedText(
                     self.prev_trancript,
                     transcription,
                     self.current_attributes,
                     self.template
                 )
-                self.prev_trancript = self.curr_transcript
-                self.curr_transcript = fixed_transcript
-                self.full_transcript += fixed_transcript
-
-                # Append to the full history (if needed)
-                self.all_attributes.append(extracted_attributes)
-                # Update the cumulative current attribute dictionary.
-                self.current_attributes.update(extracted_attributes)
+        self.prev_trancript = self.curr_transcript
+        self.curr_transcript = fixed_transcript
+        self.memory.append(fixed_transcript)
+        await self.log_transcript(fixed_transcript)
+
+        # Update the cumulative current attribute dictionary.
+        self.current_attributes.update(extracted_attributes)
+        # Checkpoint only now: a resumed session must never have this window's text without its attributes
+        await self.save_session()
+
+        # Send the latest transcription and cumulative current attributes.
+        await self.send(text_data=json.dumps({
+            "corrected_audio": self.prev_trancript + self.curr_transcript,
+            "attributes": self.current_attributes  # cumulative current attributes
+        }))
+        self.sweep.refresh(self.memory, self.current_attributes)
+
+    def session_state(self, pending=False):
+        state = {
+            "form_id": self.formid,
+            "prev_transcript": self.prev_trancript,
+            "curr_transcript": self.curr_transcript,
+            "last_raw_transcript": self.last_raw_transcript,
+            "held_word": self.held_word,
+            "attributes": self.current_attributes,
+            "memory": self.memory.state(),
+            "sweep": self.sweep.state(),
+            "init_segment": base64.b64encode(self.audio.init_segment).decode() if self.audio.has_header else None,
+        }
+        if pending:
+            audio, transcriptions = self.pipeline.unfinished()
+            window = self.audio.take()
+            if window is not None:
+                audio.append(window)
+            state["pending_audio"] = [base64.b64encode(bytes(data)).decode() for data in audio]
+            state["pending_transcriptions"] = transcriptions
+        return state
+
+    async def save_session(self, pending=False, delete=False):
+        """Checkpoint the session (after every window, and with unfinished work on disconnect)."""
+        try:
+            if delete:
+                await self.sessions.delete(self.session_id)
+            else:
+                await self.sessions.save(self.session_id, self.session_state(pending))
+        except Exception as e:
+            print("Error saving session state:", e)
 
-                # Send the latest transcription and cumulative current attributes.
-                await self.send(text_data=json.dumps({
-                    "corrected_audio": self.prev_trancript + self.curr_transcript,
-                    "attributes": self.current_attributes  # cumulative current attributes
-                }))
+    async def log_transcript(self, segment):
+        """Log the raw text as it arrives (database rows, not memory); self.memory compacts it for prompting only."""
+        try:
+            await self.sessions.append_transcript(self.session_id, segment)
+        except Exception as e:
+            print("Error logging transcript segment:", e)
 
-                # Reset for the next aggregation round.
-                self.audio_buffer = b""
-                self.nchunks = 0
+    async def persist_fill(self, attributes, final):
+        """Queue the fill and its raw transcript for the write-behind; the database write happens off this path."""
+        try:
+            transcript = await self.sessions.transcript(self.session_id)
+        except Exception as e:
+            print("Error reading the transcript log:", e)
+            transcript = ""
+        if not transcript:
+            transcript = self.memory.text()  # The log is gone (store error or expiry); the best left
+        try:
+            await form_fills.enqueue(fill_record(
+                self.session_id, self.form_template, dict(attributes),
+                transcript, self.memory.total, final
+            ))
+        except Exception as e:
+            print("Error queueing form fill:", e)
+
+    async def load_session(self, session_id):
+        try:
+            state = await self.sessions.load(session_id)
+        except Exception as e:
+            print("Error loading session state:", e)
+            return None
+        if state is None or state.get("form_id") != self.formid:
+            return None
+        return state
+
+    async def restore_session(self, state):
+        self.prev_trancript = state["prev_transcript"]
+        self.curr_transcript = state["curr_transcript"]
+        self.last_raw_transcript = state["last_raw_transcript"]
+        self.held_word = state.get("held_word", "")
+        self.current_attributes = state["attributes"]
+        self.memory.restore(state["memory"])
+        self.sweep.restore(state["sweep"])
+        if state.get("init_segment"):
+            self.audio.resume(base64.b64decode(state["init_segment"]))
+        # Older work first: transcriptions go straight to extraction, then audio is re-transcribed.
+        for transcription in state.get("pending_transcriptions", []):
+            await self.pipeline.submit_transcription(transcription)
+        for data in state.get("pending_audio", []):
+            await self.pipeline.submit(base64.b64decode(data))
+        print(f"Resumed session {self.session_id}: {self.memory.stats()}")
+
+    async def send_partial_attribute(self, name, value):
+        await self.send(text_data=json.dumps({
+            "partial": True,
+            "attributes": {name: value}
+        }))
 
     async def process_final_sweep(self):
         """
         Process the complete transcript to verify and correct the extracted attributes.
         """
-        # Retrieve the form instance
-        form = await sync_to_async(Form.objects.get)(id=self.scope['url_route']['kwargs']['formid'])
-        
-        # Build the candidate attributes list for the prompt
-        field_list = []
-        for block in await sync_to_async(list)(form.blocks.all()):
-            for field in await sync_to_async(list)(block.fields.all()):
-                field_list.append({
-                    "block_name": block.block_name,
-                    "field_name": field.field_name,
-                    "field_type": field.field_type,
-                    "current_value": self.current_attributes.get(field.field_name, "N/A")
-                })
-        
-        # Call the final attribute extraction process asynchronously
-        final_attributes = await parseFinalAttributes(self.full_transcript, field_list)
+        # Only the transcript added since the last speculative sweep is re-verified here
+        final_attributes = await self.sweep.finalise(self.memory, self.current_attributes)
         print("Final sweep completed. Verified attributes:", final_attributes)
         return final_attributes
         
     
-    def check_webm_integrity(self, audio_data):
+    async def transcribe_window(self, audio_data):
         """
-        Checks whether the audio_data starts with the minimal WebM EBML header signature.
-        The EBML header for WebM typically starts with the 4-byte sequence: 0x1A45DFA3.
+        Transcription stage of the pipeline. With overlapping windows, the words re-transcribed
+        from the previous window's tail are stitched out so each word is passed on once.
         """
-        if len(audio_data) < 4:
-            return False
-        return audio_data[0:4] == b'\x1A\x45\xDF\xA3'
+        transcription = await self.run_whisper_on_buffer(audio_data)
+        if not self.audio.overlap_ms:
+            return transcription
+        stitched, self.last_raw_transcript, self.held_word = stitchWindow(
+            self.last_raw_transcript, self.held_word, transcription
+        )
+        return stitched
+
+    async def release_held_word(self):
+        """At stop no window follows to confirm the held-back word, so it joins the transcript as heard."""
+        if not self.held_word:
+            return
+        word, self.held_word = " " + self.held_word, ""
+        self.curr_transcript += word
+        self.memory.append(word)
+        await self.log_transcript(word)
 
     async def run_whisper_on_buffer(self, audio_data):
-        with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as tmp:
-            tmp.write(audio_data)
-            tmp.flush()
-            filename = tmp.name
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, self.call_whisper_api, filename)
+        async with transcription_lane.slot():
+            result = await self.call_whisper_api(audio_data)
         return result.get('text', '')
 
-    def call_whisper_api(self, filename):
+    async def call_whisper_api(self, audio_data):
+        """
+        Uploads the aggregated audio to Whisper straight from memory; nothing touches the filesystem.
+        """
         headers = {
             "Authorization": f"Bearer {OPENAI_API_KEY}"
         }
         data = {
             "model": "whisper-1"
         }
-        with open(filename, "rb") as f:
-            files = {"file": (filename, f, "audio/webm")}
-            response = requests.post(WHISPER_API_URL, headers=headers, data=data, files=files)
+        with AudioUpload(audio_data) as upload:
+            files = {"file": (upload.name, upload, "audio/webm")}
+            try:
+                response = await get_http_client().post(WHISPER_API_URL, headers=headers, data=data, files=files)
+            except httpx.HTTPError as e:
+                print("Error calling Whisper API:", e)
+                return {"text": ""}
         if response.status_code == 200:
             return response.json()
         else:
@@ -191,20 +398,103 @@ class FormDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, form_id, format=None):
+        # Served from the per-form JSON cache; the ETag is the form's version stamp.
         try:
-            # Ensure that the user can only access their own forms
-            form = Form.objects.get(id=form_id, user=request.user)
+            detail = form_details.get(form_id)
         except Form.DoesNotExist:
+            detail = None
+        # Ensure that the user can only access their own forms
+        if detail is None or detail.user_id != request.user.id:
             return Response({"detail": "Form not found."}, status=404)
-        serializer = FormDetailSerializer(form)
-        return Response(serializer.data)
+
+        headers = {"ETag": detail.etag, "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and (if_none_match.strip() == "*" or detail.etag in parse_etags(if_none_match)):
+            return HttpResponse(status=304, headers=headers)
+        return HttpResponse(detail.body, content_type="application/json", headers=headers)
 
 class FormListView(ListAPIView):
-    serializer_class = FormSerializer
+    # Summaries only (id, name, counts); the full nesting is served by FormDetailView
+    serializer_class = FormSummarySerializer
+    pagination_class = FormCursorPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Form.objects.filter(user=self.request.user)  # Only return forms created by the logged-in user
+        # Only return forms created by the logged-in user, counted in the same query
+        return Form.objects.filter(user=self.request.user).annotate(
+            block_count=Count("blocks", distinct=True),
+            field_count=Count("blocks__fields"),
+        )
+
+class FilledFormListView(ListAPIView):
+    """
+    The user's completed fills, newest first, in three queries per page whatever the page size.
+    ?form=<id> limits to one form, ?drafts=true includes fills of sessions that disconnected
+    before the final sweep, and ?transcript=true adds the stored transcripts.
+    """
+    serializer_class = FilledFormSerializer
+    pagination_class = FormCursorPagination
+    permission_classes = [IsAuthenticated]
+
+    def include_transcript(self):
+        return self.request.query_params.get("transcript") == "true"
+
+    def get_queryset(self):
+        fills = FilledForm.objects.filter(user=self.request.user).select_related("form").prefetch_related("filled_fields")
+        if self.request.query_params.get("drafts") != "true":
+            fills = fills.filter(final=True)
+        form_id = self.request.query_params.get("form")
+        if form_id is not None:
+            fills = fills.filter(form_id=form_id) if form_id.isdigit() else fills.none()
+        if self.include_transcript():
+            fills = fills.select_related("transcript")
+        return fills
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "include_transcript": self.include_transcript()}
+
+class FilledFormSearchView(APIView):
+    """
+    Full-text search over the user's fills (form name, field values and transcripts), best match
+    first. ?q= is required; ?form=, ?drafts=true, ?since= and ?until= (inclusive ISO dates) narrow it.
+    Each hit is the fill as served by FilledFormListView plus its rank and a highlighted snippet.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        if not re.search(r"\w", query):
+            return Response({"error": "q must contain a search term"}, status=400)
+
+        fills = FilledForm.objects.filter(user=request.user)
+        if request.query_params.get("drafts") != "true":
+            fills = fills.filter(final=True)
+        form_id = request.query_params.get("form")
+        if form_id is not None:
+            fills = fills.filter(form_id=form_id) if form_id.isdigit() else fills.none()
+        for param, lookup, days in (("since", "submission_date__gte", 0), ("until", "submission_date__lt", 1)):
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                day = parse_date(value)
+            except ValueError:
+                day = None
+            if day is None:
+                return Response({"error": f"{param} must be a date (YYYY-MM-DD)"}, status=400)
+            boundary = timezone.make_aware(datetime.combine(day + timedelta(days=days), datetime.min.time()))
+            fills = fills.filter(**{lookup: boundary})
+
+        paginator = SearchPagination()
+        hits = paginator.paginate_queryset(SearchResults(request.user.id, query, fills), request, view=self)
+        # The page's fills in two queries, serialised in rank order
+        found = FilledForm.objects.select_related("form").prefetch_related("filled_fields").in_bulk(
+            [hit.fill_id for hit in hits]
+        )
+        return paginator.get_paginated_response([
+            {**FilledFormSerializer(found[hit.fill_id]).data, "rank": hit.rank, "snippet": hit.snippet}
+            for hit in hits if hit.fill_id in found
+        ])
 
 class FormCreateView(APIView):
     permission_classes = [IsAuthenticated]  # Ensure only authenticated users can access
@@ -217,10 +507,30 @@ class FormCreateView(APIView):
         serializer = FormSerializer(data=request.data)
         if serializer.is_valid():
             form = serializer.save(user=request.user)  # Attach authenticated user
+            form = Form.objects.prefetch_related("blocks__fields").get(id=form.id)
             return Response(FormSerializer(form).data, status=201)
 
         return Response(serializer.errors, status=400)
 
+class FormBatchCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Create many forms, with their blocks and fields, in one request and one transaction"""
+        forms_data = request.data.get("forms") if isinstance(request.data, dict) else request.data
+        if not isinstance(forms_data, list) or not forms_data:
+            return Response({"error": "Expected a non-empty list of forms"}, status=400)
+        if len(forms_data) > FORM_BATCH_MAX:
+            return Response({"error": f"At most {FORM_BATCH_MAX} forms can be created per request"}, status=400)
+
+        serializer = FormSerializer(data=forms_data, many=True)
+        if serializer.is_valid():
+            forms = serializer.save(user=request.user)
+            created = Form.objects.filter(id__in=[form.id for form in forms]).order_by("id").prefetch_related("blocks__fields")
+            return Response(FormSerializer(created, many=True).data, status=201)
+
+        return Response(serializer.errors, status=400)
+
 class RegisterUserView(APIView):
     permission_classes = [AllowAny]  # Allow unauthenticated users to register
 
@@ -240,14 +550,24 @@ class LoginView(APIView):
         email = request.data.get("email")
         password = request.data.get("password")
 
-        # Retrieve the user using email
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
+        # Retrieve the user by case-normalised email; LOWER(email) is indexed (migration 0005)
+        user = (
+            User.objects.annotate(email_lower=Lower("email"))
+            .filter(email_lower=str(email or "").strip().lower())
+            .order_by("id")
+            .first()
+        )
+        if user is None:
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Manually check the password instead of using authenticate()
-        if check_password(password, user.password):  # Compare hashed password
+        # Hash in the bounded password pool; refuse rather than queue without limit during a burst
+        try:
+            valid = password_checks.check(password, user.password)
+        except PasswordPoolBusy:
+            return Response({"error": "Too many login attempts. Please try again."},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS, headers={"Retry-After": "1"})
+
+        if valid:
             if not user.is_active:
                 return Response({"error": "Account is inactive. Please wait for activation."}, status=status.HTTP_403_FORBIDDEN)
 
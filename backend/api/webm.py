@@ -0,0 +1,289 @@
+import os
+
+EBML_HEADER_ID = 0x1A45DFA3
+SEGMENT_ID = 0x18538067
+CLUSTER_ID = 0x1F43B675
+TIMECODE_ID = 0xE7
+SIMPLE_BLOCK_ID = 0xA3
+BLOCK_GROUP_ID = 0xA0
+
+# Level-1 elements (children of Segment). Seeing one of these inside an unknown-size Cluster ends it.
+SEGMENT_CHILD_IDS = {
+    0x114D9B74,  # SeekHead
+    0x1549A966,  # Info
+    0x1654AE6B,  # Tracks
+    0x1C53BB6B,  # Cues
+    0x1254C367,  # Tags
+    0x1941A469,  # Attachments
+    0x1043A770,  # Chapters
+    CLUSTER_ID,
+}
+
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+CLUSTER_ID_BYTES = CLUSTER_ID.to_bytes(4, "big")
+# Anything declaring a larger element is treated as corruption rather than buffered.
+WEBM_MAX_ELEMENT = int(os.getenv("WEBM_MAX_ELEMENT", str(16 * 1024 * 1024)))
+# Audio from the end of each window repeated at the start of the next (0 disables overlap). It has to
+# cover a whole word (~1 s) for stitching to repair the word the edge cut; Whisper bills it again too.
+AUDIO_OVERLAP_MS = int(os.getenv("AUDIO_OVERLAP_MS", "0"))
+_RESYNC_MARKERS = (EBML_HEADER_ID.to_bytes(4, "big"), CLUSTER_ID_BYTES)
+
+class _Corrupt(Exception):
+    pass
+
+def _read_vint(data, pos, keep_marker):
+    """
+    Reads an EBML variable-length integer at `pos`.
+    Returns (value, length), None if more bytes are needed, or value -1 for the reserved
+    "unknown size" encoding. Raises _Corrupt on an invalid leading byte.
+    """
+    if pos >= len(data):
+        return None
+    first = data[pos]
+    if first == 0:
+        raise _Corrupt()
+    length = 9 - first.bit_length()
+    if pos + length > len(data):
+        return None
+    value = first if keep_marker else first & (0xFF >> length)
+    all_ones = value == (0xFF >> length)
+    for i in range(1, length):
+        byte = data[pos + i]
+        value = (value << 8) | byte
+        all_ones = all_ones and byte == 0xFF
+    if not keep_marker and all_ones:
+        return -1, length
+    return value, length
+
+class WebmStream:
+    """
+    Incremental EBML/WebM parser for a recorder's chunk stream.
+
+    Tracks the EBML header, the Segment and its metadata (the init segment) and Cluster boundaries
+    as bytes arrive, and copies only complete SimpleBlock/BlockGroup elements into the current window.
+    Every window taken is therefore a minimal valid file: the init segment followed by one Cluster
+    header (re-emitted with the running cluster's Timecode) and the blocks received since the last take.
+
+    Recorders write unknown-size Clusters that can run for many seconds, so windows are cut at the
+    latest complete block rather than waiting for a Cluster to close. Block timecodes are relative to
+    their Cluster, so re-opening the Cluster with the same Timecode keeps them valid.
+    Elements split across chunks are carried over; invalid data is skipped up to the next
+    EBML header or Cluster.
+
+    With `overlap_ms` set, the blocks covering the last `overlap_ms` of each window are repeated at the
+    start of the next one, so words cut at a boundary are heard whole at least once.
+    """
+
+    def __init__(self, overlap_ms=AUDIO_OVERLAP_MS):
+        self.overlap_ms = overlap_ms
+        self.init_segment = None      # EBML header + Segment header + metadata before the first Cluster
+        self._next_init = None        # Init segment being collected from a (re-)sent header
+        self._in_segment = False
+        self._in_cluster = False
+        self._seeking = False         # Skipping to the next Cluster after resume()
+        self._cluster_remaining = None  # Bytes left in a known-size Cluster
+        self._cluster_head = None     # Cluster ID + unknown size + Timecode element
+        self._cluster_time = 0
+        self._block_time = 0
+        self._written_head = None     # Cluster head most recently written into the window
+        self._index = []              # (time_ms, head, start, end) per block, kept for the overlap
+        self._pending = bytearray()   # Unparsed tail of earlier chunks
+        self._window = bytearray()
+        self.blocks = 0               # New complete blocks in the current window
+        self.overlap_blocks = 0       # Blocks repeated from the previous window
+        self.skipped = 0              # Bytes discarded while resynchronising
+
+    def __len__(self):
+        return len(self._window)
+
+    @property
+    def has_header(self):
+        return self.init_segment is not None
+
+    def resume(self, init_segment):
+        """
+        Continue a stream whose header was parsed by an earlier connection: the recorder keeps sending
+        Clusters without repeating the header, so parsing restarts inside the Segment at the next Cluster.
+        """
+        self.init_segment = bytes(init_segment)
+        self._in_segment = True
+        self._seeking = True
+        self._window = bytearray(self.init_segment)
+        self._written_head = None
+        self._index = []
+
+    def feed(self, chunk):
+        """Parse the next chunk; returns the number of complete blocks added to the window."""
+        before = self.blocks
+        if self._pending:
+            self._pending += chunk
+            view = memoryview(self._pending)
+            consumed = self._parse(view)
+            view.release()
+            del self._pending[:consumed]
+        else:
+            view = memoryview(chunk)
+            consumed = self._parse(view)
+            self._pending += view[consumed:]
+        return self.blocks - before
+
+    def take(self):
+        """
+        Detach the current window (init segment + re-opened Cluster + new blocks) and start the next,
+        seeded with the overlap tail when enabled.
+        Returns None when no new complete block has arrived since the last take.
+        """
+        if not self.blocks:
+            return None
+        window, index = self._window, self._index
+        self._window = bytearray(self.init_segment)
+        self._written_head = None
+        self._index = []
+        self.blocks = 0
+        self.overlap_blocks = 0
+        if self.overlap_ms and index:
+            cutoff = index[-1][0] - self.overlap_ms
+            for time_ms, head, start, end in index:
+                if time_ms > cutoff:
+                    self._append_block(head, window[start:end], time_ms)
+                    self.overlap_blocks += 1
+        return window
+
+    def _append_block(self, head, element, time_ms, new=False):
+        if self._written_head is not head:
+            self._window += head
+            self._written_head = head
+        start = len(self._window)
+        self._window += element
+        if self.overlap_ms:
+            self._index.append((time_ms, head, start, len(self._window)))
+        if new:
+            self.blocks += 1
+
+    def _parse(self, data):
+        pos = 0
+        if self._seeking:
+            # The first bytes usually continue a block cut off with the old connection.
+            found = bytes(data).find(CLUSTER_ID_BYTES)
+            if found < 0:
+                skip = max(0, len(data) - 3)
+                self.skipped += skip
+                return skip
+            self._seeking = False
+            self.skipped += found
+            pos = found
+        while pos < len(data):
+            try:
+                step = self._element(data, pos)
+            except _Corrupt:
+                step = self._resync(data, pos)
+            if step is None:
+                break
+            pos += step
+        return pos
+
+    def _resync(self, data, pos):
+        """Skip to the next EBML header or Cluster ID; keep a short tail that may hold a split marker."""
+        tail = bytes(data[pos + 1:])
+        found = [i for i in (tail.find(marker) for marker in _RESYNC_MARKERS) if i >= 0]
+        skip = 1 + (min(found) if found else max(0, len(tail) - 3))
+        self.skipped += skip
+        self._in_cluster = False
+        return skip
+
+    def _element(self, data, pos):
+        """Handles the element at `pos`; returns the bytes consumed, or None if more data is needed."""
+        element_id = _read_vint(data, pos, keep_marker=True)
+        if element_id is None:
+            return None
+        element_id, id_len = element_id
+        if id_len > 4:
+            raise _Corrupt()
+        size = _read_vint(data, pos + id_len, keep_marker=False)
+        if size is None:
+            return None
+        size, size_len = size
+        header_len = id_len + size_len
+
+        if element_id == EBML_HEADER_ID:
+            end = self._whole(data, pos, header_len, size)
+            if end is None:
+                return None
+            # A (possibly repeated) stream header: collect its init segment afresh.
+            self._next_init = bytearray(data[pos:end])
+            self._in_segment = self._in_cluster = False
+            return end - pos
+
+        if element_id == SEGMENT_ID:
+            if self._next_init is None:
+                raise _Corrupt()
+            # Windows are partial Segments, so the size is always rewritten as unknown.
+            self._next_init += SEGMENT_ID.to_bytes(4, "big") + UNKNOWN_SIZE
+            self._in_segment = True
+            return header_len
+
+        if not self._in_segment:
+            raise _Corrupt()
+
+        if self._in_cluster and self._cluster_remaining is not None and self._cluster_remaining <= 0:
+            self._in_cluster = False
+        if self._in_cluster and element_id in SEGMENT_CHILD_IDS:
+            self._in_cluster = False   # An unknown-size Cluster ends where the next level-1 element starts
+
+        if element_id == CLUSTER_ID:
+            self._open_init()
+            self._in_cluster = True
+            self._cluster_remaining = None if size == -1 else size
+            self._cluster_head = None
+            return header_len
+
+        end = self._whole(data, pos, header_len, size)
+        if end is None:
+            return None
+        element = data[pos:end]
+        if self._in_cluster:
+            if self._cluster_remaining is not None:
+                self._cluster_remaining -= end - pos
+            if element_id == TIMECODE_ID:
+                self._cluster_head = CLUSTER_ID_BYTES + UNKNOWN_SIZE + element
+                self._cluster_time = int.from_bytes(element[header_len:], "big")
+            elif element_id in (SIMPLE_BLOCK_ID, BLOCK_GROUP_ID) and self._cluster_head is not None:
+                if element_id == SIMPLE_BLOCK_ID:
+                    self._block_time = self._cluster_time + self._relative_time(element, header_len)
+                self._append_block(self._cluster_head, element, self._block_time, new=True)
+        elif self._next_init is not None:
+            self._next_init += element   # Info, Tracks, SeekHead, ... before the first Cluster
+        return end - pos
+
+    @staticmethod
+    def _relative_time(block, header_len):
+        """Signed 16-bit timecode after the track number of a SimpleBlock, relative to its Cluster."""
+        track = _read_vint(block, header_len, keep_marker=False)
+        if track is None or track[0] == -1:
+            raise _Corrupt()
+        offset = header_len + track[1]
+        if offset + 2 > len(block):
+            raise _Corrupt()
+        return int.from_bytes(block[offset:offset + 2], "big", signed=True)
+
+    def _whole(self, data, pos, header_len, size):
+        if size == -1 or size > WEBM_MAX_ELEMENT:
+            raise _Corrupt()
+        end = pos + header_len + size
+        return end if end <= len(data) else None
+
+    def _open_init(self):
+        """The first Cluster after a header completes that header's init segment."""
+        if self._next_init is None:
+            return
+        init = bytes(self._next_init)
+        self._next_init = None
+        if init == self.init_segment:
+            return   # Duplicate header from a restarted recorder: nothing changes
+        if self.init_segment is not None:
+            print("WebM init segment changed mid-stream; applying it from the next window.")
+        self.init_segment = init
+        if not self.blocks:
+            self._window = bytearray(init)
+            self._written_head = None
+            self._index = []
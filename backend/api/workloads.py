@@ -0,0 +1,70 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+# Provider calls are native async (see http_client.py), so instead of sharing the default thread
+# pool every workload class gets its own bounded lane. A burst of chunk extractions can then
+# never make a final sweep queue behind it.
+TRANSCRIPTION_CONCURRENCY = int(os.getenv("TRANSCRIPTION_CONCURRENCY", "16"))
+EXTRACTION_CONCURRENCY = int(os.getenv("EXTRACTION_CONCURRENCY", "16"))
+FINAL_SWEEP_CONCURRENCY = int(os.getenv("FINAL_SWEEP_CONCURRENCY", "4"))
+# Background sweeps while recording (final_sweep.py) have their own lane, so they can never hold
+# the slots a user's stop_recording is waiting for.
+SPECULATIVE_SWEEP_CONCURRENCY = int(os.getenv("SPECULATIVE_SWEEP_CONCURRENCY", "4"))
+
+class WorkloadLane:
+    """Bounded concurrency for one workload class, with queue wait time measurement."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self._semaphore = asyncio.Semaphore(size)
+        self.waiting = 0
+        self.active = 0
+        self.completed = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        queued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        wait = time.monotonic() - queued_at
+        self.last_wait = wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_wait += wait
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "last_wait_ms": round(self.last_wait * 1000, 1),
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "avg_wait_ms": round(self.total_wait / (self.completed or 1) * 1000, 1),
+        }
+
+transcription_lane = WorkloadLane("transcription", TRANSCRIPTION_CONCURRENCY)
+extraction_lane = WorkloadLane("extraction", EXTRACTION_CONCURRENCY)
+final_sweep_lane = WorkloadLane("final_sweep", FINAL_SWEEP_CONCURRENCY)
+speculative_sweep_lane = WorkloadLane("speculative_sweep", SPECULATIVE_SWEEP_CONCURRENCY)
+
+def workload_stats():
+    return {
+        lane.name: lane.stats()
+        for lane in (transcription_lane, extraction_lane, final_sweep_lane, speculative_sweep_lane)
+    }
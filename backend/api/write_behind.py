@@ -0,0 +1,300 @@
+import os
+import glob
+import json
+import asyncio
+import uuid
+import threading
+from asgiref.sync import sync_to_async
+from django.db import DataError, IntegrityError, transaction
+from .models import Form, Field, FilledForm, FilledFormField, Transcript, SearchDocument
+from .search import document_body
+
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "50"))          # Fills per write transaction
+PERSIST_FLUSH_INTERVAL = float(os.getenv("PERSIST_FLUSH_INTERVAL", "2"))  # Max seconds a fill waits
+PERSIST_SPOOL_DIR = os.getenv(
+    "PERSIST_SPOOL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fill_spool"),
+)
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; spool ownership falls back to a pid check
+    fcntl = None
+
+# Errors meaning a fill can never be written as it stands (its user or form is gone, a malformed
+# spool line); they send the record to the dead-letter file rather than back to the queue.
+REJECTED = (IntegrityError, DataError, KeyError, TypeError, ValueError)
+
+def fill_record(session_id, form_template, attributes, transcript, transcript_chars, final):
+    """A pending fill, as JSON-serialisable data so it can be spooled to disk."""
+    return {
+        "session_id": session_id,
+        "form_id": form_template.form_id,
+        "user_id": form_template.user_id,
+        "final": final,
+        "attributes": attributes,
+        "transcript": transcript,
+        "transcript_chars": transcript_chars,
+    }
+
+class FillWriteBehind:
+    """
+    Batches completed (and disconnected) form fills off the WebSocket path.
+
+    `enqueue` only appends the record to this process's spool file (in a thread, so the fsync never
+    stalls the event loop) and an in-memory batch; a background task writes batches in one
+    transaction when PERSIST_BATCH_SIZE fills are waiting or PERSIST_FLUSH_INTERVAL has passed. The
+    spool is rewritten with whatever is still unwritten after each batch. Writes are keyed by session
+    id, so replaying a fill is harmless.
+
+    Each process holds an flock on spool-<pid>.lock while it runs. A spool whose lock can be taken
+    belongs to a process that died (even if its pid has since been reused); it is claimed with an
+    atomic rename, so exactly one worker replays it. A batch the database rejects is retried record
+    by record, and records rejected on their own go to dead-letter.jsonl instead of blocking the queue.
+    """
+
+    def __init__(self, batch_size=PERSIST_BATCH_SIZE, interval=PERSIST_FLUSH_INTERVAL, spool_dir=PERSIST_SPOOL_DIR):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.spool_dir = spool_dir
+        self.dead_letter_path = os.path.join(spool_dir, "dead-letter.jsonl")
+        self._pending = {}          # session_id -> record; a later record for a session replaces the earlier
+        self._lock = threading.Lock()
+        self._owner_lock = None
+        self._wake = None
+        self._loop = None
+        self._task = None
+        self._flushing = None
+        self.written = 0
+        self.batches = 0
+        self.dead_lettered = 0
+
+    @property
+    def spool_path(self):
+        # Looked up on use: a worker forked after import must not share its parent's spool
+        return os.path.join(self.spool_dir, f"spool-{os.getpid()}.jsonl")
+
+    async def enqueue(self, record):
+        await self._ensure_started()
+        if await asyncio.to_thread(self._add, record):
+            self._wake.set()
+
+    async def flush(self):
+        """Write everything pending now (used on disconnect); safe to call concurrently."""
+        await self._ensure_started()
+        if self._flushing is None:
+            self._flushing = asyncio.ensure_future(self._flush_all())
+        flushing = self._flushing
+        try:
+            await asyncio.shield(flushing)
+        finally:
+            if self._flushing is flushing and flushing.done():
+                self._flushing = None
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "batches": self.batches,
+            "dead_lettered": self.dead_lettered,
+        }
+
+    async def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._flushing = None
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            await asyncio.to_thread(self._recover_spools)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print("Error writing form fills (kept in the spool for the next flush):", e)
+
+    async def _flush_all(self):
+        while True:
+            with self._lock:
+                batch = list(self._pending.values())[:self.batch_size]
+            if not batch:
+                return
+            rejected = 0
+            try:
+                await sync_to_async(write_fills)(batch)
+            except REJECTED as e:
+                # Something in the batch can never be written: find it without holding up the rest.
+                # Anything else (the database being unreachable, say) propagates and is retried whole.
+                print(f"Form fill batch rejected ({e}); retrying {len(batch)} fills one by one.")
+                for record in batch:
+                    try:
+                        await sync_to_async(write_fills)([record])
+                    except REJECTED as e:
+                        await asyncio.to_thread(self._dead_letter, record, e)
+                        rejected += 1
+            await asyncio.to_thread(self._done, batch)
+            self.written += len(batch) - rejected
+            self.batches += 1
+
+    def _add(self, record):
+        with self._lock:
+            self._pending[record["session_id"]] = record
+            self._append_spool(record)
+            return len(self._pending) >= self.batch_size
+
+    def _done(self, batch):
+        with self._lock:
+            for record in batch:
+                if self._pending.get(record["session_id"]) is record:
+                    del self._pending[record["session_id"]]
+            self._rewrite_spool()
+
+    def _dead_letter(self, record, error):
+        print(f"Form fill for session {record.get('session_id')} rejected, moved to {self.dead_letter_path}:", error)
+        with self._lock:
+            with open(self.dead_letter_path, "a") as dead:
+                dead.write(json.dumps({"error": str(error), "record": record}) + "\n")
+                dead.flush()
+                os.fsync(dead.fileno())
+            self.dead_lettered += 1
+
+    def _append_spool(self, record):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with open(self.spool_path, "a") as spool:
+            spool.write(json.dumps(record) + "\n")
+            spool.flush()
+            os.fsync(spool.fileno())
+
+    def _rewrite_spool(self):
+        if not self._pending:
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+            return
+        temp_path = self.spool_path + ".tmp"
+        with open(temp_path, "w") as spool:
+            spool.writelines(json.dumps(record) + "\n" for record in self._pending.values())
+            spool.flush()
+            os.fsync(spool.fileno())
+        os.replace(temp_path, self.spool_path)
+
+    def _lock_path(self, pid):
+        return os.path.join(self.spool_dir, f"spool-{pid}.lock")
+
+    def _take_owner_lock(self):
+        if fcntl is None or self._owner_lock is not None:
+            return
+        self._owner_lock = open(self._lock_path(os.getpid()), "a")
+        try:
+            fcntl.flock(self._owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            pass   # Another queue in this process holds it already
+
+    def _owner_alive(self, pid):
+        if fcntl is None:
+            return _process_alive(pid)
+        with open(self._lock_path(pid), "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            return False
+
+    def _recover_spools(self):
+        """Adopt the spools of processes that are no longer running, and of an earlier run with this pid."""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._take_owner_lock()
+        recovered = 0
+        for path in glob.glob(os.path.join(self.spool_dir, "spool-*.jsonl")):
+            try:
+                owner = int(os.path.basename(path)[len("spool-"):].split("-")[0].split(".")[0])
+            except ValueError:
+                continue
+            if owner == os.getpid():
+                claimed = path
+            elif self._owner_alive(owner):
+                continue
+            else:
+                # Renamed into this process's namespace first: if this process dies before it has
+                # merged the records, the next worker adopts the claimed file from us in turn.
+                claimed = os.path.join(self.spool_dir, f"spool-{os.getpid()}-from-{owner}-{uuid.uuid4().hex[:8]}.jsonl")
+                try:
+                    os.replace(path, claimed)
+                except FileNotFoundError:
+                    continue   # Another worker claimed it first
+            with open(claimed) as spool:
+                records = []
+                for line in spool:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue   # Torn last line from the crash
+            with self._lock:
+                for record in records:
+                    if record["session_id"] not in self._pending:
+                        self._pending[record["session_id"]] = record
+                        recovered += 1
+                self._rewrite_spool()   # Adopted records are now durable in our own spool
+            if claimed != self.spool_path:
+                os.remove(claimed)
+        if recovered:
+            print(f"Recovered {recovered} unwritten form fills from the spool.")
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def write_fills(records):
+    """Replaces (and re-indexes) the fills of the given sessions in one transaction: four INSERTs per batch."""
+    # A form deleted since the session ended would fail the whole batch on every retry
+    forms = dict(Form.objects.filter(id__in={record["form_id"] for record in records}).values_list("id", "form_name"))
+    records = [record for record in records if record["form_id"] in forms]
+    names_by_form = {}
+    for field_id, field_name, form_id in Field.objects.filter(
+        block__form_id__in=forms
+    ).values_list("id", "field_name", "block__form_id"):
+        names_by_form.setdefault(form_id, {}).setdefault(field_name, field_id)
+
+    with transaction.atomic():
+        FilledForm.objects.filter(session_id__in=[record["session_id"] for record in records]).delete()
+        fills = FilledForm.objects.bulk_create([
+            FilledForm(session_id=record["session_id"], form_id=record["form_id"],
+                       user_id=record["user_id"], final=record["final"])
+            for record in records
+        ])
+        FilledFormField.objects.bulk_create([
+            FilledFormField(
+                filled_form=fill,
+                field_id=names_by_form.get(record["form_id"], {}).get(name),
+                field_name=name,
+                field_value=str(value),
+            )
+            for fill, record in zip(fills, records)
+            for name, value in record["attributes"].items()
+        ])
+        Transcript.objects.bulk_create([
+            Transcript(filled_form=fill, text=record["transcript"], transcript_chars=record["transcript_chars"])
+            for fill, record in zip(fills, records)
+        ])
+        SearchDocument.objects.bulk_create([
+            SearchDocument(
+                filled_form=fill,
+                user_id=record["user_id"],
+                body=document_body(forms[record["form_id"]], record["attributes"], record["transcript"]),
+            )
+            for fill, record in zip(fills, records)
+        ])
+
+form_fills = FillWriteBehind()
@@ -2,7 +2,6 @@ import os
 import django
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
-from channels.auth import AuthMiddlewareStack
 
 # ✅ Set Django settings before setup
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
@@ -12,10 +11,11 @@ django.setup()
 
 # Import your WebSocket routing from api/routing.py
 from api import routing
+from api.authentication import TokenAuthMiddleware
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),  # Handle HTTP requests.
-    "websocket": AuthMiddlewareStack(
+    "websocket": TokenAuthMiddleware(  # Same API token as the REST endpoints, no session lookups.
         URLRouter(
             routing.websocket_urlpatterns  # Routes for WebSocket connections.
         )
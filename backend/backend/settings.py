@@ -72,7 +72,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",  # Requires authentication by default
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",  # Uses token-based authentication
+        "api.authentication.CachedTokenAuthentication",  # Token auth, with token -> user lookups cached
     ],
 }
 
@@ -98,21 +98,76 @@ TEMPLATES = [
 WSGI_APPLICATION = 'backend.wsgi.application'
 ASGI_APPLICATION = 'backend.asgi.application'
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+# A shared Redis layer is needed once more than one Daphne process serves websockets;
+# without REDIS_URL everything stays in-process.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer"
+        }
     }
-}
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) suits a single node; DB_ENGINE=postgres with a connection pool
+# is for running several nodes against one database.
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "0"))
+
+if DB_ENGINE == "postgres":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("POSTGRES_DB", "formify"),
+            'USER': os.getenv("POSTGRES_USER", "formify"),
+            'PASSWORD': os.getenv("POSTGRES_PASSWORD", ""),
+            'HOST': os.getenv("POSTGRES_HOST", "localhost"),
+            'PORT': os.getenv("POSTGRES_PORT", "5432"),
+            # psycopg's pool replaces persistent connections, so CONN_MAX_AGE stays 0.
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv("DB_POOL_MIN", "2")),
+                    'max_size': int(os.getenv("DB_POOL_MAX", "10")),
+                    'timeout': float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                },
+            },
+        }
+    }
+else:
+    # WAL lets readers (WebSocket sessions) run alongside a writer (form creation); synchronous=NORMAL
+    # is durable across application crashes in WAL mode; IMMEDIATE transactions take the write lock
+    # up front, so writers wait on the busy timeout instead of failing with "database is locked".
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # Milliseconds
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024)))
+    SQLITE_TUNING = os.getenv("SQLITE_TUNING", "true").lower() == "true"
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("SQLITE_PATH", BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_MAX_AGE > 0,
+            'OPTIONS': {
+                'timeout': SQLITE_BUSY_TIMEOUT / 1000,
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+                    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT};'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            } if SQLITE_TUNING else {},
+        }
     }
-}
 
 
 # Password validation
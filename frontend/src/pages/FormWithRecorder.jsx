@@ -22,6 +22,8 @@ function FormWithRecorder() {
   const wsRef = useRef(null);
   const mediaRecorderRef = useRef(null);
   const finalResultsReceivedRef = useRef(false);
+  const sessionIdRef = useRef(null); // Lets a dropped connection resume the same recording session
+  const pendingChunksRef = useRef([]); // Audio recorded while the connection was down
   const streamRef = useRef(null);
   const formRef = useRef(null);
 
@@ -61,49 +63,77 @@ function FormWithRecorder() {
 
   // WebSocket connection setup
   useEffect(() => {
-    const socket = new WebSocket(
-      `wss://formify-yg3d.onrender.com/ws/transcription/${formId}/`
-    );
-    socket.binaryType = "arraybuffer";
-    socket.onopen = () => {
-      console.log("WebSocket connected");
-    };
-    socket.onmessage = (event) => {
-      try {
-        const data = JSON.parse(event.data);
-        console.log("WebSocket data received:", data);
+    let closing = false;
+    let retryTimer = null;
+    let attempts = 0;
+
+    const connect = () => {
+      const resume = sessionIdRef.current ? `?session=${sessionIdRef.current}` : "";
+      // The token goes in the subprotocol list rather than the URL, which ends up in access logs
+      const socket = new WebSocket(
+        `wss://formify-yg3d.onrender.com/ws/transcription/${formId}/${resume}`,
+        ["token", getCookie("auth_token")]
+      );
+      socket.binaryType = "arraybuffer";
+      socket.onopen = () => {
+        console.log("WebSocket connected");
+        attempts = 0;
+        pendingChunksRef.current.forEach((chunk) => socket.send(chunk));
+        pendingChunksRef.current = [];
+      };
+      socket.onmessage = (event) => {
+        try {
+          const data = JSON.parse(event.data);
+          console.log("WebSocket data received:", data);
 
-        // If final results have already been received, ignore further messages.
-        if (finalResultsReceivedRef.current) {
-          console.log("Final results already processed. Ignoring message.");
-          return;
-        }
+          if (data.session_id) {
+            sessionIdRef.current = data.session_id;
+          }
+
+          // If final results have already been received, ignore further messages.
+          if (finalResultsReceivedRef.current) {
+            console.log("Final results already processed. Ignoring message.");
+            return;
+          }
 
-        // Check if this is the final result.
-        if (data.final_results) {
-          console.log("Received final verified results:", data.attributes);
-          setRealtimeAttributes(data.attributes);
-          setFormValues((prev) => ({ ...prev, ...data.attributes }));
-          // Set the flag so that future messages are ignored.
-          finalResultsReceivedRef.current = true;
-        } else if (data.attributes) {
-          // Process intermediate messages.
-          setRealtimeAttributes((prev) => ({ ...prev, ...data.attributes }));
-          setFormValues((prev) => ({ ...prev, ...data.attributes }));
+          // Check if this is the final result.
+          if (data.final_results) {
+            console.log("Received final verified results:", data.attributes);
+            setRealtimeAttributes(data.attributes);
+            setFormValues((prev) => ({ ...prev, ...data.attributes }));
+            // Set the flag so that future messages are ignored.
+            finalResultsReceivedRef.current = true;
+          } else if (data.attributes) {
+            // Process intermediate messages (and the state of a resumed session).
+            setRealtimeAttributes((prev) => ({ ...prev, ...data.attributes }));
+            setFormValues((prev) => ({ ...prev, ...data.attributes }));
+          }
+        } catch (err) {
+          console.error("Error parsing WebSocket message:", err);
         }
-      } catch (err) {
-        console.error("Error parsing WebSocket message:", err);
-      }
-    };
-    socket.onclose = () => {
-      console.log("WebSocket closed");
-    };
-    socket.onerror = (err) => {
-      console.error("WebSocket error:", err);
+      };
+      socket.onclose = () => {
+        console.log("WebSocket closed");
+        // Reconnect into the same session unless the page is leaving or the session is finished
+        if (closing || finalResultsReceivedRef.current) return;
+        attempts += 1;
+        if (attempts > 5) {
+          setError("Lost the connection to the server");
+          return;
+        }
+        retryTimer = setTimeout(connect, Math.min(1000 * 2 ** attempts, 15000));
+      };
+      socket.onerror = (err) => {
+        console.error("WebSocket error:", err);
+      };
+      wsRef.current = socket;
     };
-    wsRef.current = socket;
+
+    connect();
     return () => {
-      socket.close();
+      closing = true;
+      clearTimeout(retryTimer);
+      wsRef.current.close();
     };
   }, []);
 
@@ -123,15 +153,15 @@ function FormWithRecorder() {
       const recorder = new MediaRecorder(stream, options);
       mediaRecorderRef.current = recorder;
       recorder.ondataavailable = async (event) => {
-        if (
-          event.data &&
-          event.data.size > 0 &&
-          wsRef.current &&
-          wsRef.current.readyState === WebSocket.OPEN
-        ) {
+        if (event.data && event.data.size > 0) {
           const arrayBuffer = await event.data.arrayBuffer();
-          wsRef.current.send(arrayBuffer);
-          console.log(`Sent ${arrayBuffer.byteLength} bytes`);
+          if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+            wsRef.current.send(arrayBuffer);
+            console.log(`Sent ${arrayBuffer.byteLength} bytes`);
+          } else {
+            // Sent once the socket has reconnected into the session
+            pendingChunksRef.current.push(arrayBuffer);
+          }
         }
       };
       recorder.start(1000);
@@ -10,32 +10,35 @@ function getCookie(name) {
 export default function MyForms() {
   const [forms, setForms] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
   const navigate = useNavigate();
 
-  useEffect(() => {
-    const fetchForms = async () => {
-      try {
-        const response = await fetch("https://formify-yg3d.onrender.com/api/auth/forms/list/", {
-          method: "GET",
-          headers: {
-            Authorization: `Token ${getCookie("auth_token")}`,
-            "Content-Type": "application/json",
-          },
-        });
-
-        if (!response.ok) {
-          throw new Error("Failed to fetch forms");
-        }
+  // The list is cursor-paginated: each page carries the URL of the next one.
+  const fetchForms = async (url = "https://formify-yg3d.onrender.com/api/auth/forms/list/") => {
+    try {
+      const response = await fetch(url, {
+        method: "GET",
+        headers: {
+          Authorization: `Token ${getCookie("auth_token")}`,
+          "Content-Type": "application/json",
+        },
+      });
 
-        const data = await response.json();
-        setForms(data);
-      } catch (error) {
-        console.error("Error fetching forms:", error);
-      } finally {
-        setLoading(false);
+      if (!response.ok) {
+        throw new Error("Failed to fetch forms");
       }
-    };
 
+      const data = await response.json();
+      setForms((prev) => [...prev, ...data.results]);
+      setNextPage(data.next);
+    } catch (error) {
+      console.error("Error fetching forms:", error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  useEffect(() => {
     fetchForms();
   }, []);
 
@@ -124,6 +127,16 @@ export default function MyForms() {
                 ))}
               </tbody>
             </table>
+            {nextPage && (
+              <div className="p-4 text-center border-t border-gray-200">
+                <button
+                  onClick={() => fetchForms(nextPage)}
+                  className="text-blue-600 hover:text-blue-800 font-medium"
+                >
+                  Load more
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>